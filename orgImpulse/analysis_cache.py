@@ -0,0 +1,190 @@
+"""
+Folder Analysis Cache
+=====================
+Long-lived, per-folder cache of FunctionAnalyzer results.
+
+analyze_folder re-reads and re-parses every file on each call. The cache keeps
+the FunctionMetadata produced for every file and only re-analyzes files whose
+(mtime, size) signature and content hash changed, so repeated /list-files and
+/get-connectable-functions calls on an unchanged folder cost a few stat calls.
+
+With a snapshot directory, per-file results are also written to disk as JSON
+so the first request after a server restart is warm too. Folders can be analyzed
+recursively, and large batches of changed files (typically the cold start) are
+parsed in a process pool.
+"""
+
+import dataclasses
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from function_analyzer import FunctionAnalyzer, FunctionMetadata, analyze_files, list_python_files
+from module_cache import content_hash, file_signature
+
+SNAPSHOT_VERSION = 2
+
+
+@dataclasses.dataclass
+class _AnalyzedFile:
+    signature: Tuple[int, int]
+    digest: str
+    functions: List[FunctionMetadata]
+
+
+class _FolderState:
+    def __init__(self):
+        self.files: Dict[str, _AnalyzedFile] = {}
+        self.analyzer: Optional[FunctionAnalyzer] = None
+        self.lock = threading.Lock()
+
+
+class FolderAnalysisCache:
+    """Keeps one incrementally refreshed FunctionAnalyzer per folder."""
+
+    def __init__(self, snapshot_dir: Optional[str] = None, workers: Optional[int] = None):
+        self.snapshot_dir = snapshot_dir
+        self.workers = workers
+        self._folders: Dict[Tuple[str, bool], _FolderState] = {}
+        self._lock = threading.Lock()
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+
+    def _state(self, folder_path: str, recursive: bool) -> _FolderState:
+        with self._lock:
+            key = (folder_path, recursive)
+            if key not in self._folders:
+                state = _FolderState()
+                state.files = self._load_snapshot(folder_path, recursive)
+                self._folders[key] = state
+            return self._folders[key]
+
+    @staticmethod
+    def _list_files(folder_path: str, recursive: bool) -> Dict[str, Tuple[int, int]]:
+        current = {}
+        for file_path in list_python_files(folder_path, recursive):
+            try:
+                current[file_path] = file_signature(file_path)
+            except OSError:
+                continue
+        return current
+
+    @staticmethod
+    def _digest(file_path: str) -> str:
+        with open(file_path, 'rb') as file:
+            return content_hash(file.read())
+
+    def refresh(self, folder_path: str, recursive: bool = False) -> Tuple[FunctionAnalyzer, Set[str]]:
+        """Re-analyze changed files; returns the analyzer and the paths that changed."""
+        folder_path = os.path.abspath(folder_path)
+        state = self._state(folder_path, recursive)
+        with state.lock:
+            current = self._list_files(folder_path, recursive)
+            changed = set(state.files) ^ set(current)
+
+            files = {}
+            to_analyze = {}
+            for file_path, signature in current.items():
+                entry = state.files.get(file_path)
+                if entry is None or entry.signature != signature:
+                    digest = self._digest(file_path)
+                    if entry is not None and entry.digest == digest:
+                        # Touched but not edited
+                        entry = _AnalyzedFile(signature, digest, entry.functions)
+                    else:
+                        to_analyze[file_path] = (signature, digest)
+                        changed.add(file_path)
+                        continue
+                files[file_path] = entry
+
+            if to_analyze:
+                analyzed = analyze_files(list(to_analyze), self.workers)
+                for file_path, (signature, digest) in to_analyze.items():
+                    functions = analyzed.get(file_path, [])
+                    if recursive:
+                        for meta in functions:
+                            meta.filename = os.path.relpath(file_path, folder_path)
+                    files[file_path] = _AnalyzedFile(signature, digest, functions)
+            # Keep the listing order so duplicate names resolve as analyze_folder does
+            state.files = {file_path: files[file_path] for file_path in current}
+
+            if changed or state.analyzer is None:
+                state.analyzer = self._build_analyzer(state.files)
+                self._save_snapshot(folder_path, recursive, state.files)
+            return state.analyzer, changed
+
+    def get_analyzer(self, folder_path: str, recursive: bool = False) -> FunctionAnalyzer:
+        """Drop-in replacement for analyze_folder that reuses unchanged results."""
+        return self.refresh(folder_path, recursive)[0]
+
+    def invalidate(self, folder_path: Optional[str] = None):
+        """Forget cached results for one folder (or all folders)."""
+        with self._lock:
+            if folder_path is None:
+                self._folders.clear()
+            else:
+                folder_path = os.path.abspath(folder_path)
+                for key in [key for key in self._folders if key[0] == folder_path]:
+                    del self._folders[key]
+
+    @staticmethod
+    def _build_analyzer(files: Dict[str, _AnalyzedFile]) -> FunctionAnalyzer:
+        analyzer = FunctionAnalyzer()
+        for entry in files.values():
+            for meta in entry.functions:
+                # Copies, because compute_dependencies writes to the metadata
+                analyzer.functions[meta.name] = dataclasses.replace(meta, dependencies=[])
+        analyzer.compute_dependencies()
+        return analyzer
+
+    def _snapshot_path(self, folder_path: str, recursive: bool) -> str:
+        key = folder_path + ('\0recursive' if recursive else '')
+        return os.path.join(self.snapshot_dir, content_hash(key.encode()) + '.json')
+
+    def _load_snapshot(self, folder_path: str, recursive: bool) -> Dict[str, _AnalyzedFile]:
+        if not self.snapshot_dir:
+            return {}
+        try:
+            with open(self._snapshot_path(folder_path, recursive), 'r') as file:
+                snapshot = json.load(file)
+            if snapshot.get('version') != SNAPSHOT_VERSION:
+                return {}
+            return {
+                file_path: _AnalyzedFile(
+                    signature=tuple(entry['signature']),
+                    digest=entry['digest'],
+                    functions=[FunctionMetadata(**meta) for meta in entry['functions']],
+                )
+                for file_path, entry in snapshot['files'].items()
+            }
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Ignoring unreadable analysis snapshot for {folder_path}: {e}")
+            return {}
+
+    def _save_snapshot(self, folder_path: str, recursive: bool, files: Dict[str, _AnalyzedFile]):
+        if not self.snapshot_dir:
+            return
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'folder': folder_path,
+            'recursive': recursive,
+            'files': {
+                file_path: {
+                    'signature': list(entry.signature),
+                    'digest': entry.digest,
+                    'functions': [dataclasses.asdict(meta) for meta in entry.functions],
+                }
+                for file_path, entry in files.items()
+            },
+        }
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.snapshot_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as file:
+                json.dump(snapshot, file)
+            os.replace(tmp_path, self._snapshot_path(folder_path, recursive))
+        except OSError as e:
+            print(f"Could not write analysis snapshot for {folder_path}: {e}")
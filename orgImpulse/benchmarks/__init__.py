@@ -0,0 +1,18 @@
+"""
+Benchmarks
+==========
+Timings of the hot paths on synthetic workloads, so scaling work can be
+measured and checked for regressions:
+
+    cd orgImpulse
+    python -m benchmarks run --output baseline.json
+    python -m benchmarks run --output current.json
+    python -m benchmarks compare baseline.json current.json --threshold 0.25
+
+synthetic.py generates script folders (files of block_* functions with
+loadPath/savePath chains) and graphs (chains, fan-outs, diamonds) of no-op
+nodes; suite.py measures folder analysis in process and the HTTP endpoints,
+/execute-graph overhead and websocket broadcast throughput against a server
+started on a free port in a subprocess. These are not tests: nothing is
+asserted, compare exits with 1 when a metric got worse than the threshold.
+"""
@@ -0,0 +1,102 @@
+"""Command line: python -m benchmarks run|compare (see benchmarks/__init__.py)."""
+
+import argparse
+import json
+import sys
+
+from benchmarks.suite import GROUPS, SuiteConfig, compare, run_suite
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="ncpipe hot-path benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the benchmarks and write the metrics as JSON")
+    run.add_argument("--output", "-o", help="Write the results to this file (default: stdout)")
+    run.add_argument("--quick", action="store_true", help="Small workloads for a fast check")
+    run.add_argument("--only", help=f"Comma-separated groups to run ({', '.join(GROUPS)})")
+    run.add_argument("--repeat", type=int, help="Repetitions per measurement")
+    run.add_argument("--files", type=int, help="Files in the synthetic script folder")
+    run.add_argument("--functions", type=int, help="block_* functions per file")
+    run.add_argument("--graph-size", type=int, help="Nodes per synthetic graph")
+    run.add_argument("--clients", type=int, help="Websocket clients in the broadcast benchmark")
+    run.add_argument("--messages", type=int, help="Messages published in the broadcast benchmark")
+
+    check = commands.add_parser("compare", help="Compare two result files; exit 1 when a metric regressed")
+    check.add_argument("baseline")
+    check.add_argument("current")
+    check.add_argument("--threshold", type=float, default=0.25,
+                       help="Allowed relative slowdown before a metric counts as regressed (default 0.25)")
+    check.add_argument("--metric-threshold", action="append", default=[], metavar="PREFIX=VALUE",
+                       help="Threshold for metrics starting with PREFIX, e.g. system_resources=0.5")
+    return parser.parse_args(argv)
+
+
+def _config(args: argparse.Namespace) -> SuiteConfig:
+    overrides = {key: value for key, value in {
+        "repeat": args.repeat, "files": args.files, "functions_per_file": args.functions,
+        "graph_size": args.graph_size, "clients": args.clients, "messages": args.messages,
+    }.items() if value is not None}
+    if args.only:
+        groups = tuple(group.strip() for group in args.only.split(",") if group.strip())
+        unknown = set(groups) - set(GROUPS)
+        if unknown:
+            raise ValueError(f"Unknown benchmark group(s): {', '.join(sorted(unknown))}")
+        overrides["groups"] = groups
+    return SuiteConfig.quick(**overrides) if args.quick else SuiteConfig(**overrides)
+
+
+def format_rows(rows) -> str:
+    table = [("metric", "baseline", "current", "change", "")]
+    for row in rows:
+        change = "-" if row["change"] is None else f"{row['change']:+.1%}"
+        table.append((row["name"], "-" if row["baseline"] is None else f"{row['baseline']:g}",
+                      "-" if row["current"] is None else f"{row['current']:g} {row['unit']}",
+                      change, "REGRESSED" if row["regressed"] else ""))
+    widths = [max(len(line[column]) for line in table) for column in range(len(table[0]))]
+    return "\n".join("  ".join(value.ljust(width) for value, width in zip(line, widths)).rstrip() for line in table)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.command == "run":
+        try:
+            config = _config(args)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        document = run_suite(config, log=lambda message: print(message, file=sys.stderr))
+        text = json.dumps(document, indent=2)
+        if args.output:
+            with open(args.output, "w") as file:
+                file.write(text + "\n")
+            for name, metric in document["metrics"].items():
+                print(f"{name}: {metric['value']:g} {metric['unit']}")
+        else:
+            print(text)
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    try:
+        thresholds = {prefix: float(value) for prefix, value in
+                      (item.split("=", 1) for item in args.metric_threshold)}
+    except ValueError:
+        print("--metric-threshold expects PREFIX=VALUE", file=sys.stderr)
+        return 2
+    if baseline.get("config") != current.get("config") or baseline.get("machine") != current.get("machine"):
+        print("Warning: the result files were produced with different settings or on different machines",
+              file=sys.stderr)
+    rows = compare(baseline, current, args.threshold, thresholds)
+    print(format_rows(rows))
+    regressed = [row["name"] for row in rows if row["regressed"]]
+    if regressed:
+        print(f"{len(regressed)} metric(s) regressed: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""Benchmark measurements: folder analysis, HTTP endpoints, graph execution and broadcasting."""
+
+import asyncio
+import http.client
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.synthetic import GRAPH_SHAPES, make_graph, write_noop_folder, write_script_folder
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GROUPS = ("analysis", "http", "execute", "broadcast")
+
+SERVER_SCRIPT = """
+import sys
+sys.path.insert(0, {server_dir!r})
+import server
+server.app.run(host="127.0.0.1", port={port}, single_process=True, access_log=False, motd=False)
+"""
+
+
+@dataclass
+class SuiteConfig:
+    files: int = 80
+    functions_per_file: int = 6
+    body_lines: int = 40
+    graph_size: int = 32
+    repeat: int = 5
+    clients: int = 20
+    messages: int = 2000
+    groups: tuple = GROUPS
+
+    @classmethod
+    def quick(cls, **overrides) -> 'SuiteConfig':
+        """Small workloads for a fast check (not comparable with full runs)."""
+        return cls(**{"files": 16, "functions_per_file": 4, "graph_size": 8, "repeat": 3,
+                      "clients": 5, "messages": 500, **overrides})
+
+
+class Results:
+    """Metrics by name: {"value", "unit", "better", "samples"}."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, value: float, unit: str, better: str = "lower", samples: int = 1):
+        self.metrics[name] = {"value": round(value, 4), "unit": unit, "better": better, "samples": samples}
+
+    def add_timings(self, name: str, seconds: List[float], per: int = 1):
+        """Median (and p95 for larger samples) of durations, in milliseconds per item."""
+        values = [1000 * value / per for value in seconds]
+        self.add(f"{name}.median_ms", statistics.median(values), "ms", samples=len(values))
+        if len(values) >= 20:
+            self.add(f"{name}.p95_ms", statistics.quantiles(values, n=20)[-1], "ms", samples=len(values))
+
+
+def timed(func: Callable[[], Any], repeat: int) -> List[float]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerProcess:
+    """The ncpipe server on a free port in a subprocess, with caches in a scratch directory."""
+
+    def __init__(self, scratch: str, startup_timeout: float = 30.0):
+        self.port = _free_port()
+        self.scratch = scratch
+        self.startup_timeout = startup_timeout
+        self.process: Optional[subprocess.Popen] = None
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def __enter__(self) -> 'ServerProcess':
+        env = {**os.environ,
+               "NCPIPE_CACHE_DIR": os.path.join(self.scratch, "cache"),
+               "NCPIPE_RESULTS_DIR": os.path.join(self.scratch, "runs"),
+               "NCPIPE_MANIFEST_DIR": os.path.join(self.scratch, "manifests"),
+               "NCPIPE_HISTORY_DB": os.path.join(self.scratch, "history.sqlite3"),
+               "NCPIPE_CHECKPOINT_DIR": os.path.join(self.scratch, "checkpoints"),
+               "NCPIPE_SYMBOL_DB": os.path.join(self.scratch, "symbols.sqlite3"),
+               "NCPIPE_ANALYSIS_DIR": ""}
+        script = SERVER_SCRIPT.format(server_dir=SERVER_DIR, port=self.port)
+        self.process = subprocess.Popen([sys.executable, "-c", script], cwd=SERVER_DIR, env=env,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        deadline = time.time() + self.startup_timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited during startup:\n{self.process.stderr.read().decode()}")
+            try:
+                self.request("GET", "/system-resources")
+                return self
+            except OSError:
+                self._connection = None
+                time.sleep(0.1)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"Server did not start within {self.startup_timeout} s")
+
+    def __exit__(self, *exc_info):
+        if self._connection is not None:
+            self._connection.close()
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def request(self, method: str, path: str, body: Any = None):
+        """(status, decoded JSON) over a kept-alive connection."""
+        if self._connection is None:
+            self._connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=300)
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        try:
+            self._connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+            response = self._connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self._connection.close()
+            self._connection = None
+            raise
+        return response.status, json.loads(data) if data else None
+
+    def post(self, path: str, body: Any) -> Any:
+        status, data = self.request("POST", path, body)
+        if status != 200:
+            raise RuntimeError(f"POST {path} returned {status}: {data}")
+        return data
+
+
+def bench_analysis(results: Results, folder: str, config: SuiteConfig):
+    from function_analyzer import analyze_folder
+
+    results.add_timings("analyze_folder.serial", timed(lambda: analyze_folder(folder, workers=1), config.repeat))
+    results.add_timings("analyze_folder.parallel", timed(lambda: analyze_folder(folder, workers=None), config.repeat))
+    results.add("analyze_folder.functions", config.files * config.functions_per_file, "functions", "info")
+
+
+def bench_http(results: Results, server: ServerProcess, folder: str, function_names: List[str], config: SuiteConfig):
+    body = {"folder_path": folder}
+    results.add_timings("list_files.cold", timed(lambda: server.post("/list-files", body), 1))
+    results.add_timings("list_files.warm", timed(lambda: server.post("/list-files", body), config.repeat * 4))
+
+    # One edited file per request: only that file is analyzed again
+    files = sorted(name for name in os.listdir(folder) if name.endswith(".py"))
+    edits = []
+    for index in range(config.repeat):
+        path = os.path.join(folder, files[index % len(files)])
+        with open(path, "a") as file:
+            file.write(f"# edit {index}\n")
+        future = time.time() + index + 1  # Make sure the modification time changes
+        os.utime(path, (future, future))
+        edits.extend(timed(lambda: server.post("/list-files", body), 1))
+    results.add_timings("list_files.one_file_changed", edits)
+
+    names = [function_names[index * len(function_names) // config.repeat] for index in range(config.repeat)]
+    connectable = []
+    for name in names * 4:
+        connectable.extend(timed(lambda: server.post("/get-connectable-functions",
+                                                     {"folder_path": folder, "function_name": name}), 1))
+    results.add_timings("get_connectable_functions", connectable)
+
+    server.post("/symbols/folders", {"folder_path": folder})
+    searches = []
+    for name in names * 4:
+        for match, query in (("prefix", name[:len(name) // 2]), ("text", name.split("_")[2])):
+            path = f"/symbols/search?match={match}&q={query}&limit=20"
+            searches.extend(timed(lambda: server.request("GET", path), 1))
+    results.add_timings("symbols_search", searches)
+
+    results.add_timings("system_resources", timed(lambda: server.request("GET", "/system-resources"),
+                                                  max(20, config.repeat * 10)))
+
+
+def bench_execute(results: Results, server: ServerProcess, noop_folder: str, config: SuiteConfig):
+    for shape in GRAPH_SHAPES:
+        for executor in ("process", "thread"):
+            graph = make_graph(shape, config.graph_size, noop_folder, executor)
+            size = len(graph["nodes"])
+            uncached = {**graph, "cache": False}
+            server.post("/execute-graph", uncached)  # Warm the worker pools
+            results.add_timings(f"execute_graph.{shape}.{executor}.per_node",
+                                timed(lambda: server.post("/execute-graph", uncached), config.repeat), per=size)
+
+    graph = make_graph("chain", config.graph_size, noop_folder)
+    server.post("/execute-graph", graph)
+    results.add_timings("execute_graph.chain.cached.per_node",
+                        timed(lambda: server.post("/execute-graph", graph), config.repeat), per=len(graph["nodes"]))
+
+
+class _NullSocket:
+    """Stands in for a websocket; send only yields to the event loop."""
+
+    def __init__(self):
+        self.received = 0
+
+    async def send(self, payload):
+        self.received += 1
+        await asyncio.sleep(0)
+
+    async def close(self, code=None, reason=None):
+        pass
+
+
+async def _broadcast_round(clients: int, messages: int):
+    from broadcaster import Broadcaster
+
+    broadcaster = Broadcaster(max_queue=messages + 1, heartbeat_interval=0)
+    sockets = [_NullSocket() for _ in range(clients)]
+    for ws in sockets:
+        broadcaster.register(ws)
+    # Distinct nodes, so nothing is coalesced and every message is delivered
+    batch = [{"type": "node_finished", "run_id": "bench", "node_id": f"n{index}", "result": index}
+             for index in range(messages)]
+
+    start = time.perf_counter()
+    for message in batch:
+        broadcaster.publish(message)
+    published = time.perf_counter() - start
+    while sum(ws.received for ws in sockets) < clients * messages:
+        await asyncio.sleep(0)
+    delivered = time.perf_counter() - start
+    await broadcaster.close()
+    return published, delivered
+
+
+def bench_broadcast(results: Results, config: SuiteConfig):
+    rounds = [asyncio.run(_broadcast_round(config.clients, config.messages)) for _ in range(config.repeat)]
+    results.add("broadcast.publish_us_per_message",
+                statistics.median(1e6 * published / config.messages for published, _ in rounds), "us",
+                samples=len(rounds))
+    results.add("broadcast.deliveries_per_s",
+                statistics.median(config.clients * config.messages / delivered for _, delivered in rounds),
+                "messages/s", "higher", samples=len(rounds))
+
+
+def run_suite(config: SuiteConfig, log: Callable[[str], None] = print) -> Dict[str, Any]:
+    """Run the selected benchmark groups; returns the JSON document written by `run`."""
+    results = Results()
+    with tempfile.TemporaryDirectory(prefix="ncpipe-bench-") as scratch:
+        folder = os.path.join(scratch, "scripts")
+        function_names = write_script_folder(folder, config.files, config.functions_per_file, config.body_lines)
+        noop_folder = write_noop_folder(os.path.join(scratch, "noop"))
+
+        if "analysis" in config.groups:
+            log("analysis: analyze_folder")
+            bench_analysis(results, folder, config)
+        if "http" in config.groups or "execute" in config.groups:
+            with ServerProcess(scratch) as server:
+                if "http" in config.groups:
+                    log("http: /list-files, /get-connectable-functions, /symbols/search, /system-resources")
+                    bench_http(results, server, folder, function_names, config)
+                if "execute" in config.groups:
+                    log("execute: /execute-graph with no-op nodes")
+                    bench_execute(results, server, noop_folder, config)
+        if "broadcast" in config.groups:
+            log("broadcast: websocket fan-out")
+            bench_broadcast(results, config)
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "config": {**asdict(config), "groups": list(config.groups)},
+        "metrics": results.metrics,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.25,
+            thresholds: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """Per-metric change from baseline to current; "regressed" when worse by more than the threshold.
+
+    change is relative and positive when the metric got worse, whatever its
+    direction. thresholds overrides the threshold for metrics by name prefix.
+    """
+    thresholds = thresholds or {}
+    rows = []
+    for name in sorted(set(baseline["metrics"]) | set(current["metrics"])):
+        before, after = baseline["metrics"].get(name), current["metrics"].get(name)
+        row = {"name": name, "baseline": before and before["value"], "current": after and after["value"],
+               "unit": (after or before)["unit"], "change": None, "regressed": False}
+        if before and after and before["better"] != "info" and before["value"]:
+            change = (after["value"] - before["value"]) / before["value"]
+            row["change"] = -change if before["better"] == "higher" else change
+            limit = next((value for prefix, value in sorted(thresholds.items(), key=lambda item: -len(item[0]))
+                          if name.startswith(prefix)), threshold)
+            row["regressed"] = row["change"] > limit
+        rows.append(row)
+    return rows
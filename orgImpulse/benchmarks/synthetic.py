@@ -0,0 +1,124 @@
+"""Synthetic script folders and graphs for the benchmarks."""
+
+import os
+import random
+from typing import Any, Dict, List
+
+GRAPH_SHAPES = ("chain", "fanout", "diamond")
+
+STAGES = ("illumination", "segmentation", "features", "qc", "normalize", "embedding", "clustering", "report")
+
+NOOP_MODULE = '''"""No-op blocks for measuring scheduling overhead."""
+
+
+def block_noop(value=None):
+    return value
+'''
+
+
+def _path_expression(rng: random.Random, folder: str) -> str:
+    """A loadPath/savePath right-hand side in one of the styles real blocks use."""
+    style = rng.randrange(4)
+    if style == 0:
+        return f'os.path.join(project, plate, "{folder}")'
+    if style == 1:
+        return f'f"{{project}}/{{plate}}/{folder}"'
+    if style == 2:
+        return f'project + "/" + plate + "/{folder}"'
+    return f'os.path.join(PROJECT_ROOT, "{folder}")'
+
+
+def _function_source(rng: random.Random, name: str, input_folder: str, output_folder: str, body_lines: int) -> str:
+    lines = [
+        f'def {name}(project, plate, channel="DAPI", threshold=0.5, overwrite=False):',
+        f'    """Synthetic {name.split("_")[2]} block: {input_folder} -> {output_folder}."""',
+        f'    loadPath = {_path_expression(rng, input_folder)}',
+    ]
+    if rng.random() < 0.5:
+        lines += [f'    saveFolder = "{output_folder}"',
+                  '    savePath = os.path.join(project, plate, saveFolder)']
+    else:
+        lines.append(f'    savePath = {_path_expression(rng, output_folder)}')
+    lines += [
+        '    os.makedirs(savePath, exist_ok=True)',
+        '    files = sorted(f for f in os.listdir(loadPath) if f.endswith(".tif"))',
+        '    summary = {}',
+        '    for index, filename in enumerate(files):',
+        '        target = os.path.join(savePath, filename)',
+        '        if os.path.exists(target) and not overwrite:',
+        '            continue',
+    ]
+    for index in range(max(0, body_lines - len(lines) - 2)):
+        lines.append(f'        summary[filename + "_{index}"] = len(filename) * threshold + {index}')
+    lines += ['    print(f"{channel}: {len(summary)} values")', '    return summary']
+    return "\n".join(lines)
+
+
+def write_script_folder(path: str, files: int = 8, functions_per_file: int = 6, body_lines: int = 40,
+                        seed: int = 0) -> List[str]:
+    """Write files block_o<k>_<stage>.py of functions_per_file block_* functions each.
+
+    Functions of file k read the output folder of a function of file k - 1,
+    so the folder forms one pipeline. Returns the function names.
+    """
+    rng = random.Random(seed)
+    os.makedirs(path, exist_ok=True)
+    names = []
+    previous_outputs = ["block_o0_raw_images"]
+    for file_index in range(1, files + 1):
+        stage = STAGES[(file_index - 1) % len(STAGES)]
+        functions = ['import os', '', 'PROJECT_ROOT = "/data/project"']
+        outputs = []
+        for function_index in range(functions_per_file):
+            name = f"block_o{file_index}_{stage}_{function_index}"
+            output_folder = f"{name}_output"
+            functions += ['', '', _function_source(rng, name, rng.choice(previous_outputs), output_folder, body_lines)]
+            outputs.append(output_folder)
+            names.append(name)
+        with open(os.path.join(path, f"block_o{file_index}_{stage}.py"), "w") as file:
+            file.write("\n".join(functions) + "\n")
+        previous_outputs = outputs
+    return names
+
+
+def write_noop_folder(path: str) -> str:
+    """Folder with the block_noop function used by the execution benchmarks."""
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "noop_blocks.py"), "w") as file:
+        file.write(NOOP_MODULE)
+    return path
+
+
+def _node(node_id: str, folder: str, index: int, executor: str) -> Dict[str, Any]:
+    data = {"label": "block_noop", "folderPath": folder, "inputs": {"value": index}}
+    if executor != "process":
+        data["resources"] = {"executor": executor}
+    return {"id": node_id, "type": "custom", "position": {"x": 0, "y": 100 * index}, "data": data}
+
+
+def _edge(source: str, target: str, param: bool = True) -> Dict[str, Any]:
+    edge = {"id": f"e_{source}_{target}", "source": source, "target": target}
+    if param:
+        edge["data"] = {"param": "value"}
+    return edge
+
+
+def make_graph(shape: str, size: int, folder: str, executor: str = "process") -> Dict[str, List[Dict[str, Any]]]:
+    """{"nodes", "edges"} of size block_noop nodes.
+
+    chain: each node passes its value to the next; fanout: one root feeding
+    every other node; diamond: a root, size - 2 parallel nodes and a join.
+    """
+    if shape not in GRAPH_SHAPES:
+        raise ValueError(f"Unknown graph shape '{shape}' (expected one of {', '.join(GRAPH_SHAPES)})")
+    size = max(size, 3 if shape == "diamond" else 1)
+    ids = [f"n{index}" for index in range(size)]
+    nodes = [_node(node_id, folder, index, executor) for index, node_id in enumerate(ids)]
+    if shape == "chain":
+        edges = [_edge(source, target) for source, target in zip(ids, ids[1:])]
+    elif shape == "fanout":
+        edges = [_edge(ids[0], target) for target in ids[1:]]
+    else:
+        edges = [_edge(ids[0], target) for target in ids[1:-1]]
+        edges += [_edge(source, ids[-1], param=False) for source in ids[1:-1]]
+    return {"nodes": nodes, "edges": edges}
@@ -0,0 +1,207 @@
+"""
+Websocket Broadcaster
+=====================
+Fan-out of server messages to /realtime-updates clients without letting a
+slow or dead client hold anyone else up.
+
+publish() serialises a message once and only enqueues it; every client has a
+bounded outbound queue drained by its own sender task, so publishing never
+waits on a socket. Per client:
+
+- Node messages (node_started / node_progress / node_finished /
+  node_failed) are coalesced: a newer message for the same node replaces the
+  queued one.
+- When the queue is full, the oldest queued node_started or node_progress is
+  dropped; a node's final state (node_finished / node_failed) never is. If
+  only such essential messages are queued, the client cannot keep up and is
+  disconnected; on reconnect it resynchronises (graph_hello, GET /runs/<id>).
+- A send that takes longer than send_timeout, or a ping that gets no pong
+  within heartbeat_timeout, evicts the client.
+- Messages carrying a run_id only go to clients subscribed to that run. New
+  clients follow every run until they send {"type": "subscribe", "runs": [...]};
+  "runs": "*" goes back to following everything.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+# Later messages of these types supersede earlier ones for the same node
+PROGRESS_TYPES = ("node_started", "node_progress", "node_finished", "node_failed")
+# Only these may be dropped from a full queue: a later message tells the same story
+DROPPABLE_TYPES = ("node_started", "node_progress")
+RUN_END_TYPES = ("run_finished", "run_failed", "run_cancelled")
+
+
+def coalesce_key(message: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    if message.get("type") in PROGRESS_TYPES:
+        return (str(message.get("run_id")), str(message.get("node_id")))
+    return None
+
+
+class ClientConnection:
+    """Outbound queue and subscriptions of one websocket client."""
+
+    def __init__(self, ws, max_queue: int):
+        self.ws = ws
+        self.client_id = uuid.uuid4().hex[:12]
+        self.max_queue = max_queue
+        self.queue: Deque[Tuple[Optional[Tuple[str, str]], str, bool]] = deque()  # (key, payload, droppable)
+        self.runs: Optional[Set[str]] = None  # None: every run
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+        self.last_pong = time.time()
+        self.sender: Optional[asyncio.Task] = None
+        self.heartbeat: Optional[asyncio.Task] = None
+
+    def wants(self, message: Dict[str, Any]) -> bool:
+        run_id = message.get("run_id")
+        return run_id is None or self.runs is None or run_id in self.runs
+
+    def enqueue(self, payload: str, key: Optional[Tuple[str, str]] = None, droppable: bool = False) -> bool:
+        """Queue a payload; returns False when the client is too far behind to keep."""
+        if self.closed:
+            return True
+        if key is not None:
+            for index, (queued_key, _, _) in enumerate(self.queue):
+                if queued_key == key:
+                    self.queue[index] = (key, payload, droppable)
+                    return True
+        if len(self.queue) >= self.max_queue:
+            for index, (_, _, queued_droppable) in enumerate(self.queue):
+                if queued_droppable:
+                    del self.queue[index]
+                    self.dropped += 1
+                    break
+            else:
+                return False
+        self.queue.append((key, payload, droppable))
+        self.ready.set()
+        return True
+
+
+class Broadcaster:
+    """Bounded, per-client queues with a sender task each."""
+
+    def __init__(self, max_queue: int = 256, send_timeout: float = 10.0,
+                 heartbeat_interval: float = 15.0, heartbeat_timeout: float = 10.0):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self._clients: Dict[Any, ClientConnection] = {}
+
+    @property
+    def clients(self) -> List[ClientConnection]:
+        return list(self._clients.values())
+
+    def get(self, client_id: str) -> Optional[ClientConnection]:
+        for connection in self._clients.values():
+            if connection.client_id == client_id:
+                return connection
+        return None
+
+    def register(self, ws) -> ClientConnection:
+        connection = ClientConnection(ws, self.max_queue)
+        self._clients[ws] = connection
+        connection.sender = asyncio.ensure_future(self._send_loop(connection))
+        if self.heartbeat_interval:
+            connection.heartbeat = asyncio.ensure_future(self._heartbeat_loop(connection))
+        return connection
+
+    def unregister(self, ws):
+        connection = self._clients.pop(ws, None)
+        if connection is None:
+            return
+        connection.closed = True
+        for task in (connection.sender, connection.heartbeat):
+            if task is not None and task is not asyncio.current_task():
+                task.cancel()
+
+    def publish(self, message: Dict[str, Any]):
+        """Queue a message for every interested client; never waits on a socket."""
+        payload = json.dumps(message)
+        key = coalesce_key(message)
+        droppable = message.get("type") in DROPPABLE_TYPES
+        run_ended = message.get("type") in RUN_END_TYPES
+        for connection in list(self._clients.values()):
+            if not connection.wants(message):
+                continue
+            if not connection.enqueue(payload, key, droppable):
+                print(f"WebSocket client {connection.client_id} is too slow, disconnecting")
+                self.evict(connection)
+            elif run_ended and connection.runs is not None:
+                connection.runs.discard(message.get("run_id"))
+
+    def send_to(self, connection: ClientConnection, message: Dict[str, Any]):
+        """Queue a reply for a single client (ordered with its broadcasts)."""
+        if not connection.enqueue(json.dumps(message)):
+            self.evict(connection)
+
+    def subscribe(self, connection: ClientConnection, runs: Any):
+        if runs == "*":
+            connection.runs = None
+        else:
+            connection.runs = (connection.runs or set()) | {str(run_id) for run_id in runs or []}
+
+    def unsubscribe(self, connection: ClientConnection, runs: Iterable[Any]):
+        if connection.runs is None:
+            connection.runs = set()
+        connection.runs -= {str(run_id) for run_id in runs or []}
+
+    def evict(self, connection: ClientConnection) -> asyncio.Future:
+        """Drop a client at once; its socket is closed in the background."""
+        self.unregister(connection.ws)
+        return asyncio.ensure_future(self._close(connection))
+
+    async def _close(self, connection: ClientConnection):
+        try:
+            await asyncio.wait_for(connection.ws.close(code=1001, reason="evicted"), self.send_timeout)
+        except Exception:
+            fail = getattr(connection.ws, "fail_connection", None)
+            if fail is not None:
+                fail()
+
+    async def _send_loop(self, connection: ClientConnection):
+        while not connection.closed:
+            await connection.ready.wait()
+            while connection.queue:
+                _, payload, _ = connection.queue.popleft()
+                try:
+                    await asyncio.wait_for(connection.ws.send(payload), self.send_timeout)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"WebSocket send error ({connection.client_id}): {e}")
+                    self.evict(connection)
+                    return
+            connection.ready.clear()
+
+    async def _heartbeat_loop(self, connection: ClientConnection):
+        while not connection.closed:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                pong = await connection.ws.ping()
+                await asyncio.wait_for(pong, self.heartbeat_timeout)
+                connection.last_pong = time.time()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print(f"WebSocket client {connection.client_id} missed its heartbeat, disconnecting")
+                self.evict(connection)
+                return
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [{"client_id": connection.client_id, "queued": len(connection.queue),
+                 "dropped": connection.dropped, "runs": sorted(connection.runs) if connection.runs is not None else "*",
+                 "last_pong": connection.last_pong}
+                for connection in self._clients.values()]
+
+    async def close(self):
+        closing = [self.evict(connection) for connection in self.clients]
+        if closing:
+            await asyncio.gather(*closing, return_exceptions=True)
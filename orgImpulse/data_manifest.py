@@ -0,0 +1,279 @@
+"""
+Data Manifests
+==============
+Make-style staleness checks on the data folders a block reads and writes.
+
+The analyzer knows the block_ folders each function loads from and saves to
+(input_folders / output_folders, see function_analyzer.py). In make mode the
+scheduler locates those folders on disk for every node, resolving the folder
+names against the node's string arguments the way blocks build their paths
+(os.path.join(project, plate, "block_o2_...")), or takes them from
+node["data"]["data_paths"] = {"inputs": [...], "outputs": [...]}. A node is
+skipped when its outputs are up to date:
+
+- with a stored manifest of its last execution: same function source, same
+  arguments, and every input and output file unchanged (size and mtime, or
+  content hash in hash mode);
+- without one (data produced before, or outside ncpipe): every output file
+  is newer than every input file and than the function's source file.
+
+Only nodes that exchange data with their neighbours through folders alone
+can be skipped. Stale nodes always execute in make mode, even when the result
+cache has their return value, since their output files are what downstream
+nodes read.
+
+Manifests are JSON files in NCPIPE_MANIFEST_DIR (default
+~/.cache/ncpipe/manifests), keyed by function and output folders, so they
+survive server restarts and do not depend on the result cache.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from function_analyzer import FunctionAnalyzer
+
+DEFAULT_MANIFEST_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ncpipe", "manifests")
+MAKE_MODES = ("mtime", "hash")
+
+# File entry: [size, mtime_ns, sha256 or None]
+Manifest = Dict[str, list]
+
+_folder_names: Dict[Tuple[str, str], Dict[str, Tuple[List[str], List[str]]]] = {}
+_folder_names_lock = threading.Lock()
+
+
+def function_folders(function_file: str, source_hash: str, func_name: str) -> Tuple[List[str], List[str]]:
+    """(input_folders, output_folders) the analyzer finds for a function; memoised per file version."""
+    key = (function_file, source_hash)
+    with _folder_names_lock:
+        folders = _folder_names.get(key)
+    if folders is None:
+        folders = {meta.name: (meta.input_folders, meta.output_folders)
+                   for meta in FunctionAnalyzer().analyze_file(function_file)}
+        with _folder_names_lock:
+            _folder_names[key] = folders
+    return folders.get(func_name, ([], []))
+
+
+def _candidate_bases(args: List[Any], folder_path: str) -> List[str]:
+    """Directories named by string arguments, and their subfolders named by other arguments (project/plate)."""
+    strings = [value for value in args if isinstance(value, str) and value]
+    bases = []
+    for value in strings:
+        path = os.path.normpath(value if os.path.isabs(value) else os.path.join(folder_path, value))
+        if os.path.isdir(path) and path not in bases:
+            bases.append(path)
+    nested = []
+    for base in bases:
+        for part in strings:
+            if os.path.isabs(part) or os.sep in part.strip(os.sep):
+                continue
+            path = os.path.join(base, part)
+            if os.path.isdir(path) and path not in bases and path not in nested:
+                nested.append(path)
+    return nested + bases + [folder_path]
+
+
+def locate_folder(name: str, bases: List[str]) -> Optional[str]:
+    for base in bases:
+        if os.path.basename(base) == name:
+            return base
+        path = os.path.join(base, name)
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+def data_folders(task) -> Tuple[Dict[str, Optional[str]], Dict[str, Optional[str]]]:
+    """({input name: path or None}, {output name: path or None}) of a resolved NodeTask."""
+    if task.data_paths:
+        def resolve(paths):
+            return {path: os.path.normpath(os.path.join(task.folder_path, path)) for path in paths or []}
+        return resolve(task.data_paths.get("inputs")), resolve(task.data_paths.get("outputs"))
+    input_names, output_names = function_folders(task.function_file, task.source_hash, task.func_name)
+    bases = _candidate_bases(task.args, task.folder_path)
+    return ({name: locate_folder(name, bases) for name in input_names},
+            {name: locate_folder(name, bases) for name in output_names})
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan_folder(path: str, hash_files: bool = False, previous: Optional[Manifest] = None) -> Manifest:
+    """Size, mtime and (in hash mode) content hash of every file below path.
+
+    Hashes of files whose size and mtime match the previous manifest are reused.
+    """
+    previous = previous or {}
+    manifest = {}
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for filename in files:
+            if filename.startswith("."):
+                continue
+            full_path = os.path.join(root, filename)
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue
+            relative = os.path.relpath(full_path, path)
+            entry = [stat.st_size, stat.st_mtime_ns, None]
+            if hash_files:
+                old = previous.get(relative)
+                if old and old[0] == entry[0] and old[1] == entry[1] and old[2]:
+                    entry[2] = old[2]
+                else:
+                    entry[2] = _file_hash(full_path)
+            manifest[relative] = entry
+    return manifest
+
+
+def manifest_change(old: Manifest, new: Manifest) -> Optional[str]:
+    """First difference between two manifests of a folder, or None."""
+    for relative in sorted(set(old) | set(new)):
+        before, after = old.get(relative), new.get(relative)
+        if before is None:
+            return f"{relative} added"
+        if after is None:
+            return f"{relative} removed"
+        if before[2] and after[2]:
+            if before[0] != after[0] or before[2] != after[2]:
+                return f"{relative} changed"
+        elif before[:2] != after[:2]:
+            return f"{relative} changed"
+    return None
+
+
+@dataclass
+class Freshness:
+    """Outcome of a staleness check of one node."""
+    fresh: bool
+    reason: str
+    inputs: Dict[str, Manifest] = field(default_factory=dict)  # folder path -> manifest
+    outputs: Dict[str, Manifest] = field(default_factory=dict)
+
+
+def _args_digest(args: List[Any]) -> str:
+    return hashlib.sha256(json.dumps(args, sort_keys=True, default=repr).encode()).hexdigest()
+
+
+class ManifestStore:
+    """Manifests of the last execution of each node target, one JSON file per target."""
+
+    def __init__(self, manifest_dir: str = DEFAULT_MANIFEST_DIR):
+        self.manifest_dir = manifest_dir
+        os.makedirs(manifest_dir, exist_ok=True)
+
+    @staticmethod
+    def target_key(task, output_paths: List[str]) -> str:
+        payload = json.dumps({"function": task.func_name, "folder": task.folder_path,
+                              "outputs": sorted(output_paths)})
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.manifest_dir, key[:2], key + ".json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable manifest {key}: {e}")
+            return None
+
+    def put(self, key: str, record: Dict[str, Any]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump(record, file)
+        os.replace(tmp_path, path)
+
+    def check(self, task, mode: str = "mtime") -> Freshness:
+        """Whether a resolved NodeTask's outputs are up to date with its inputs and source."""
+        hash_files = mode == "hash"
+        inputs, outputs = data_folders(task)
+        if not outputs:
+            return Freshness(False, f"no output folders known for '{task.func_name}'")
+        missing = [name for name, path in inputs.items() if path is None or not os.path.isdir(path)]
+        if missing:
+            return Freshness(False, f"input folder {missing[0]} not found")
+
+        key = self.target_key(task, [path for path in outputs.values() if path])
+        record = self.get(key) or {}
+        previous_inputs = record.get("inputs", {})
+        previous_outputs = record.get("outputs", {})
+        check = Freshness(False, "", inputs={
+            path: scan_folder(path, hash_files, previous_inputs.get(path)) for path in inputs.values()
+        })
+        for name, path in outputs.items():
+            if path is None or not os.path.isdir(path):
+                check.reason = f"output folder {name} does not exist"
+                return check
+            check.outputs[path] = scan_folder(path, hash_files, previous_outputs.get(path))
+            if not check.outputs[path]:
+                check.reason = f"output folder {name} is empty"
+                return check
+
+        if record:
+            if record.get("source_hash") != task.source_hash:
+                check.reason = f"source of {os.path.basename(task.function_file)} changed"
+            elif record.get("args") != _args_digest(task.args):
+                check.reason = "arguments changed"
+            elif sorted(previous_inputs) != sorted(check.inputs):
+                check.reason = "input folders changed"
+            else:
+                for kind, old, new in (("input", previous_inputs, check.inputs),
+                                       ("output", previous_outputs, check.outputs)):
+                    for path in new:
+                        change = manifest_change(old.get(path, {}), new[path])
+                        if change:
+                            check.reason = f"{kind} {os.path.basename(path)}/{change}"
+                            return check
+                check.fresh, check.reason = True, "outputs match the manifest of the last run"
+            return check
+
+        # No manifest yet: plain make rule on modification times
+        oldest_output = min(entry[1] for manifest in check.outputs.values() for entry in manifest.values())
+        newest_input = max((entry[1] for manifest in check.inputs.values() for entry in manifest.values()),
+                           default=0)
+        if newest_input > oldest_output:
+            check.reason = "inputs are newer than the outputs"
+        elif os.stat(task.function_file).st_mtime_ns > oldest_output:
+            check.reason = f"{os.path.basename(task.function_file)} is newer than the outputs"
+        else:
+            check.fresh, check.reason = True, "outputs are newer than the inputs and the source"
+        return check
+
+    def record(self, task, check: Freshness, mode: str = "mtime"):
+        """Store the manifest of a node that was just executed (or found fresh)."""
+        hash_files = mode == "hash"
+        inputs, outputs = data_folders(task)
+        output_paths = [path for path in outputs.values() if path and os.path.isdir(path)]
+        if not output_paths or len(output_paths) != len(outputs):
+            return
+        record = {
+            "function": task.func_name,
+            "source_hash": task.source_hash,
+            "args": _args_digest(task.args),
+            "inputs": check.inputs or {path: scan_folder(path, hash_files) for path in inputs.values() if path},
+            "outputs": {path: scan_folder(path, hash_files, check.outputs.get(path)) for path in output_paths},
+        }
+        self.put(self.target_key(task, output_paths), record)
+
+
+def open_manifest_store(manifest_dir: Optional[str] = None) -> ManifestStore:
+    """Open a ManifestStore, falling back to the NCPIPE_MANIFEST_DIR setting."""
+    return ManifestStore(manifest_dir or os.environ.get("NCPIPE_MANIFEST_DIR") or DEFAULT_MANIFEST_DIR)
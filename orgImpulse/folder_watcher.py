@@ -0,0 +1,147 @@
+"""
+Folder Watcher
+==============
+Watches the folders selected in the UI and pushes compact function deltas to
+websocket clients, so the sidebar stays live without re-sending /list-files.
+
+Change detection is pure Python: every interval the watcher refreshes each
+watched folder through the FolderAnalysisCache, which only stats files and
+re-analyzes the ones that changed. When the folder's analyzer changed, the
+watcher diffs the sidebar entries and sends the connections watching the
+folder:
+
+    {"type": "functions_delta", "folder_path": ...,
+     "added": [entry, ...], "modified": [entry, ...], "removed": [name, ...]}
+
+where entries have the same shape as the /list-files "files" items.
+
+A folder is watched for as long as some websocket connection uses it:
+/list-files records the client_id it is given, and a folder is dropped once
+every client that listed it sent unwatch_folder or disconnected. Listings
+without a client_id receive no deltas; they keep the folder until an unwatch
+or a disconnect leaves no client behind.
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Set
+
+from analysis_cache import FolderAnalysisCache
+from broadcaster import Broadcaster
+from function_analyzer import FunctionAnalyzer
+
+
+def diff_entries(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Compare two {functionName: entry} maps."""
+    return {
+        "added": [new[name] for name in new if name not in old],
+        "modified": [new[name] for name in new if name in old and old[name] != new[name]],
+        "removed": [name for name in old if name not in new],
+    }
+
+
+class _WatchedFolder:
+    def __init__(self, analyzer: Optional[FunctionAnalyzer], recursive: bool = False):
+        self.analyzer = analyzer
+        self.recursive = recursive
+        self.entries = self._entries(analyzer)
+        self.clients: Set[Optional[str]] = set()  # None for listings without a client_id
+
+    @staticmethod
+    def _entries(analyzer: Optional[FunctionAnalyzer]) -> Dict[str, Dict[str, Any]]:
+        if analyzer is None:
+            return {}
+        return {entry["functionName"]: entry for entry in analyzer.to_file_list()}
+
+
+class FolderWatcher:
+    """Polls watched folders and sends add/remove/modify deltas to the clients watching them."""
+
+    def __init__(self, analysis_cache: FolderAnalysisCache, broadcaster: Broadcaster, interval: float = 1.0):
+        self.analysis_cache = analysis_cache
+        self.broadcaster = broadcaster
+        self.interval = interval
+        self._watched: Dict[str, _WatchedFolder] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def watch(self, folder_path: str, analyzer: Optional[FunctionAnalyzer] = None, recursive: bool = False,
+              client_id: Optional[str] = None):
+        """Start watching a folder for a client; analyzer is the state the client has already seen."""
+        folder_path = os.path.abspath(folder_path)
+        # An existing baseline is kept so other clients still receive pending deltas
+        watched = self._watched.get(folder_path)
+        if watched is None or watched.recursive != recursive:
+            clients = watched.clients if watched is not None else set()
+            watched = self._watched[folder_path] = _WatchedFolder(analyzer, recursive)
+            watched.clients = clients
+        watched.clients.add(client_id)
+
+    def unwatch(self, folder_path: str, client_id: Optional[str] = None):
+        """Stop watching a folder for one client; the folder is dropped when no client uses it any more."""
+        folder_path = os.path.abspath(folder_path)
+        watched = self._watched.get(folder_path)
+        if watched is None:
+            return
+        watched.clients.discard(client_id)
+        if not watched.clients - {None}:
+            del self._watched[folder_path]
+
+    def unwatch_client(self, client_id: str):
+        """A client disconnected: drop the folders only it was using."""
+        for folder_path, watched in list(self._watched.items()):
+            if client_id in watched.clients:
+                self.unwatch(folder_path, client_id)
+
+    @property
+    def folders(self) -> List[str]:
+        return list(self._watched)
+
+    async def poll(self, folder_path: str) -> Optional[Dict[str, Any]]:
+        """Refresh one folder and send its delta, if any, to the clients watching it."""
+        watched = self._watched.get(folder_path)
+        if watched is None:
+            return None
+        if not os.path.isdir(folder_path):
+            self._watched.pop(folder_path, None)
+            return None
+
+        analyzer = await asyncio.to_thread(self.analysis_cache.get_analyzer, folder_path, watched.recursive)
+        # The analyzer object only changes when some file in the folder changed,
+        # including changes picked up by a /list-files call in between polls
+        if analyzer is watched.analyzer or self._watched.get(folder_path) is not watched:
+            return None
+
+        entries = _WatchedFolder._entries(analyzer)
+        delta = diff_entries(watched.entries, entries)
+        watched.analyzer, watched.entries = analyzer, entries
+        if not any(delta.values()):
+            return None
+
+        message = {"type": "functions_delta", "folder_path": folder_path, **delta}
+        for client_id in watched.clients - {None}:
+            connection = self.broadcaster.get(client_id)
+            if connection is not None:
+                self.broadcaster.send_to(connection, message)
+        return message
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            for folder_path in self.folders:
+                try:
+                    await self.poll(folder_path)
+                except Exception as e:
+                    print(f"Folder watcher error for {folder_path}: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -14,9 +14,16 @@ The analyzer looks for:
 import ast
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Tuple, Optional, Any
 from dataclasses import dataclass
 
+# Directories never descended into by recursive analysis
+SKIP_DIRS = {'__pycache__', 'node_modules', 'venv', 'site-packages', 'build', 'dist'}
+
+# Below this many files, process start-up costs more than parallel parsing saves
+PARALLEL_MIN_FILES = 64
+
 
 @dataclass
 class FunctionMetadata:
@@ -61,11 +68,259 @@ class FunctionMetadata:
         return 0
 
 
+def _block_folder(fragment: str) -> Optional[str]:
+    """Return the last path component of a string fragment that names a block_ folder."""
+    for component in reversed(re.split(r'[\\/]', fragment)):
+        if 'block_' in component:
+            return component.strip()
+    return None
+
+
+class PathExtractor(ast.NodeVisitor):
+    """Single pass over a module collecting the block_ folders each function reads and writes.
+    
+    String values are tracked per function scope (with module-level assignments as
+    fallback), so loadPath/savePath/loadFolder/saveFolder assignments built from
+    concatenation, f-strings, os.path.join or intermediate variables resolve to
+    their folder names. Keyword arguments such as loadPathGenerator(loadFolder=...)
+    are classified by the same load/save naming rule.
+    """
+    
+    def __init__(self):
+        self.module_env: Dict[str, List[str]] = {}
+        self.paths: Dict[ast.AST, Tuple[List[str], List[str]]] = {}
+        self._scopes: List[Tuple[Dict[str, List[str]], List[str], List[str]]] = []
+    
+    @classmethod
+    def extract(cls, tree: ast.AST) -> Dict[ast.AST, Tuple[List[str], List[str]]]:
+        """Map every function node in the tree to its (input_folders, output_folders)."""
+        extractor = cls()
+        extractor.visit(tree)
+        return extractor.paths
+    
+    def _lookup(self, name: str) -> List[str]:
+        for env, _, _ in reversed(self._scopes):
+            if name in env:
+                return env[name]
+        return self.module_env.get(name, [])
+    
+    def _fragments(self, node: ast.AST, classify_calls: bool = False) -> List[str]:
+        """String constants an expression is built from, following variables.
+        
+        With classify_calls, load/save keyword arguments of calls inside the
+        expression are recorded in the same walk.
+        """
+        fragments = []
+        for child in ast.walk(node):
+            if isinstance(child, ast.Constant):
+                if isinstance(child.value, str):
+                    fragments.append(child.value)
+            elif isinstance(child, ast.Name):
+                if isinstance(child.ctx, ast.Load):
+                    fragments.extend(self._lookup(child.id))
+            elif classify_calls and isinstance(child, ast.Call):
+                for keyword in child.keywords:
+                    if keyword.arg and ('load' in keyword.arg.lower() or 'save' in keyword.arg.lower()):
+                        self._classify(keyword.arg, self._fragments(keyword.value))
+        # Deduplicate so repeated self-concatenation cannot grow without bound
+        return list(dict.fromkeys(fragments))
+    
+    def generic_visit(self, node):
+        # Only statements are dispatched; expressions are handled by one flat walk each
+        for _, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.expr):
+                        self._fragments(item, classify_calls=True)
+                    elif isinstance(item, ast.AST):
+                        self.visit(item)
+            elif isinstance(value, ast.expr):
+                self._fragments(value, classify_calls=True)
+            elif isinstance(value, ast.AST):
+                self.visit(value)
+    
+    def _classify(self, name: str, fragments: List[str]):
+        if not self._scopes:
+            return
+        _, inputs, outputs = self._scopes[-1]
+        name = name.lower()
+        if 'load' in name:
+            target = inputs
+        elif 'save' in name:
+            target = outputs
+        else:
+            return
+        for fragment in fragments:
+            folder = _block_folder(fragment)
+            if folder and folder not in target:
+                target.append(folder)
+    
+    def _bind(self, target: ast.AST, fragments: List[str], augment: bool = False):
+        if isinstance(target, ast.Name):
+            env = self._scopes[-1][0] if self._scopes else self.module_env
+            if augment:
+                fragments = list(dict.fromkeys(self._lookup(target.id) + fragments))
+            env[target.id] = fragments
+            self._classify(target.id, fragments)
+        elif isinstance(target, ast.Attribute):
+            self._classify(target.attr, fragments)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self._bind(element, fragments, augment)
+    
+    def visit_FunctionDef(self, node):
+        self._scopes.append(({}, [], []))
+        # Defaults such as def block_x(project, loadFolder="block_o1_...") count as paths too
+        positional = node.args.posonlyargs + node.args.args
+        defaults = list(zip(positional[len(positional) - len(node.args.defaults):], node.args.defaults))
+        defaults += [(arg, default) for arg, default in zip(node.args.kwonlyargs, node.args.kw_defaults) if default]
+        for arg, default in defaults:
+            self._bind(ast.Name(id=arg.arg, ctx=ast.Store()), self._fragments(default))
+        self.generic_visit(node)
+        _, inputs, outputs = self._scopes.pop()
+        self.paths[node] = (inputs, outputs)
+        # Paths used in nested helpers also belong to the enclosing function
+        if self._scopes:
+            _, outer_inputs, outer_outputs = self._scopes[-1]
+            outer_inputs.extend(f for f in inputs if f not in outer_inputs)
+            outer_outputs.extend(f for f in outputs if f not in outer_outputs)
+    
+    visit_AsyncFunctionDef = visit_FunctionDef
+    
+    def visit_Assign(self, node):
+        fragments = self._fragments(node.value, classify_calls=True)
+        for target in node.targets:
+            if isinstance(target, (ast.Tuple, ast.List)) and isinstance(node.value, (ast.Tuple, ast.List)) \
+                    and len(target.elts) == len(node.value.elts):
+                for element, value in zip(target.elts, node.value.elts):
+                    self._bind(element, self._fragments(value))
+            else:
+                self._bind(target, fragments)
+    
+    def visit_AnnAssign(self, node):
+        if node.value is not None:
+            self._bind(node.target, self._fragments(node.value, classify_calls=True))
+    
+    def visit_AugAssign(self, node):
+        self._bind(node.target, self._fragments(node.value, classify_calls=True), augment=True)
+
+
+class PipelineGraph:
+    """Producer/consumer graph of pipeline functions, linked through shared folders.
+    
+    Built once per analysis from an inverted index (folder -> producing and
+    consuming functions), so building it and answering neighbour queries is
+    linear in the number of functions plus connections.
+    """
+    
+    def __init__(self, functions: Dict[str, FunctionMetadata]):
+        self.functions = functions
+        self.positions = {name: meta.get_pipeline_position() for name, meta in functions.items()}
+        self._order = {name: i for i, name in enumerate(functions)}
+        
+        # Inverted index: folder name -> functions writing / reading it
+        self.producers: Dict[str, List[str]] = {}
+        self.consumers: Dict[str, List[str]] = {}
+        for name, meta in functions.items():
+            for folder in dict.fromkeys(meta.output_folders):
+                self.producers.setdefault(folder, []).append(name)
+            for folder in dict.fromkeys(meta.input_folders):
+                self.consumers.setdefault(folder, []).append(name)
+        
+        upstream: Dict[str, set] = {name: set() for name in functions}
+        downstream: Dict[str, set] = {name: set() for name in functions}
+        for folder, producers in self.producers.items():
+            for consumer in self.consumers.get(folder, []):
+                for producer in producers:
+                    if producer != consumer:
+                        downstream[producer].add(consumer)
+                        upstream[consumer].add(producer)
+        
+        # Neighbour lists keep the analyzer's function order, as the pairwise scan did
+        self.upstream = {name: sorted(names, key=self._order.__getitem__) for name, names in upstream.items()}
+        self.downstream = {name: sorted(names, key=self._order.__getitem__) for name, names in downstream.items()}
+    
+    def edges(self) -> List[Tuple[str, str]]:
+        return [(source, target) for source, targets in self.downstream.items() for target in targets]
+    
+    def strongly_connected_components(self) -> List[List[str]]:
+        """Tarjan's algorithm (iterative); components come out in reverse topological order."""
+        index: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        on_stack = set()
+        stack: List[str] = []
+        components = []
+        
+        for root in self.functions:
+            if root in index:
+                continue
+            work = [(root, iter(self.downstream[root]))]
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, children = work[-1]
+                child = next(children, None)
+                if child is not None:
+                    if child not in index:
+                        index[child] = lowlink[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.downstream[child])))
+                    elif child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                    continue
+                
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(sorted(component, key=self._order.__getitem__))
+        return components
+    
+    def cycles(self) -> List[List[str]]:
+        """Groups of functions that feed each other (components with more than one member)."""
+        return [component for component in self.strongly_connected_components() if len(component) > 1]
+    
+    def topological_order(self) -> List[str]:
+        """Upstream-first order; functions in a cycle are kept together."""
+        order = []
+        for component in reversed(self.strongly_connected_components()):
+            order.extend(component)
+        return order
+    
+    def connectable(self, function_name: str) -> Dict[str, List[str]]:
+        """Functions that can feed into / receive from the given function."""
+        by_position = lambda name: self.positions[name]
+        return {
+            "inputs": sorted(self.upstream.get(function_name, []), key=by_position),
+            "outputs": sorted(self.downstream.get(function_name, []), key=by_position)
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "edges": [list(edge) for edge in self.edges()],
+            "topological_order": self.topological_order(),
+            "cycles": self.cycles()
+        }
+
+
 class FunctionAnalyzer:
     """Analyzes Python functions to extract pipeline metadata."""
     
-    def __init__(self):
+    def __init__(self, regex_fallback: bool = False):
         self.functions: Dict[str, FunctionMetadata] = {}
+        self._graph: Optional[PipelineGraph] = None
+        # Also run the legacy regex sweep over each function's source
+        self.regex_fallback = regex_fallback
         self.block_patterns = {
             'preprocessing': ['preprocess', 'normalize', 'filter', 'metadata', 'register'],
             'segmentation': ['segment', 'BSC', 'mask', 'CP2D', 'CP3D', 'operetta'],
@@ -80,21 +335,30 @@ class FunctionAnalyzer:
         with open(file_path, 'r', encoding='utf-8') as file:
             content = file.read()
         
-        try:
-            tree = ast.parse(content)
-        except SyntaxError as e:
-            print(f"Syntax error in {file_path}: {e}")
-            return []
+        return self.analyze_source(content, file_path)
+    
+    def analyze_source(self, content: str, file_path: str, tree: Optional[ast.AST] = None) -> List[FunctionMetadata]:
+        """Analyze already-read (and optionally already-parsed) file content and extract metadata for all functions."""
+        if tree is None:
+            try:
+                tree = ast.parse(content)
+            except SyntaxError as e:
+                print(f"Syntax error in {file_path}: {e}")
+                return []
+        
+        # One pass over the whole file resolves the paths of every function
+        paths = PathExtractor.extract(tree)
         
         functions = []
-        for node in ast.walk(tree):
+        for node in sorted(paths, key=lambda n: (n.lineno, n.col_offset)):
             if isinstance(node, ast.FunctionDef):
                 # Filter out helper functions and only include main pipeline functions
                 if self._is_main_pipeline_function(node.name):
-                    metadata = self._analyze_function(node, content, file_path)
+                    metadata = self._analyze_function(node, content, file_path, paths.get(node))
                     if metadata:
                         functions.append(metadata)
                         self.functions[metadata.name] = metadata
+                        self._graph = None
         
         return functions
     
@@ -122,7 +386,8 @@ class FunctionAnalyzer:
                 
         return False
     
-    def _analyze_function(self, func_node: ast.FunctionDef, file_content: str, file_path: str) -> Optional[FunctionMetadata]:
+    def _analyze_function(self, func_node: ast.FunctionDef, file_content: str, file_path: str,
+                          paths: Optional[Tuple[List[str], List[str]]] = None) -> Optional[FunctionMetadata]:
         """Analyze a single function node."""
         func_name = func_node.name
         filename = os.path.basename(file_path)
@@ -131,7 +396,7 @@ class FunctionAnalyzer:
         parameters = [arg.arg for arg in func_node.args.args]
         
         # Extract load and save paths
-        input_folders, output_folders = self._extract_paths(func_node, file_content)
+        input_folders, output_folders = self._extract_paths(func_node, file_content, paths)
         
         # Determine block type
         block_type = self._determine_block_type(func_name, file_content)
@@ -148,30 +413,26 @@ class FunctionAnalyzer:
             dependencies=[]  # Will be computed later
         )
     
-    def _extract_paths(self, func_node: ast.FunctionDef, file_content: str) -> Tuple[List[str], List[str]]:
-        """Extract loadPath and savePath from function content."""
-        input_folders = []
-        output_folders = []
+    def _extract_paths(self, func_node: ast.FunctionDef, file_content: str,
+                       paths: Optional[Tuple[List[str], List[str]]] = None) -> Tuple[List[str], List[str]]:
+        """Extract loadPath and savePath folders used by a function."""
+        if paths is None:
+            paths = PathExtractor.extract(func_node)[func_node]
+        input_folders, output_folders = list(paths[0]), list(paths[1])
         
-        # Look for loadPath and savePath assignments in AST
-        for node in ast.walk(func_node):
-            if isinstance(node, ast.Assign):
-                for target in node.targets:
-                    if isinstance(target, ast.Name):
-                        var_name = target.id
-                        
-                        # Check if this is a path assignment
-                        if 'load' in var_name.lower() and isinstance(node.value, ast.BinOp):
-                            folder_name = self._extract_folder_name(node.value)
-                            if folder_name and folder_name not in input_folders:
-                                input_folders.append(folder_name)
-                        
-                        elif 'save' in var_name.lower() and isinstance(node.value, ast.BinOp):
-                            folder_name = self._extract_folder_name(node.value)
-                            if folder_name and folder_name not in output_folders:
-                                output_folders.append(folder_name)
+        if self.regex_fallback:
+            source = ast.get_source_segment(file_content, func_node) or ''
+            for folder in self._extract_paths_regex(source, 'input'):
+                if folder not in input_folders:
+                    input_folders.append(folder)
+            for folder in self._extract_paths_regex(source, 'output'):
+                if folder not in output_folders:
+                    output_folders.append(folder)
         
-        # Enhanced regex patterns to catch more variations
+        return input_folders, output_folders
+    
+    def _extract_paths_regex(self, source: str, kind: str) -> List[str]:
+        """Legacy regex extraction, only used when regex_fallback is enabled."""
         patterns = {
             'input': [
                 r'loadPath[^=]*=.*?["\']([^"\']*block_[^"\']*)["\']',
@@ -189,31 +450,15 @@ class FunctionAnalyzer:
             ]
         }
         
-        # Apply regex patterns
-        for input_pattern in patterns['input']:
-            matches = re.findall(input_pattern, file_content, re.IGNORECASE | re.DOTALL)
-            for match in matches:
-                folder_name = os.path.basename(match.strip())
-                if folder_name and folder_name not in input_folders:
-                    input_folders.append(folder_name)
-        
-        for output_pattern in patterns['output']:
-            matches = re.findall(output_pattern, file_content, re.IGNORECASE | re.DOTALL)
-            for match in matches:
+        folders = []
+        for pattern in patterns[kind]:
+            for match in re.findall(pattern, source, re.IGNORECASE | re.DOTALL):
                 folder_name = os.path.basename(match.strip())
-                if folder_name and folder_name not in output_folders and folder_name.startswith('block_'):
-                    output_folders.append(folder_name)
-        
-        return input_folders, output_folders
-    
-    def _extract_folder_name(self, node: ast.BinOp) -> Optional[str]:
-        """Extract folder name from a string concatenation expression."""
-        # This is a simplified extraction - you might need to make it more robust
-        # Look for string literals that contain "block_"
-        for child in ast.walk(node):
-            if isinstance(child, ast.Constant) and isinstance(child.value, str) and "block_" in child.value:
-                return os.path.basename(child.value)
-        return None
+                if kind == 'output' and not folder_name.startswith('block_'):
+                    continue
+                if folder_name and folder_name not in folders:
+                    folders.append(folder_name)
+        return folders
     
     def _determine_block_type(self, func_name: str, file_content: str) -> str:
         """Determine the type of processing block based on function name and content."""
@@ -228,38 +473,25 @@ class FunctionAnalyzer:
         
         return "unknown"
     
+    def get_pipeline_graph(self) -> PipelineGraph:
+        """Connectivity graph of the analyzed functions (built once, reused by all queries)."""
+        if self._graph is None or self._graph.functions is not self.functions \
+                or len(self._graph.positions) != len(self.functions):
+            self._graph = PipelineGraph(self.functions)
+        return self._graph
+    
     def compute_dependencies(self):
         """Compute dependencies between functions based on input/output folder matching."""
+        self._graph = PipelineGraph(self.functions)
         for func_name, func_meta in self.functions.items():
-            dependencies = []
-            for other_name, other_meta in self.functions.items():
-                if other_name != func_name and other_meta.can_connect_to(func_meta):
-                    dependencies.append(other_name)
-            func_meta.dependencies = dependencies
+            func_meta.dependencies = list(self._graph.upstream[func_name])
     
     def get_connectable_functions(self, function_name: str) -> Dict[str, List[str]]:
         """Get functions that can connect to/from the specified function."""
         if function_name not in self.functions:
             return {"inputs": [], "outputs": []}
         
-        func_meta = self.functions[function_name]
-        
-        # Functions that can provide input to this function
-        input_functions = []
-        # Functions that can receive output from this function
-        output_functions = []
-        
-        for other_name, other_meta in self.functions.items():
-            if other_name != function_name:
-                if other_meta.can_connect_to(func_meta):
-                    input_functions.append(other_name)
-                if func_meta.can_connect_to(other_meta):
-                    output_functions.append(other_name)
-        
-        return {
-            "inputs": sorted(input_functions, key=lambda x: self.functions[x].get_pipeline_position()),
-            "outputs": sorted(output_functions, key=lambda x: self.functions[x].get_pipeline_position())
-        }
+        return self.get_pipeline_graph().connectable(function_name)
     
     def get_pipeline_order(self) -> List[str]:
         """Get functions sorted by their pipeline position."""
@@ -268,37 +500,114 @@ class FunctionAnalyzer:
             key=lambda x: self.functions[x].get_pipeline_position()
         )
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert analyzer data to dictionary for JSON serialization."""
+    def to_file_list(self) -> List[Dict[str, Any]]:
+        """Sidebar entries (the /list-files "files" payload), sorted by pipeline position."""
+        files = []
+        for func_name, func_meta in self.functions.items():
+            # Only include main functions (not private helper functions)
+            if not func_name.startswith('_'):
+                files.append({
+                    "filename": func_meta.filename,
+                    "functionName": func_meta.name,
+                    "parameters": func_meta.parameters,
+                    "input_folders": func_meta.input_folders,
+                    "output_folders": func_meta.output_folders,
+                    "input_count": func_meta.input_count,
+                    "output_count": func_meta.output_count,
+                    "block_type": func_meta.block_type,
+                    "pipeline_position": func_meta.get_pipeline_position(),
+                    "connectable": self.get_connectable_functions(func_name)
+                })
+        
+        # Sort by pipeline position
+        files.sort(key=lambda x: x["pipeline_position"])
+        return files
+    
+    def function_dict(self, func_name: str) -> Dict[str, Any]:
+        """JSON metadata of one function, as listed by to_dict."""
+        meta = self.functions[func_name]
         return {
-            func_name: {
-                "name": meta.name,
-                "filename": meta.filename,
-                "parameters": meta.parameters,
-                "input_folders": meta.input_folders,
-                "output_folders": meta.output_folders,
-                "input_count": meta.input_count,
-                "output_count": meta.output_count,
-                "block_type": meta.block_type,
-                "dependencies": meta.dependencies,
-                "pipeline_position": meta.get_pipeline_position(),
-                "connectable": self.get_connectable_functions(func_name)
-            }
-            for func_name, meta in self.functions.items()
+            "name": meta.name,
+            "filename": meta.filename,
+            "parameters": meta.parameters,
+            "input_folders": meta.input_folders,
+            "output_folders": meta.output_folders,
+            "input_count": meta.input_count,
+            "output_count": meta.output_count,
+            "block_type": meta.block_type,
+            "dependencies": meta.dependencies,
+            "pipeline_position": meta.get_pipeline_position(),
+            "connectable": self.get_connectable_functions(func_name)
         }
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert analyzer data to dictionary for JSON serialization."""
+        return {func_name: self.function_dict(func_name) for func_name in self.functions}
+
+def list_python_files(folder_path: str, recursive: bool = False) -> List[str]:
+    """List .py files in a folder (optionally walking subpackages), in a stable order."""
+    if not recursive:
+        return [
+            os.path.join(folder_path, filename)
+            for filename in sorted(os.listdir(folder_path))
+            if filename.endswith('.py')
+        ]
+    
+    paths = []
+    for root, dirs, files in os.walk(folder_path):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith('.'))
+        paths.extend(os.path.join(root, filename) for filename in sorted(files) if filename.endswith('.py'))
+    return paths
+
+
+def _analyze_paths(file_paths: List[str], regex_fallback: bool = False) -> List[Tuple[str, List[FunctionMetadata]]]:
+    """Analyze a chunk of files. Runs in a worker process for parallel analysis."""
+    results = []
+    for file_path in file_paths:
+        try:
+            functions = FunctionAnalyzer(regex_fallback=regex_fallback).analyze_file(file_path)
+        except Exception as e:
+            print(f"Error analyzing {os.path.basename(file_path)}: {e}")
+            functions = []
+        results.append((file_path, functions))
+    return results
+
+
+def analyze_files(file_paths: List[str], workers: Optional[int] = None, chunksize: Optional[int] = None,
+                  regex_fallback: bool = False) -> Dict[str, List[FunctionMetadata]]:
+    """Analyze many files, spreading parsing over a process pool when there are enough of them.
+    
+    Returns {file_path: [FunctionMetadata, ...]} in the order of file_paths.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(file_paths) < PARALLEL_MIN_FILES:
+        return dict(_analyze_paths(file_paths, regex_fallback))
+    
+    # Several chunks per worker keeps the pool balanced when file sizes vary
+    chunksize = chunksize or max(1, -(-len(file_paths) // (workers * 4)))
+    chunks = [file_paths[i:i + chunksize] for i in range(0, len(file_paths), chunksize)]
+    results = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        for chunk_results in pool.map(_analyze_paths, chunks, [regex_fallback] * len(chunks)):
+            results.update(chunk_results)
+    return results
+
 
-def analyze_folder(folder_path: str) -> FunctionAnalyzer:
-    """Analyze all Python files in a folder and return analyzer with all functions."""
+def analyze_folder(folder_path: str, recursive: bool = False, workers: Optional[int] = 1,
+                   chunksize: Optional[int] = None) -> FunctionAnalyzer:
+    """Analyze all Python files in a folder and return analyzer with all functions.
+    
+    recursive also walks subpackages (filenames are then relative to folder_path).
+    workers > 1 (or None for one per CPU) parses files in a process pool.
+    """
     analyzer = FunctionAnalyzer()
     
-    for filename in os.listdir(folder_path):
-        if filename.endswith('.py'):
-            file_path = os.path.join(folder_path, filename)
-            try:
-                analyzer.analyze_file(file_path)
-            except Exception as e:
-                print(f"Error analyzing {filename}: {e}")
+    file_paths = list_python_files(folder_path, recursive)
+    for file_path, functions in analyze_files(file_paths, workers, chunksize).items():
+        for metadata in functions:
+            if recursive:
+                metadata.filename = os.path.relpath(file_path, folder_path)
+            analyzer.functions[metadata.name] = metadata
     
     # Compute dependencies after all functions are loaded
     analyzer.compute_dependencies()
@@ -0,0 +1,1259 @@
+"""
+Graph Scheduler
+===============
+Executes a pipeline graph (the nodes/edges payload sent by the frontend) by
+building the dependency graph once and dispatching every node whose upstream
+nodes have finished to a worker pool.
+
+Nodes run in a process pool by default, so CPU-bound blocks overlap and the
+server event loop stays responsive while they run. A node can ask for the
+thread pool (for I/O-bound blocks) or for more than one CPU slot through the
+resource hints stored in its data:
+
+    node["data"]["resources"] = {"executor": "thread"}
+    node["data"]["resources"] = {"executor": "process", "cpus": 4}
+
+An edge with edge["data"] = {"param": "image"} passes the source node's result
+as the target function's `image` argument. Ready nodes of all runs compete
+for CPU slots and memory by critical-path priority (_SlotPool). Node features
+are documented where they are implemented: map nodes (MapSpec), retries
+(RetryPolicy), result caching (result_cache.py), shared-memory results
+(result_transport.py), generator streams (node_streams.py), memory admission
+and caps (node_limits.py), make mode (data_manifest.py), resuming
+(run_checkpoint.py) and profiling (run_profile.py).
+
+An optional listener passed to run() is awaited with ("node_started" |
+"node_progress" | "node_retrying" | "node_finished" | "node_failed", task,
+info) as each node changes state, which is how run_manager.py streams
+progress.
+"""
+
+import asyncio
+import glob
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from multiprocessing import resource_tracker
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from data_manifest import MAKE_MODES, ManifestStore, function_folders
+from module_cache import dependency_hash, get_function_index, get_module_cache
+from node_limits import MEMORY_MARGIN, MemoryAdmission, NodeLimits, enforced_limits, parse_bytes
+from node_streams import StreamChannel, open_args, pump, stop_all
+from result_cache import ResultCache, result_cache_key
+from result_transport import (SharedBuffer, export_value, import_value, materialize, release,
+                              value_nbytes)
+from run_history import DEFAULT_DURATION, RunHistory
+from run_profile import RunProfile, measure_call
+
+EXECUTOR_KINDS = ("process", "thread")
+
+NodeListener = Callable[[str, 'NodeTask', Dict[str, Any]], Awaitable[None]]
+
+
+class GraphExecutionError(Exception):
+    """Raised when a graph cannot be scheduled or one of its nodes fails."""
+
+    def __init__(self, message: str, status: int = 400, node_id: Optional[str] = None):
+        super().__init__(message)
+        self.status = status
+        self.node_id = node_id
+
+
+@dataclass
+class MapSpec:
+    """How a map node splits one parameter into items.
+
+        node["data"]["map"] = {"param": "plate", "glob": "plates/*.tif", "chunk_size": 4,
+                               "max_concurrency": 16, "retries": 2}
+
+    The function runs once per item (from "items", "glob", "directory", or the
+    list given as / bound by an edge to that parameter), chunk_size items per
+    worker call, and the node's result is the list of outputs in item order. A
+    node bound to it by an edge is the reduce step. Each item is cached on its
+    own and retried up to "retries" times with exponential backoff.
+    """
+    param: str
+    items: Optional[List[Any]] = None
+    glob: Optional[str] = None
+    directory: Optional[str] = None
+    chunk_size: int = 1
+    max_concurrency: Optional[int] = None
+    retries: int = 0
+    retry_delay: float = 1.0
+
+    @classmethod
+    def from_data(cls, node_id: str, spec: Dict[str, Any]) -> 'MapSpec':
+        if not isinstance(spec, dict) or not spec.get("param"):
+            raise GraphExecutionError(f"Map node '{node_id}' needs a \"param\" to map over")
+        sources = [key for key in ("items", "glob", "directory") if spec.get(key) is not None]
+        if len(sources) > 1:
+            raise GraphExecutionError(f"Map node '{node_id}' has more than one item source {sources}")
+        try:
+            return cls(
+                param=spec["param"],
+                items=list(spec["items"]) if spec.get("items") is not None else None,
+                glob=spec.get("glob"),
+                directory=spec.get("directory"),
+                chunk_size=max(1, int(spec.get("chunk_size", 1))),
+                max_concurrency=int(spec["max_concurrency"]) if spec.get("max_concurrency") else None,
+                retries=max(0, int(spec.get("retries", 0))),
+                retry_delay=max(0.0, float(spec.get("retry_delay", 1.0))),
+            )
+        except (TypeError, ValueError) as e:
+            raise GraphExecutionError(f"Invalid map settings for node '{node_id}': {e}")
+
+    @property
+    def has_source(self) -> bool:
+        return self.items is not None or self.glob is not None or self.directory is not None
+
+    def resolve_items(self, value: Any, folder_path: str) -> List[Any]:
+        """The items to map over; relative globs and directories are relative to the function folder."""
+        if self.items is not None:
+            return list(self.items)
+        if self.glob is not None:
+            pattern = self.glob if os.path.isabs(self.glob) else os.path.join(folder_path, self.glob)
+            return sorted(glob.glob(pattern, recursive=True))
+        if self.directory is not None:
+            directory = self.directory if os.path.isabs(self.directory) else os.path.join(folder_path, self.directory)
+            if not os.path.isdir(directory):
+                raise GraphExecutionError(f"Map directory '{directory}' not found")
+            return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                    if not name.startswith(".")]
+        if isinstance(value, str):
+            # Inputs typed into a node are strings: a JSON list, or comma-separated values
+            try:
+                parsed = json.loads(value)
+            except ValueError:
+                parsed = [part.strip() for part in value.split(",") if part.strip()]
+            value = parsed
+        if isinstance(value, (list, tuple)):
+            return list(value)
+        raise GraphExecutionError(f"Cannot map over a {type(value).__name__} ('{self.param}' must be a list)")
+
+
+@dataclass
+class RetryPolicy:
+    """When and how often a failed node runs again, e.g. after transient I/O errors on network shares.
+
+        node["data"]["retry"] = {"retries": 3, "delay": 2, "backoff": 2, "on": ["OSError"]}
+
+    "on" lists the exception classes (by name, subclasses included) worth
+    another attempt. Stream nodes are never retried.
+    """
+    retries: int = 0
+    delay: float = 1.0
+    backoff: float = 2.0
+    max_delay: float = 300.0
+    on: Tuple[str, ...] = ("OSError",)  # exception class names; "*" retries every error
+
+    @classmethod
+    def from_data(cls, node_id: str, spec: Any) -> 'RetryPolicy':
+        if isinstance(spec, int) and not isinstance(spec, bool):
+            spec = {"retries": spec}
+        if not isinstance(spec, dict):
+            raise GraphExecutionError(f"Invalid retry settings for node '{node_id}'")
+        try:
+            on = spec.get("on", cls.on)
+            return cls(
+                retries=max(0, int(spec.get("retries", 0))),
+                delay=max(0.0, float(spec.get("delay", cls.delay))),
+                backoff=max(1.0, float(spec.get("backoff", cls.backoff))),
+                max_delay=max(0.0, float(spec.get("max_delay", cls.max_delay))),
+                on=(on,) if isinstance(on, str) else tuple(str(name) for name in on),
+            )
+        except (TypeError, ValueError) as e:
+            raise GraphExecutionError(f"Invalid retry settings for node '{node_id}': {e}")
+
+    def delay_for(self, error: BaseException, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after the given (0-based) attempt failed; None to give up."""
+        if attempt >= self.retries:
+            return None
+        if "*" not in self.on and not {cls.__name__ for cls in type(error).__mro__} & set(self.on):
+            return None
+        return min(self.max_delay, self.delay * self.backoff ** attempt)
+
+
+@dataclass
+class NodeTask:
+    """A single schedulable node of the pipeline graph."""
+    node_id: str
+    func_name: str
+    folder_path: str
+    inputs: Dict[str, Any]
+    executor: str = "process"
+    cpus: int = 1
+    upstream: Set[str] = field(default_factory=set)
+    downstream: Set[str] = field(default_factory=set)
+    cacheable: bool = True
+    writes_data: bool = False  # saves to data folders, so its result is not cached
+    profile: bool = False
+    bindings: Dict[str, str] = field(default_factory=dict)  # parameter -> source node id
+    map_spec: Optional[MapSpec] = None
+    map_index: Optional[int] = None  # position of the mapped parameter in args
+    generator: bool = False
+    streamed: Dict[str, str] = field(default_factory=dict)  # parameter -> generator node feeding it
+    stream_outputs: List[str] = field(default_factory=list)  # nodes this generator streams to
+    function_file: Optional[str] = None
+    source_hash: Optional[str] = None
+    args: List[Any] = field(default_factory=list)
+    cache_key: Optional[str] = None
+    shard_upstream_keys: Optional[List[str]] = None  # keys shared by every item of a map node
+    data_paths: Optional[Dict[str, List[str]]] = None  # explicit {"inputs", "outputs"} data folders for make mode
+    priority: float = 0.0  # estimated seconds from this node's start to the end of the graph
+    estimate: Optional[float] = None  # estimated seconds for this node alone
+    memory: Optional[int] = None  # declared memory budget in bytes (admission and cap)
+    cpu_seconds: Optional[float] = None  # declared CPU time cap
+    memory_estimate: Optional[int] = None  # learned budget used when none is declared
+    retry: Optional[RetryPolicy] = None
+
+    @property
+    def result_cacheable(self) -> bool:
+        """Whether the node's return value may be memoised in the result cache."""
+        return self.cacheable and not self.writes_data
+
+    @property
+    def streaming(self) -> bool:
+        """Whether the node hands items over a stream, so it needs a worker of its own."""
+        return bool(self.stream_outputs or self.streamed)
+
+    @property
+    def memory_budget(self) -> int:
+        return self.memory if self.memory is not None else self.memory_estimate or 0
+
+    @property
+    def limits(self) -> NodeLimits:
+        return NodeLimits(self.memory, self.cpu_seconds)
+
+
+@dataclass(frozen=True)
+class UpstreamResult:
+    """Placeholder argument filled with an upstream node's result at run time."""
+    node_id: str
+
+
+@dataclass
+class RunReport:
+    """Outcome of one graph execution."""
+    results: Dict[str, Any]
+    cache_hits: List[str] = field(default_factory=list)
+    profile: Optional[RunProfile] = None
+    skipped: Dict[str, str] = field(default_factory=dict)  # make mode: node id -> reason
+    restored: List[str] = field(default_factory=list)  # nodes restored from a previous attempt
+
+    @property
+    def run_id(self) -> Optional[str]:
+        return self.profile.run_id if self.profile else None
+
+
+class ExecutionGraph:
+    """Dependency graph of the nodes to execute, built once per request."""
+
+    def __init__(self, tasks: Dict[str, NodeTask]):
+        self.tasks = tasks
+        self.order = self._topological_order()
+        self.resolved = False  # set by resolve_functions()
+
+    @classmethod
+    def from_payload(cls, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> 'ExecutionGraph':
+        """Build the graph from the nodes/edges arrays used by /execute-graph."""
+        tasks = {}
+        for node in nodes:
+            data = node.get("data", {})
+            resources = data.get("resources") or {}
+            executor = resources.get("executor", "process")
+            if executor not in EXECUTOR_KINDS:
+                raise GraphExecutionError(f"Unknown executor '{executor}' for node '{node['id']}'")
+            # Thread nodes are assumed to be I/O-bound and take no CPU slot unless asked to
+            default_cpus = 1 if executor == "process" else 0
+            try:
+                memory = parse_bytes(resources.get("memory"))
+                cpu_seconds = float(resources["cpu_seconds"]) if resources.get("cpu_seconds") else None
+            except ValueError as e:
+                raise GraphExecutionError(f"{e} for node '{node['id']}'")
+            tasks[node["id"]] = NodeTask(
+                node_id=node["id"],
+                func_name=data.get("label"),
+                folder_path=data.get("folderPath"),
+                inputs=data.get("inputs", {}),
+                executor=executor,
+                cpus=max(0, int(resources.get("cpus", default_cpus))),
+                cacheable=bool(data.get("cache", True)),
+                profile=bool(data.get("profile", False)),
+                map_spec=MapSpec.from_data(node["id"], data["map"]) if data.get("map") else None,
+                data_paths=data.get("data_paths"),
+                memory=memory,
+                cpu_seconds=cpu_seconds,
+                retry=RetryPolicy.from_data(node["id"], data["retry"]) if data.get("retry") else None,
+            )
+
+        for edge in edges:
+            source, target = edge["source"], edge["target"]
+            if source not in tasks or target not in tasks:
+                raise GraphExecutionError(f"Edge references unknown node ({source} -> {target})")
+            tasks[target].upstream.add(source)
+            tasks[source].downstream.add(target)
+
+            param = (edge.get("data") or {}).get("param")
+            if param:
+                if param in tasks[target].bindings:
+                    raise GraphExecutionError(f"Parameter '{param}' of node '{target}' is bound by two edges")
+                tasks[target].bindings[param] = source
+
+        return cls(tasks)
+
+    def _topological_order(self) -> List[str]:
+        """Kahn's algorithm; keeps the payload order among independent nodes."""
+        remaining = {node_id: len(task.upstream) for node_id, task in self.tasks.items()}
+        ready = [node_id for node_id, count in remaining.items() if count == 0]
+        order = []
+        while ready:
+            node_id = ready.pop(0)
+            order.append(node_id)
+            for child in sorted(self.tasks[node_id].downstream):
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    ready.append(child)
+        if len(order) != len(self.tasks):
+            raise GraphExecutionError("Graph contains a cycle")
+        return order
+
+    def resolve_functions(self):
+        """Locate every node's function and bind its arguments before anything runs."""
+        for node_id in self.order:
+            task = self.tasks[node_id]
+            if not task.folder_path or not os.path.isdir(task.folder_path):
+                raise GraphExecutionError("Invalid folder path", node_id=node_id)
+
+            function = get_function_index(task.folder_path).lookup(task.func_name)
+            if function is None:
+                raise GraphExecutionError(f"Function '{task.func_name}' not found", node_id=node_id)
+
+            spec = task.map_spec
+            if spec is not None:
+                if spec.param not in function.parameters:
+                    raise GraphExecutionError(
+                        f"Map parameter '{spec.param}' is not a parameter of '{task.func_name}'", node_id=node_id
+                    )
+                if spec.has_source and spec.param in task.bindings:
+                    raise GraphExecutionError(
+                        f"Map parameter '{spec.param}' has items and is also bound by an edge", node_id=node_id
+                    )
+                task.map_index = function.parameters.index(spec.param)
+
+            task.generator = function.is_generator
+            task.streamed = {param: source for param, source in task.bindings.items()
+                             if self.tasks[source].generator}
+            for source in task.streamed.values():
+                self.tasks[source].stream_outputs.append(node_id)
+            if task.generator or task.streamed:
+                if spec is not None:
+                    raise GraphExecutionError("Map nodes cannot produce or consume streams", node_id=node_id)
+                task.cacheable = False
+
+            unknown = set(task.bindings) - set(function.parameters)
+            if unknown:
+                raise GraphExecutionError(
+                    f"Edge binds unknown parameter(s) {sorted(unknown)} of '{task.func_name}'", node_id=node_id
+                )
+
+            # Prepare arguments in the order of the function definition
+            args = []
+            for param in function.parameters:
+                if param in task.bindings:
+                    args.append(UpstreamResult(task.bindings[param]))
+                    continue
+                value = task.inputs.get(param)
+                if spec is not None and param == spec.param and spec.has_source:
+                    value = {key: getattr(spec, key) for key in ("items", "glob", "directory")}
+                if value is None:
+                    raise GraphExecutionError(
+                        f"Input '{param}' not provided for function '{task.func_name}'", node_id=node_id
+                    )
+                args.append(value)
+
+            if task.executor == "process":
+                # Results of classes defined in the block are unpickled here, so the server needs the module too
+                try:
+                    get_module_cache().load_module(function.file_path)
+                except Exception as e:  # The worker reports the same error when the node runs
+                    print(f"Could not import {os.path.basename(function.file_path)} in the server: {e}")
+
+            task.function_file = function.file_path
+            task.source_hash = dependency_hash(function.file_path)  # Covers the helpers it imports locally
+            task.args = args
+            task.writes_data = bool((task.data_paths or {}).get("outputs")
+                                    or function_folders(function.file_path, function.source_hash, task.func_name)[1])
+
+        self._check_streams()
+        self.resolved = True
+
+    def make_exclusion(self, node_id: str) -> Optional[str]:
+        """Why make mode cannot skip a node (None when it can)."""
+        task = self.tasks[node_id]
+        if not task.cacheable:
+            return "always runs (caching disabled or stream node)"
+        if task.map_spec is not None:
+            return "always runs (map node)"
+        if task.bindings or any(node_id in self.tasks[child].bindings.values() for child in task.downstream):
+            return "always runs (exchanges values over edges)"
+        return None
+
+    def _check_streams(self):
+        """A stream consumer that also waits for its generator by another path would deadlock."""
+        for task in self.tasks.values():
+            for target in task.stream_outputs:
+                pending = [child for child in task.downstream if child != target]
+                seen = set()
+                while pending:
+                    node_id = pending.pop()
+                    if node_id == target:
+                        raise GraphExecutionError(
+                            f"Node '{target}' reads the stream of '{task.node_id}' and also depends on it "
+                            f"through other nodes", node_id=target,
+                        )
+                    if node_id not in seen:
+                        seen.add(node_id)
+                        pending.extend(self.tasks[node_id].downstream)
+
+
+def load_node_function(function_file: str, func_name: str) -> Callable:
+    """Load a function through this process's module cache."""
+    func = get_module_cache().load_function(function_file, func_name)
+    if func is None:
+        raise GraphExecutionError(f"Function '{func_name}' not found in file")
+    return func
+
+
+def run_node_function(function_file: str, func_name: str, args: List[Any]) -> Any:
+    """Load a function and call it. Runs inside a pool worker."""
+    return load_node_function(function_file, func_name)(*args)
+
+
+def run_node_profiled(function_file: str, func_name: str, args: List[Any],
+                      per_thread: bool = False, profile: bool = False,
+                      limits: Optional[NodeLimits] = None) -> Tuple[Any, Dict[str, Any]]:
+    """Like run_node_function, but also returns the metrics measured in the worker.
+
+    Shared-buffer arguments are opened as zero-copy views and stream arguments
+    become iterators. In a process worker, a large buffer result is handed back
+    through shared memory and the node's declared limits are enforced.
+    """
+    func = load_node_function(function_file, func_name)
+    try:
+        with enforced_limits(None if per_thread else limits):
+            result, metrics = measure_call(func, open_args(args), per_thread=per_thread, profile=profile)
+        if not per_thread:
+            result = export_value(result)
+    finally:
+        stop_all(args)
+    return result, metrics
+
+
+def run_node_generator(function_file: str, func_name: str, args: List[Any], channels: List[StreamChannel],
+                       per_thread: bool = False, profile: bool = False,
+                       limits: Optional[NodeLimits] = None) -> Tuple[Any, Dict[str, Any]]:
+    """Run a generator node, streaming its items to downstream nodes. Runs inside a pool worker."""
+    func = load_node_function(function_file, func_name)
+    try:
+        with enforced_limits(None if per_thread else limits):
+            return measure_call(pump, [func, open_args(args), channels], per_thread=per_thread, profile=profile)
+    finally:
+        stop_all(args)
+
+
+def run_node_map_chunk(function_file: str, func_name: str, args: List[Any], map_index: int,
+                       items: List[Any], per_thread: bool = False, profile: bool = False,
+                       limits: Optional[NodeLimits] = None) -> Tuple[List[Tuple[bool, Any]], Dict[str, Any]]:
+    """Call a map node's function once per item of a chunk. Runs inside a pool worker.
+
+    Returns ([(ok, result or error message), ...], metrics of the whole chunk);
+    a failing item does not stop the rest of the chunk.
+    """
+    func = load_node_function(function_file, func_name)
+    args = [import_value(arg) for arg in args]
+
+    def call_each():
+        outcomes = []
+        for item in items:
+            call_args = list(args)
+            call_args[map_index] = import_value(item)
+            try:
+                with enforced_limits(None if per_thread else limits):  # Caps apply to each item
+                    result = func(*call_args)
+                outcomes.append((True, result if per_thread else export_value(result)))
+            except Exception as e:
+                outcomes.append((False, f"{type(e).__name__}: {e}"))
+        return outcomes
+
+    return measure_call(call_each, [], per_thread=per_thread, profile=profile)
+
+
+def _shared_handles(value: Any) -> List[SharedBuffer]:
+    if isinstance(value, SharedBuffer):
+        return [value]
+    if isinstance(value, (list, tuple)):
+        return [handle for item in value for handle in _shared_handles(item)]
+    return []
+
+
+def _release_abandoned(future: Future):
+    """Free the shared buffers returned by a worker call nobody waits for any more."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    release(_shared_handles(future.result()[0]))
+
+
+@dataclass(eq=False)
+class _Lease:
+    slots: int
+    expected_end: float  # monotonic time, inf when unknown
+    memory: int = 0
+    owner: Optional[str] = None  # run id
+
+
+class _SlotPool:
+    """Hands out CPU slots to waiting nodes, highest priority first.
+
+    One pool per scheduler, shared by all its runs, so concurrent runs
+    together never use more slots than the worker pools have.
+    The first waiter that does not fit reserves its slots: waiters behind it
+    only start if they fit now and either end (by their estimate) before the
+    reserved slots free up, or leave enough slots for it (EASY backfilling).
+    Slots are handed out on the next loop iteration, so nodes that become
+    ready together are ordered by priority rather than by arrival. Priority is
+    the estimated length of the longest path from the node to the end of its
+    graph, from the durations in the run history; plan() simulates the policy
+    to predict when a graph finishes.
+
+    With a MemoryAdmission, a node also waits until its memory budget fits
+    (while other nodes run; a node alone always starts). Waiters behind the
+    reserving one that outlast the reservation must leave room for its budget,
+    less what the leases ending before it free up.
+    """
+
+    MEMORY_RETRY_SECONDS = 0.5  # Re-check memory that other processes may free
+
+    def __init__(self, capacity: int, memory: Optional[MemoryAdmission] = None):
+        self.capacity = capacity
+        self.available = capacity
+        self.memory = memory
+        self._waiters: List[Tuple[float, int, int, Optional[float], int, Optional[str], asyncio.Future]] = []
+        self._leases: List[_Lease] = []
+        self._sequence = itertools.count()
+        self._dispatch_pending = False
+        self._retry: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self):
+        """Forget waiters and leases of a previous event loop (e.g. successive asyncio.run calls)."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._waiters, self._leases = [], []
+            self.available = self.capacity
+            if self.memory is not None:
+                self.memory.reserved = 0
+            self._dispatch_pending, self._retry = False, None
+
+    def _schedule_dispatch(self):
+        if not self._dispatch_pending:
+            self._dispatch_pending = True
+            asyncio.get_running_loop().call_soon(self._dispatch)
+
+    async def acquire(self, slots: int, priority: float = 0.0, duration: Optional[float] = None,
+                      memory: int = 0, owner: Optional[str] = None) -> _Lease:
+        self._bind_loop()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((-priority, next(self._sequence), min(slots, self.capacity), duration, memory, owner,
+                              future))
+        self._schedule_dispatch()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(future.result())
+            raise
+
+    def release(self, lease: _Lease):
+        if lease in self._leases:
+            self._leases.remove(lease)
+            self.available += lease.slots
+            if self.memory is not None:
+                self.memory.reserved -= lease.memory
+            self._schedule_dispatch()
+
+    def release_owner(self, owner: str):
+        """Release whatever a run still holds (its nodes normally release their own leases)."""
+        for lease in [lease for lease in self._leases if lease.owner == owner]:
+            self.release(lease)
+
+    def _reservation(self, slots: int, memory: int) -> Tuple[float, int, int]:
+        """(time at which slots and memory become free, slots left over then, memory still to hold back).
+
+        Based on the leases' expected ends.
+        """
+        free, freed = self.available, 0
+        for lease in sorted(self._leases, key=lambda lease: lease.expected_end):
+            free += lease.slots
+            freed += lease.memory
+            if free >= slots and (self.memory is None or self.memory.fits(memory - freed)):
+                return lease.expected_end, free - slots, max(0, memory - freed)
+        return float("inf"), 0, memory
+
+    def _dispatch(self):
+        self._dispatch_pending = False
+        now = time.monotonic()
+        reservation = None  # (shadow time, spare slots, memory held back) of the first waiter that did not fit
+        memory_blocked = False
+        waiting = []
+        for waiter in sorted(self._waiters, key=lambda waiter: waiter[:2]):
+            _, _, slots, duration, memory, owner, future = waiter
+            if future.done():
+                continue  # Cancelled while waiting
+            fits = slots <= self.available
+            held_back = 0
+            if fits and reservation is not None:
+                shadow, extra, held_back = reservation
+                if duration is not None and now + duration <= shadow:
+                    held_back = 0  # Done before the reserving waiter starts
+                elif slots <= extra:
+                    reservation = (shadow, extra - slots, held_back)
+                else:
+                    fits = False
+            if fits and self.memory is not None and self._leases and not self.memory.fits(memory, held_back):
+                fits, memory_blocked = False, True
+            if not fits:
+                if reservation is None:
+                    reservation = self._reservation(slots, memory)
+                waiting.append(waiter)
+                continue
+            lease = _Lease(slots, now + duration if duration is not None else float("inf"), memory, owner)
+            self._leases.append(lease)
+            self.available -= slots
+            if self.memory is not None:
+                self.memory.reserved += memory
+            future.set_result(lease)
+        self._waiters = waiting
+        if memory_blocked and self._retry is None:
+            def retry():
+                self._retry = None
+                self._schedule_dispatch()
+            self._retry = asyncio.get_running_loop().call_later(self.MEMORY_RETRY_SECONDS, retry)
+
+
+@dataclass
+class SchedulePlan:
+    """Estimated durations, critical-path priorities and simulated timeline of a graph."""
+    durations: Dict[str, float]
+    ranks: Dict[str, float]  # seconds from the node's start to the end of the graph
+    finish: Dict[str, float]  # simulated finish time of each node, seconds after the start
+    makespan: float
+    critical_path: List[str]
+    basis: Dict[str, str] = field(default_factory=dict)  # node id -> "source", "function" or "default"
+    memory: Dict[str, Optional[int]] = field(default_factory=dict)  # learned memory budgets in bytes
+
+    def to_dict(self, started_at: Optional[float] = None) -> Dict[str, Any]:
+        plan = {
+            "predicted_seconds": round(self.makespan, 3),
+            "critical_path": self.critical_path,
+            "estimates": {node_id: {"seconds": round(duration, 3), "basis": self.basis.get(node_id, "default")}
+                          for node_id, duration in self.durations.items()},
+        }
+        if started_at is not None:
+            plan["predicted_finish_at"] = started_at + self.makespan
+        return plan
+
+
+def plan_schedule(graph: ExecutionGraph, durations: Dict[str, float], capacity: int) -> SchedulePlan:
+    """Critical-path ranks and a list-scheduling simulation of the graph on capacity CPU slots."""
+    ranks: Dict[str, float] = {}
+    for node_id in reversed(graph.order):
+        children = [ranks[child] for child in graph.tasks[node_id].downstream]
+        ranks[node_id] = durations[node_id] + max(children, default=0.0)
+
+    def cpus(task: NodeTask) -> int:
+        return 0 if task.streaming else min(task.cpus, capacity)
+
+    remaining = {node_id: len(task.upstream) for node_id, task in graph.tasks.items()}
+    ready = [node_id for node_id in graph.order if remaining[node_id] == 0]
+    running: List[Tuple[float, int, str]] = []  # (finish, sequence, node id)
+    sequence = itertools.count()
+    finish: Dict[str, float] = {}
+    free, now = capacity, 0.0
+
+    def unlock(child: str):
+        remaining[child] -= 1
+        if remaining[child] == 0:
+            ready.append(child)
+
+    while ready or running:
+        ready.sort(key=lambda node_id: -ranks[node_id])
+        for node_id in list(ready):
+            task = graph.tasks[node_id]
+            if cpus(task) <= free:
+                ready.remove(node_id)
+                free -= cpus(task)
+                heapq.heappush(running, (now + durations[node_id], next(sequence), node_id))
+                for child in task.stream_outputs:
+                    unlock(child)
+        if not running:
+            break
+        now, _, node_id = heapq.heappop(running)
+        finish[node_id] = now
+        free += cpus(graph.tasks[node_id])
+        for child in graph.tasks[node_id].downstream:
+            if child not in graph.tasks[node_id].stream_outputs:
+                unlock(child)
+
+    critical_path = []
+    candidates = [node_id for node_id, task in graph.tasks.items() if not task.upstream]
+    while candidates:
+        node_id = max(candidates, key=lambda candidate: ranks[candidate])
+        critical_path.append(node_id)
+        candidates = list(graph.tasks[node_id].downstream)
+    return SchedulePlan(durations=durations, ranks=ranks, finish=finish, makespan=max(finish.values(), default=0.0),
+                        critical_path=critical_path)
+
+
+class GraphScheduler:
+    """Runs ExecutionGraphs concurrently on long-lived process and thread pools."""
+
+    def __init__(self, max_workers: Optional[int] = None, thread_workers: Optional[int] = None,
+                 result_cache: Optional[ResultCache] = None, manifest_store: Optional[ManifestStore] = None,
+                 history: Optional[RunHistory] = None, memory_admission: bool = True):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.thread_workers = thread_workers or min(32, self.max_workers + 4)
+        self.result_cache = result_cache
+        self.manifest_store = manifest_store
+        self.history = history
+        self.memory_admission = memory_admission
+        # CPU slots (and memory) are accounted across all runs, as they share the worker pools
+        self._slots = _SlotPool(self.max_workers, MemoryAdmission() if memory_admission else None)
+        self._pools: Dict[str, Executor] = {}
+        self._manager = None
+
+    def plan(self, graph: ExecutionGraph) -> SchedulePlan:
+        """Estimate every node from the run history and simulate the run on this scheduler's slots.
+
+        Before resolve_functions() the estimates cover every version of a
+        function; afterwards they prefer runs of the same source.
+        """
+        durations, basis, memory = {}, {}, {}
+        estimates = {}
+        if self.history is not None:
+            estimates = self.history.estimates((task.func_name, task.source_hash) for task in graph.tasks.values())
+        for node_id, task in graph.tasks.items():
+            estimate = estimates.get((task.func_name, task.source_hash))
+            durations[node_id] = estimate.duration if estimate else DEFAULT_DURATION
+            basis[node_id] = estimate.basis if estimate else "default"
+            memory[node_id] = int(estimate.peak_rss * MEMORY_MARGIN) if estimate and estimate.peak_rss else None
+        plan = plan_schedule(graph, durations, self.max_workers)
+        plan.basis, plan.memory = basis, memory
+        return plan
+
+    async def _record_history(self, graph: ExecutionGraph, profile: RunProfile):
+        rows = [{"node_id": node.node_id, "func_name": node.func_name,
+                 "source_hash": graph.tasks[node.node_id].source_hash, "status": node.status,
+                 "wall_time": node.wall_time, "cpu_time": node.cpu_time, "peak_rss_delta": node.peak_rss_delta,
+                 "result_bytes": node.result_bytes, "error": node.error, "finished_at": node.finished_at}
+                for node in profile.nodes.values()
+                if node.node_id in graph.tasks and node.status not in ("pending", "running")]
+        try:
+            await asyncio.to_thread(self.history.record, profile.run_id, rows)
+        except Exception as e:
+            print(f"Could not record run {profile.run_id} in the run history: {e}")
+
+    def _executor_for(self, kind: str) -> Executor:
+        """Create pools lazily so importing the scheduler stays cheap."""
+        if kind not in self._pools:
+            if kind == "process":
+                # Workers must report shared memory to this process's tracker, not start their own
+                resource_tracker.ensure_running()
+                self._pools[kind] = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pools[kind] = ThreadPoolExecutor(
+                    max_workers=self.thread_workers, thread_name_prefix="ncpipe-node"
+                )
+        return self._pools[kind]
+
+    @staticmethod
+    def _dedicated_executor(kind: str) -> Executor:
+        """One-off worker for a stream node, so producers and consumers never wait for each other's slot."""
+        if kind == "process":
+            resource_tracker.ensure_running()
+            return ProcessPoolExecutor(max_workers=1)
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix="ncpipe-stream")
+
+    def _stream_manager(self):
+        """Manager process holding the stream queues, started with the first stream."""
+        if self._manager is None:
+            resource_tracker.ensure_running()
+            self._manager = multiprocessing.Manager()
+        return self._manager
+
+    def _open_streams(self, graph: ExecutionGraph) -> Dict[Tuple[str, str], StreamChannel]:
+        manager = None
+        streams = {}
+        for task in graph.tasks.values():
+            for source in task.streamed.values():
+                manager = manager or self._stream_manager()
+                streams[(source, task.node_id)] = StreamChannel.create(manager, source, task.node_id)
+        return streams
+
+    @staticmethod
+    def _close_streams(streams: Dict[Tuple[str, str], StreamChannel]):
+        for channel in streams.values():
+            try:
+                channel.cleanup()
+            except (OSError, EOFError) as e:  # The manager is already gone
+                print(f"Could not close stream {channel.source} -> {channel.target}: {e}")
+
+    async def _call_worker(self, kind: str, func: Callable, *args, executor: Optional[Executor] = None) -> Any:
+        """Run func in a pool; if the caller is cancelled, the call's results are freed when it ends."""
+        pool = executor or self._executor_for(kind)
+        future = pool.submit(func, *args)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(_release_abandoned)
+            raise
+        except BrokenProcessPool as e:
+            # A dead worker (usually the OOM killer) or a result that could not be unpickled breaks the
+            # whole pool; later nodes get a fresh one
+            if self._pools.get(kind) is pool:
+                del self._pools[kind]
+                pool.shutdown(wait=False, cancel_futures=True)
+            if e.__cause__ is not None:  # The pool's traceback of the failed unpickling
+                lines = [line for line in str(e.__cause__).splitlines() if line.strip(" '")]
+                raise RuntimeError(f"A result from a worker process could not be unpickled in the server "
+                                   f"({lines[-1] if lines else 'unknown error'})") from None
+            raise RuntimeError("The worker process running this node died (killed by the operating system, "
+                               "e.g. out of memory)") from None
+
+    def _assign_cache_key(self, graph: ExecutionGraph, task: NodeTask):
+        """Key a node once its upstream keys are known; uncached upstreams make it uncached too."""
+        upstream_keys = [graph.tasks[node_id].cache_key for node_id in sorted(task.upstream)]
+        if task.result_cacheable and task.source_hash and None not in upstream_keys:
+            task.cache_key = result_cache_key(task.source_hash, task.func_name, task.args, upstream_keys)
+        else:
+            task.cache_key = None
+        if task.map_spec is not None:
+            # Items are keyed by their own value, not by the list (or the node producing it)
+            mapped_source = task.bindings.get(task.map_spec.param)
+            task.shard_upstream_keys = None if task.cache_key is None else [
+                graph.tasks[node_id].cache_key for node_id in sorted(task.upstream) if node_id != mapped_source
+            ]
+
+    @staticmethod
+    def _bind_args(task: NodeTask, results: Dict[str, Any], owned: List[SharedBuffer],
+                   streams: Optional[Dict[Tuple[str, str], StreamChannel]] = None) -> List[Any]:
+        """Fill upstream placeholders; process workers get large buffers through shared memory."""
+        args = []
+        for arg in task.args:
+            if isinstance(arg, UpstreamResult) and (arg.node_id, task.node_id) in (streams or {}):
+                arg = streams[(arg.node_id, task.node_id)]
+            elif isinstance(arg, UpstreamResult):
+                arg = results[arg.node_id]
+                if task.executor == "process" and not isinstance(arg, SharedBuffer):
+                    arg = export_value(arg)
+                    if isinstance(arg, SharedBuffer):
+                        owned.append(arg)
+            args.append(arg)
+        return args
+
+    @staticmethod
+    async def _notify(listener: Optional[NodeListener], event: str, task: NodeTask, **info):
+        if listener is None:
+            return
+        try:
+            await listener(event, task, info)
+        except Exception as e:
+            print(f"Run listener error ({event}, node {task.node_id}): {e}")
+
+    async def _run_task(self, task: NodeTask, slots: _SlotPool, profile: RunProfile,
+                        results: Dict[str, Any], owned: List[SharedBuffer],
+                        listener: Optional[NodeListener] = None,
+                        streams: Optional[Dict[Tuple[str, str], StreamChannel]] = None,
+                        on_started: Optional[Callable[[str], None]] = None,
+                        make: Optional[str] = None) -> Tuple[Any, bool]:
+        """Run one node, returning (result, cache_hit); on_started(node_id) fires when a generator starts.
+
+        With make, an up-to-date node is not run: its status becomes "skipped" and the result is None.
+        """
+        node_profile = profile.node(task.node_id, task.func_name, task.executor)
+        node_profile.queued_at = time.time()
+        freshness = None
+        if make:
+            freshness = await asyncio.to_thread(self.manifest_store.check, task, make)
+            node_profile.freshness = freshness.reason
+            if freshness.fresh:
+                await asyncio.to_thread(self.manifest_store.record, task, freshness, make)
+                node_profile.status = "skipped"
+                node_profile.started_at = node_profile.finished_at = time.time()
+                await self._notify(listener, "node_finished", task, result=None, profile=node_profile)
+                return None, False
+        elif task.cache_key and task.map_spec is None:
+            hit, value = await asyncio.to_thread(self.result_cache.get, task.cache_key)
+            if hit:
+                node_profile.status, node_profile.cache_hit = "cached", True
+                node_profile.started_at = node_profile.finished_at = time.time()
+                await self._notify(listener, "node_finished", task, result=value, profile=node_profile)
+                return value, True
+
+        args = task.args
+        if task.bindings:
+            args = await asyncio.to_thread(self._bind_args, task, results, owned, streams)
+        if task.map_spec is not None:
+            return await self._run_map(task, args, slots, node_profile, owned, listener, profile.run_id)
+
+        streaming = task.streaming
+        cpus = 0 if streaming else min(task.cpus, slots.capacity)
+        node_profile.memory_budget = task.memory_budget or None
+        # Stream items already handed downstream cannot be taken back, so stream nodes are not retried
+        retry = task.retry if not streaming else None
+        attempt = 0
+        while True:
+            lease = await slots.acquire(cpus, task.priority, task.estimate, task.memory_budget, profile.run_id)
+            node_profile.status = "running"
+            if not attempt:
+                await self._notify(listener, "node_started", task, profile=node_profile)
+            executor = self._dedicated_executor(task.executor) if streaming else None
+            delay = None
+            try:
+                if task.generator:
+                    if on_started is not None and task.stream_outputs:
+                        on_started(task.node_id)
+                    channels = [streams[(task.node_id, target)] for target in task.stream_outputs]
+                    result, metrics = await self._call_worker(
+                        task.executor, run_node_generator, task.function_file, task.func_name, args, channels,
+                        task.executor == "thread", task.profile, task.limits, executor=executor,
+                    )
+                else:
+                    result, metrics = await self._call_worker(
+                        task.executor, run_node_profiled, task.function_file, task.func_name, args,
+                        task.executor == "thread", task.profile, task.limits, executor=executor,
+                    )
+                owned.extend(_shared_handles(result))
+                node_profile.record(metrics)
+                node_profile.result_bytes = value_nbytes(result)
+                node_profile.status = "completed"
+            except BaseException as e:
+                delay = retry.delay_for(e, attempt) if retry is not None and isinstance(e, Exception) else None
+                if delay is None:
+                    node_profile.status = "failed" if isinstance(e, Exception) else "cancelled"
+                    node_profile.error = str(e) or type(e).__name__
+                    node_profile.finished_at = time.time()
+                    if isinstance(e, Exception):
+                        await self._notify(listener, "node_failed", task, error=node_profile.error,
+                                           profile=node_profile)
+                    raise
+                node_profile.retries += 1
+                node_profile.status = "retrying"
+                await self._notify(listener, "node_retrying", task, profile=node_profile, attempt=attempt + 1,
+                                   error=f"{type(e).__name__}: {e}", delay=delay)
+            finally:
+                slots.release(lease)
+                if executor is not None:
+                    executor.shutdown(wait=False)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)  # Backing off without holding a slot
+            attempt += 1
+
+        if freshness is not None:
+            try:
+                await asyncio.to_thread(self.manifest_store.record, task, freshness, make)
+            except OSError as e:
+                print(f"Could not record the data manifest of node {task.node_id}: {e}")
+        await self._notify(listener, "node_finished", task, result=result, profile=node_profile)
+        if task.cache_key:
+            await asyncio.to_thread(lambda: self.result_cache.put(task.cache_key, materialize(result)))
+        return result, False
+
+    async def _restore_task(self, task: NodeTask, value: Any, profile: RunProfile,
+                            listener: Optional[NodeListener] = None) -> Tuple[Any, bool]:
+        """Stand-in for _run_task on a node whose result comes from a previous attempt of the run."""
+        node_profile = profile.node(task.node_id, task.func_name, task.executor)
+        node_profile.status = "restored"
+        node_profile.queued_at = node_profile.started_at = node_profile.finished_at = time.time()
+        node_profile.result_bytes = value_nbytes(value)
+        await self._notify(listener, "node_finished", task, result=value, profile=node_profile)
+        return value, False
+
+    @staticmethod
+    def _node_error(error: Exception, node_id: str) -> GraphExecutionError:
+        if isinstance(error, GraphExecutionError):
+            error.node_id = error.node_id or node_id
+            return error
+        wrapped = GraphExecutionError(str(error), status=500, node_id=node_id)
+        wrapped.__cause__ = error
+        return wrapped
+
+    def _shard_key(self, task: NodeTask, args: List[Any], item: Any) -> Optional[str]:
+        if task.shard_upstream_keys is None or isinstance(item, SharedBuffer):
+            return None
+        shard_args = list(args)
+        shard_args[task.map_index] = item
+        return result_cache_key(task.source_hash, task.func_name, shard_args, task.shard_upstream_keys)
+
+    async def _run_map(self, task: NodeTask, args: List[Any], slots: _SlotPool, node_profile,
+                       owned: List[SharedBuffer], listener: Optional[NodeListener],
+                       owner: Optional[str] = None) -> Tuple[List[Any], bool]:
+        """Run a map node item by item across the pool; returns (outputs in item order, all cached)."""
+        spec = task.map_spec
+        items = await asyncio.to_thread(spec.resolve_items, args[task.map_index], task.folder_path)
+        outputs: List[Any] = [None] * len(items)
+        keys = [self._shard_key(task, task.args, item) for item in items]
+        shards = {"total": len(items), "cached": 0, "completed": 0, "retried": 0}
+        node_profile.shards = shards
+
+        pending = []
+        for index, key in enumerate(keys):
+            if key is not None:
+                hit, value = await asyncio.to_thread(self.result_cache.get, key)
+                if hit:
+                    outputs[index] = value
+                    shards["cached"] += 1
+                    continue
+            pending.append(index)
+
+        node_profile.status = "running"
+        node_profile.started_at = time.time()
+        await self._notify(listener, "node_started", task, profile=node_profile)
+
+        cpus = min(task.cpus, slots.capacity)
+        limit = asyncio.Semaphore(spec.max_concurrency or max(1, slots.capacity))
+        per_thread = task.executor == "thread"
+        worker_args = list(args)
+        worker_args[task.map_index] = None  # Each chunk only ships its own items
+        totals = {"cpu_time": 0.0, "peak_rss_delta": 0, "read_bytes": None, "write_bytes": None}
+
+        async def run_chunk(indices: List[int]):
+            for attempt in range(spec.retries + 1):
+                if attempt:
+                    shards["retried"] += len(indices)
+                    await asyncio.sleep(spec.retry_delay * 2 ** (attempt - 1))
+                async with limit:
+                    lease = await slots.acquire(cpus, task.priority, memory=task.memory_budget,
+                                                owner=owner)
+                    try:
+                        outcomes, metrics = await self._call_worker(
+                            task.executor, run_node_map_chunk, task.function_file, task.func_name, worker_args, task.map_index,
+                            [items[index] for index in indices], per_thread, task.profile, task.limits,
+                        )
+                    except Exception as e:  # The worker itself failed; retry the whole chunk
+                        outcomes, metrics = [(False, str(e) or type(e).__name__)] * len(indices), {}
+                    finally:
+                        slots.release(lease)
+
+                totals["cpu_time"] += metrics.get("cpu_time") or 0.0
+                totals["peak_rss_delta"] = max(totals["peak_rss_delta"], metrics.get("peak_rss_delta") or 0)
+                for counter in ("read_bytes", "write_bytes"):
+                    if metrics.get(counter) is not None:
+                        totals[counter] = (totals[counter] or 0) + metrics[counter]
+                failed = []
+                for index, (ok, value) in zip(indices, outcomes):
+                    if not ok:
+                        failed.append((index, value))
+                        continue
+                    if isinstance(value, SharedBuffer):
+                        owned.append(value)
+                    outputs[index] = value
+                    shards["completed"] += 1
+                    if keys[index] is not None:
+                        await asyncio.to_thread(self.result_cache.put, keys[index], materialize(value))
+                await self._notify(listener, "node_progress", task, profile=node_profile,
+                                   done=shards["cached"] + shards["completed"], total=len(items))
+                if not failed:
+                    return
+                indices = [index for index, _ in failed]
+            index, error = failed[0]
+            raise GraphExecutionError(
+                f"Item {items[index]!r} failed after {spec.retries + 1} attempt(s): {error}", status=500
+            )
+
+        chunks = [pending[start:start + spec.chunk_size] for start in range(0, len(pending), spec.chunk_size)]
+        futures = [asyncio.ensure_future(run_chunk(chunk)) for chunk in chunks]
+        try:
+            if futures:
+                await asyncio.gather(*futures)
+        except BaseException as e:
+            for future in futures:
+                future.cancel()
+            await asyncio.gather(*futures, return_exceptions=True)
+            node_profile.status = "failed" if isinstance(e, Exception) else "cancelled"
+            node_profile.error = str(e) or type(e).__name__
+            node_profile.finished_at = time.time()
+            if isinstance(e, Exception):
+                await self._notify(listener, "node_failed", task, error=node_profile.error, profile=node_profile)
+            raise
+
+        node_profile.finished_at = time.time()
+        node_profile.wall_time = node_profile.finished_at - node_profile.started_at
+        node_profile.queue_wait = max(0.0, node_profile.started_at - node_profile.queued_at)
+        node_profile.cpu_time = totals["cpu_time"]
+        node_profile.peak_rss_delta = totals["peak_rss_delta"]
+        node_profile.read_bytes, node_profile.write_bytes = totals["read_bytes"], totals["write_bytes"]
+        all_cached = bool(items) and not pending
+        node_profile.status = "cached" if all_cached else "completed"
+        node_profile.cache_hit = all_cached
+        # Downstream keys follow the actual items, so a reduce step re-runs when the item list changes
+        task.cache_key = (result_cache_key(task.source_hash, task.func_name, ["map"], keys)
+                          if keys and None not in keys else None)
+        await self._notify(listener, "node_finished", task, result=outputs, profile=node_profile)
+        return outputs, all_cached
+
+    async def run(self, graph: ExecutionGraph, use_cache: bool = True,
+                  profile: Optional[RunProfile] = None, listener: Optional[NodeListener] = None,
+                  owned: Optional[List[SharedBuffer]] = None, make: Optional[str] = None,
+                  restored: Optional[Dict[str, Any]] = None, keep_going: bool = False) -> RunReport:
+        """Execute the graph, starting each node as soon as its upstream nodes finish.
+
+        make ("mtime" or "hash") skips nodes whose data folders are up to date,
+        see data_manifest.py; it needs a scheduler with a manifest store.
+        restored gives the results of nodes that are not executed again (status
+        "restored"). By default the first failed node aborts the run; with
+        keep_going only its descendants are dropped, and the first failure is
+        raised once everything else has finished.
+
+        Pass a RunProfile to keep access to the timeline when the run fails.
+        Cancelling the coroutine cancels queued nodes; nodes already running in
+        a worker are abandoned and their results dropped (shared buffers they
+        return are freed once they finish).
+
+        Shared buffers created during the run are released when it ends, so
+        SharedBuffer values in the report only carry their description. Pass
+        an owned list to collect them and release them yourself instead.
+        """
+        if make is not None and make not in MAKE_MODES:
+            raise GraphExecutionError(f"Unknown make mode '{make}' (expected one of {', '.join(MAKE_MODES)})")
+        if make and self.manifest_store is None:
+            raise GraphExecutionError("Make mode needs a scheduler with a manifest store")
+        profile = profile or RunProfile(run_id=uuid.uuid4().hex[:12])
+        skipped: Dict[str, str] = {}
+        restored = restored or {}
+        failures: List[GraphExecutionError] = []
+        plan = await asyncio.to_thread(self.plan, graph)
+        for node_id, task in graph.tasks.items():
+            task.priority, task.estimate = plan.ranks[node_id], plan.durations[node_id]
+            task.memory_estimate = plan.memory.get(node_id)
+        slots = self._slots
+        remaining = {node_id: len(task.upstream) for node_id, task in graph.tasks.items()}
+        ready = [node_id for node_id in graph.order if remaining[node_id] == 0]
+        running: Dict[asyncio.Task, str] = {}
+        results = {}
+        release_owned = owned is None
+        owned = [] if owned is None else owned
+        cache_hits = []
+        use_cache = use_cache and self.result_cache is not None
+        streams = await asyncio.to_thread(self._open_streams, graph)
+        # Stream consumers become ready when their generator starts rather than when it finishes
+        started: List[str] = []
+        wakeup = asyncio.Event()
+
+        def on_started(node_id: str):
+            started.append(node_id)
+            wakeup.set()
+
+        try:
+            while ready or running:
+                for node_id in ready:
+                    task = graph.tasks[node_id]
+                    if use_cache:
+                        self._assign_cache_key(graph, task)
+                    if node_id in restored:
+                        running[asyncio.ensure_future(
+                            self._restore_task(task, restored[node_id], profile, listener)
+                        )] = node_id
+                        continue
+                    node_make = make
+                    if make:
+                        exclusion = graph.make_exclusion(node_id)
+                        if exclusion:
+                            profile.node(node_id, task.func_name, task.executor).freshness = exclusion
+                            node_make = None
+                    future = asyncio.ensure_future(
+                        self._run_task(task, slots, profile, results, owned, listener, streams, on_started,
+                                       node_make)
+                    )
+                    running[future] = node_id
+                ready = []
+
+                waiter = asyncio.ensure_future(wakeup.wait())
+                done, _ = await asyncio.wait([*running, waiter], return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                wakeup.clear()
+                for node_id in started:
+                    for child in graph.tasks[node_id].stream_outputs:
+                        remaining[child] -= 1
+                        if remaining[child] == 0:
+                            ready.append(child)
+                started.clear()
+
+                for future in done:
+                    if future is waiter:
+                        continue
+                    node_id = running.pop(future)
+                    try:
+                        results[node_id], hit = future.result()
+                    except Exception as e:
+                        error = self._node_error(e, node_id)
+                        if not keep_going:
+                            raise error
+                        failures.append(error)
+                        continue  # Its descendants never become ready
+                    if hit:
+                        cache_hits.append(node_id)
+                    elif profile.nodes[node_id].status == "skipped":
+                        del results[node_id]
+                        skipped[node_id] = profile.nodes[node_id].freshness
+
+                    for child in sorted(graph.tasks[node_id].downstream):
+                        if child in graph.tasks[node_id].stream_outputs:
+                            continue  # Already started with the stream
+                        remaining[child] -= 1
+                        if remaining[child] == 0:
+                            ready.append(child)
+            if failures:
+                raise failures[0]
+        finally:
+            # A failed node aborts the run; nodes not started yet are dropped
+            for future in running:
+                future.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            slots.release_owner(profile.run_id)
+            for node_profile in profile.nodes.values():
+                if node_profile.status in ("pending", "running", "retrying"):
+                    node_profile.status = "cancelled"
+            if streams:
+                await asyncio.to_thread(self._close_streams, streams)
+            if release_owned:
+                await asyncio.to_thread(release, owned)
+            profile.finished_at = time.time()
+            if self.history is not None:
+                await self._record_history(graph, profile)
+
+        return RunReport(
+            results={node_id: results[node_id] for node_id in graph.order if node_id in results},
+            cache_hits=[node_id for node_id in graph.order if node_id in cache_hits],
+            profile=profile,
+            skipped={node_id: skipped[node_id] for node_id in graph.order if node_id in skipped},
+            restored=[node_id for node_id in graph.order if node_id in restored],
+        )
+
+    def shutdown(self):
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._pools.clear()
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
@@ -0,0 +1,238 @@
+"""
+Graph Sync
+==========
+Versioned, patch-based synchronisation of the canvas graph over /realtime-updates.
+
+The server keeps an authoritative copy of each client session's graph. The
+graph is addressed as {"nodes": {id: node}, "edges": {id: edge}}, so patches
+use id-based JSON pointers rather than array positions:
+
+    {"op": "add",     "path": "/nodes/n3", "value": {...}}
+    {"op": "replace", "path": "/nodes/n3/data/inputs/x", "value": "5"}
+    {"op": "remove",  "path": "/edges/e1-2"}
+
+Client messages:
+
+    {"type": "graph_hello",    "session": sid, "version": v}
+    {"type": "graph_patch",    "session": sid, "seq": n, "base_version": v, "ops": [...]}
+    {"type": "graph_snapshot", "session": sid, "seq": n, "nodes": [...], "edges": [...]}
+    {"type": "graph_resync",   "session": sid}
+
+Server replies:
+
+    {"type": "graph_ack",      "session": sid, "seq": n, "version": v}
+    {"type": "graph_nack",     "session": sid, "seq": n, "version": v, "reason": ...}
+    {"type": "graph_snapshot", "session": sid, "version": v, "nodes": [...], "edges": [...]}
+
+Each applied patch or snapshot bumps the version by one. A patch whose
+base_version does not match, or that cannot be applied, is answered with a
+nack. Further patches are then ignored until the client sends a snapshot.
+Messages that arrive in a burst are applied together and acknowledged with
+a single ack for the highest seq.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Canvas-only flags that are not part of the pipeline
+TRANSIENT_NODE_KEYS = ("selected", "dragging", "resizing")
+
+
+class PatchError(ValueError):
+    """Raised when a patch does not apply to the session's graph."""
+
+
+def _parse_pointer(path: str) -> List[str]:
+    if not path.startswith("/"):
+        raise PatchError(f"Invalid path '{path}'")
+    return [part.replace("~1", "/").replace("~0", "~") for part in path[1:].split("/")]
+
+
+def _resolve(document: Any, parts: List[str]) -> Tuple[Any, str]:
+    """Container and key addressed by a pointer."""
+    target = document
+    for part in parts[:-1]:
+        if isinstance(target, list):
+            try:
+                target = target[int(part)]
+            except (ValueError, IndexError):
+                raise PatchError(f"Invalid list index '{part}'")
+        elif isinstance(target, dict) and part in target:
+            target = target[part]
+        else:
+            raise PatchError(f"Path segment '{part}' not found")
+    return target, parts[-1]
+
+
+def apply_op(document: Dict[str, Any], op: Dict[str, Any]):
+    """Apply one add/replace/remove operation in place."""
+    kind = op.get("op")
+    parts = _parse_pointer(op.get("path", ""))
+    if len(parts) < 2 or parts[0] not in ("nodes", "edges"):
+        raise PatchError(f"Patches must address /nodes/<id> or /edges/<id>, got '{op.get('path')}'")
+    container, key = _resolve(document, parts)
+
+    if kind in ("add", "replace"):
+        if "value" not in op:
+            raise PatchError(f"'{kind}' without a value")
+        value = op["value"]
+        if isinstance(container, list):
+            if key == "-":
+                container.append(value)
+                return
+            try:
+                index = int(key)
+            except ValueError:
+                raise PatchError(f"Invalid list index '{key}'")
+            if kind == "add":
+                container.insert(index, value)
+            else:
+                container[index] = value
+        elif isinstance(container, dict):
+            if kind == "replace" and key not in container:
+                raise PatchError(f"Cannot replace missing '{op['path']}'")
+            container[key] = value
+        else:
+            raise PatchError(f"Cannot set a value inside a {type(container).__name__}")
+    elif kind == "remove":
+        try:
+            if isinstance(container, list):
+                del container[int(key)]
+            else:
+                del container[key]
+        except (KeyError, ValueError, IndexError, TypeError):
+            raise PatchError(f"Cannot remove missing '{op['path']}'")
+    else:
+        raise PatchError(f"Unsupported op '{kind}'")
+
+
+def _keyed(items: List[Dict[str, Any]], kind: str) -> Dict[str, Dict[str, Any]]:
+    keyed = {}
+    for item in items or []:
+        if kind == "edges" and "id" not in item:
+            item = {**item, "id": f"{item.get('source')}-{item.get('target')}"}
+        if kind == "nodes":
+            item = {key: value for key, value in item.items() if key not in TRANSIENT_NODE_KEYS}
+        keyed[str(item["id"])] = item
+    return keyed
+
+
+class GraphSession:
+    """Authoritative graph of one client session."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.version = 0
+        self.graph: Dict[str, Dict[str, Any]] = {"nodes": {}, "edges": {}}
+        self.awaiting_snapshot = False
+        self.last_seen = time.time()
+        self.lock = threading.Lock()
+
+    def load(self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> int:
+        """Replace the whole graph (snapshot or legacy full update)."""
+        with self.lock:
+            self.graph = {"nodes": _keyed(nodes, "nodes"), "edges": _keyed(edges, "edges")}
+            self.version += 1
+            self.awaiting_snapshot = False
+            return self.version
+
+    def apply(self, base_version: int, ops: List[Dict[str, Any]]) -> int:
+        """Apply a patch atomically; raises PatchError on a version mismatch or a bad op."""
+        with self.lock:
+            if base_version != self.version:
+                raise PatchError(f"Version mismatch (client {base_version}, server {self.version})")
+            # Ops are applied to a copy of the touched top-level entries so a failing op changes nothing
+            graph = {"nodes": dict(self.graph["nodes"]), "edges": dict(self.graph["edges"])}
+            copied = set()
+            for op in ops:
+                parts = _parse_pointer(op.get("path", ""))
+                if len(parts) > 2 and (parts[0], parts[1]) not in copied and parts[1] in graph.get(parts[0], {}):
+                    graph[parts[0]][parts[1]] = copy.deepcopy(graph[parts[0]][parts[1]])
+                    copied.add((parts[0], parts[1]))
+                apply_op(graph, op)
+            self.graph = graph
+            self.version += 1
+            return self.version
+
+    @property
+    def nodes(self) -> List[Dict[str, Any]]:
+        return list(self.graph["nodes"].values())
+
+    @property
+    def edges(self) -> List[Dict[str, Any]]:
+        return list(self.graph["edges"].values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"type": "graph_snapshot", "session": self.session_id, "version": self.version,
+                    "nodes": self.nodes, "edges": self.edges}
+
+
+class GraphSessions:
+    """Graph sessions by id; idle sessions are dropped once there are more than max_sessions."""
+
+    def __init__(self, max_sessions: int = 256):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, GraphSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, create: bool = False) -> Optional[GraphSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None and create:
+                session = self._sessions[session_id] = GraphSession(session_id)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            if session is not None:
+                session.last_seen = time.time()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def handle(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Process a burst of sync messages from one client and return the replies.
+
+        Acks are coalesced: one per session, for the highest seq applied.
+        """
+        replies: List[Dict[str, Any]] = []
+
+        def ack(session: GraphSession, seq: Any):
+            replies[:] = [reply for reply in replies
+                          if not (reply["type"] == "graph_ack" and reply["session"] == session.session_id)]
+            replies.append({"type": "graph_ack", "session": session.session_id, "seq": seq,
+                            "version": session.version})
+
+        def nack(session: GraphSession, seq: Any, reason: str):
+            session.awaiting_snapshot = True
+            replies.append({"type": "graph_nack", "session": session.session_id, "seq": seq,
+                            "version": session.version, "reason": reason})
+
+        for message in messages:
+            session = self.get(str(message.get("session") or "default"), create=True)
+            kind = message.get("type")
+            seq = message.get("seq")
+
+            if kind == "graph_hello":
+                if message.get("version") == session.version and not session.awaiting_snapshot:
+                    ack(session, seq)
+                else:
+                    nack(session, seq, "Unknown client version")
+            elif kind == "graph_resync":
+                replies.append(session.snapshot())
+            elif kind in ("graph_snapshot", "graph_update"):
+                # graph_update is the old full-payload message: {"data": {"nodes", "edges"}}
+                data = message.get("data", message)
+                session.load(data.get("nodes", []), data.get("edges", []))
+                ack(session, seq)
+            elif kind == "graph_patch":
+                if session.awaiting_snapshot:
+                    continue  # Already nacked; the client is about to send a snapshot
+                try:
+                    session.apply(message.get("base_version"), message.get("ops", []))
+                except PatchError as e:
+                    nack(session, seq, str(e))
+                    continue
+                ack(session, seq)
+        return replies
@@ -0,0 +1,307 @@
+"""
+Module Cache for Pipeline Functions
+===================================
+Keeps pipeline scripts loaded between executions instead of re-parsing and
+re-executing them for every node.
+
+- FunctionIndex maps function names to (file, lineno, parameters) for a folder.
+  Each file is parsed once and only re-parsed when it changes.
+- ModuleCache imports each file once per process and hands out its functions.
+  Heavy module-level imports (numpy, torch, cellpose, ...) are paid only once.
+
+A file is considered changed when its (mtime, size) signature differs and its
+content hash differs too, so touching a file without editing it does not
+trigger a reload. dependency_hash() extends this to the modules a block
+imports from its own folder or package (helpers.py, utils/io.py, relative
+imports), so a block is reloaded, and its cached results are invalidated,
+when one of those changes too. Installed packages are not tracked.
+"""
+
+import ast
+import hashlib
+import importlib.util
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def file_signature(path: str) -> Tuple[int, int]:
+    """Cheap change detector: (mtime in ns, size in bytes)."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def is_generator_function(node: ast.FunctionDef) -> bool:
+    """True if the function body itself (not a nested function or lambda) yields."""
+    pending = list(node.body)
+    while pending:
+        child = pending.pop()
+        if isinstance(child, (ast.Yield, ast.YieldFrom)):
+            return True
+        if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            pending.extend(ast.iter_child_nodes(child))
+    return False
+
+
+@dataclass
+class IndexedFunction:
+    """Location and positional parameters of a function found in a folder."""
+    name: str
+    file_path: str
+    lineno: int
+    parameters: List[str]
+    source_hash: str  # content hash of the defining file
+    is_generator: bool = False
+
+
+@dataclass
+class _IndexedFile:
+    signature: Tuple[int, int]
+    digest: str
+    functions: Dict[str, IndexedFunction] = field(default_factory=dict)
+
+
+class FunctionIndex:
+    """Name -> IndexedFunction index over the top-level .py files of a folder."""
+
+    def __init__(self, folder_path: str):
+        self.folder_path = folder_path
+        self._files: Dict[str, _IndexedFile] = {}
+        self._by_name: Dict[str, IndexedFunction] = {}
+        self._lock = threading.Lock()
+
+    def _index_file(self, file_path: str, signature: Tuple[int, int]) -> _IndexedFile:
+        with open(file_path, "rb") as file:
+            data = file.read()
+        digest = content_hash(data)
+
+        previous = self._files.get(file_path)
+        if previous and previous.digest == digest:
+            previous.signature = signature
+            return previous
+
+        entry = _IndexedFile(signature=signature, digest=digest)
+        try:
+            tree = ast.parse(data)
+        except SyntaxError as e:
+            print(f"Syntax error in {file_path}: {e}")
+            return entry
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef) and node.name not in entry.functions:
+                entry.functions[node.name] = IndexedFunction(
+                    name=node.name,
+                    file_path=file_path,
+                    lineno=node.lineno,
+                    parameters=[arg.arg for arg in node.args.args],
+                    source_hash=digest,
+                    is_generator=is_generator_function(node),
+                )
+        return entry
+
+    def refresh(self) -> bool:
+        """Re-index files that were added, removed or modified. Returns True if anything changed."""
+        with self._lock:
+            current = {}
+            for filename in sorted(os.listdir(self.folder_path)):
+                if filename.endswith(".py"):
+                    file_path = os.path.join(self.folder_path, filename)
+                    try:
+                        current[file_path] = file_signature(file_path)
+                    except OSError:
+                        continue
+
+            changed = set(self._files) != set(current)
+            files = {}
+            for file_path, signature in current.items():
+                entry = self._files.get(file_path)
+                if entry is None or entry.signature != signature:
+                    new_entry = self._index_file(file_path, signature)
+                    changed = changed or entry is None or new_entry.digest != entry.digest
+                    entry = new_entry
+                files[file_path] = entry
+            self._files = files
+
+            if changed:
+                # The first file (in name order) defining a function wins
+                by_name = {}
+                for entry in self._files.values():
+                    for name, func in entry.functions.items():
+                        by_name.setdefault(name, func)
+                self._by_name = by_name
+            return changed
+
+    def lookup(self, func_name: str) -> Optional[IndexedFunction]:
+        self.refresh()
+        return self._by_name.get(func_name)
+
+
+def local_imports(file_path: str, tree: ast.AST, root: Optional[str] = None) -> List[str]:
+    """Files of the modules a file imports from root (default: its folder), relative imports included."""
+    here = os.path.dirname(os.path.abspath(file_path))
+    root = root or here
+    found = []
+
+    def add(base: str, parts: List[str]):
+        path = os.path.join(base, *parts)
+        for candidate in (path + ".py", os.path.join(path, "__init__.py")):
+            if os.path.isfile(candidate):
+                found.append(candidate)
+                return
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                parts = alias.name.split(".")
+                for depth in range(1, len(parts) + 1):  # Packages along the way run too
+                    add(root, parts[:depth])
+        elif isinstance(node, ast.ImportFrom):
+            base = root
+            if node.level:
+                base = here
+                for _ in range(node.level - 1):
+                    base = os.path.dirname(base)
+            parts = node.module.split(".") if node.module else []
+            for depth in range(1, len(parts) + 1):
+                add(base, parts[:depth])
+            for alias in node.names:
+                if alias.name != "*":
+                    add(base, parts + [alias.name])  # from package import submodule
+    return found
+
+
+_sources: Dict[str, Tuple[Tuple[int, int], str, List[str]]] = {}  # path -> (signature, digest, local imports)
+_sources_lock = threading.Lock()
+
+
+def _source_info(file_path: str, root: str) -> Tuple[str, List[str]]:
+    """(content hash, local imports) of a file, parsed again only when its signature changes."""
+    signature = file_signature(file_path)
+    with _sources_lock:
+        cached = _sources.get(file_path)
+    if cached and cached[0] == signature:
+        return cached[1], cached[2]
+    with open(file_path, "rb") as file:
+        data = file.read()
+    try:
+        imports = local_imports(file_path, ast.parse(data), root)
+    except SyntaxError:
+        imports = []
+    digest = content_hash(data)
+    with _sources_lock:
+        _sources[file_path] = (signature, digest, imports)
+    return digest, imports
+
+
+def local_dependencies(file_path: str) -> Dict[str, str]:
+    """{path: content hash} of a block file and the local modules it imports, transitively."""
+    file_path = os.path.abspath(file_path)
+    root = os.path.dirname(file_path)
+    digests: Dict[str, str] = {}
+    pending = [file_path]
+    while pending:
+        path = os.path.abspath(pending.pop())
+        if path in digests:
+            continue
+        try:
+            digests[path], imports = _source_info(path, root)
+        except OSError:
+            digests[path], imports = "missing", []
+        pending.extend(imports)
+    return digests
+
+
+def dependency_hash(file_path: str, dependencies: Optional[Dict[str, str]] = None) -> str:
+    """Content hash of a block file together with the local modules it imports (its own hash if none)."""
+    file_path = os.path.abspath(file_path)
+    dependencies = dependencies or local_dependencies(file_path)
+    if len(dependencies) == 1:
+        return dependencies[file_path]
+    return content_hash("\n".join(f"{path}:{digest}" for path, digest in sorted(dependencies.items())).encode())
+
+
+class ModuleCache:
+    """Per-process cache of imported pipeline modules, keyed by file path."""
+
+    def __init__(self):
+        self._modules: Dict[str, Tuple[str, Any]] = {}  # path -> (dependency hash, module)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _module_name(file_path: str) -> str:
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        return f"ncpipe_block_{stem}_{content_hash(file_path.encode())[:8]}"
+
+    def _import(self, file_path: str, module_name: str) -> Any:
+        folder = os.path.dirname(file_path)
+        if folder not in sys.path:
+            sys.path.append(folder)  # Blocks import their helpers from their own folder
+        spec = importlib.util.spec_from_file_location(module_name, file_path)
+        module = importlib.util.module_from_spec(spec)
+        # Registered so instances of classes defined in the module pickle by this name. Workers and the
+        # server derive the same name from the path, and the server imports process nodes' modules too
+        # (ExecutionGraph.resolve_functions), so such results unpickle on both sides
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            sys.modules.pop(module_name, None)
+            raise
+        return module
+
+    def load_module(self, file_path: str) -> Any:
+        """Return the module for file_path, importing it again only if it or a local import changed."""
+        file_path = os.path.abspath(file_path)
+        with self._lock:
+            dependencies = local_dependencies(file_path)  # Only files whose signature changed are read
+            digest = dependency_hash(file_path, dependencies)
+            cached = self._modules.get(file_path)
+            if cached and cached[0] == digest:
+                return cached[1]
+
+            if cached:
+                # The block's helpers are imported again too, from their current source
+                helpers = dependencies.keys() - {file_path}
+                for name, module in list(sys.modules.items()):
+                    module_file = getattr(module, "__file__", None)
+                    if module_file and os.path.abspath(module_file) in helpers:
+                        del sys.modules[name]
+            module = self._import(file_path, self._module_name(file_path))
+            self._modules[file_path] = (digest, module)
+            return module
+
+    def load_function(self, file_path: str, func_name: str) -> Optional[Callable]:
+        return getattr(self.load_module(file_path), func_name, None)
+
+    def invalidate(self, file_path: Optional[str] = None):
+        """Forget one module (or all of them) so the next load re-imports it."""
+        with self._lock:
+            if file_path is None:
+                self._modules.clear()
+            else:
+                self._modules.pop(os.path.abspath(file_path), None)
+
+
+_function_indexes: Dict[str, FunctionIndex] = {}
+_indexes_lock = threading.Lock()
+_module_cache = ModuleCache()
+
+
+def get_function_index(folder_path: str) -> FunctionIndex:
+    """Return the long-lived FunctionIndex for a folder."""
+    folder_path = os.path.abspath(folder_path)
+    with _indexes_lock:
+        if folder_path not in _function_indexes:
+            _function_indexes[folder_path] = FunctionIndex(folder_path)
+        return _function_indexes[folder_path]
+
+
+def get_module_cache() -> ModuleCache:
+    """Return this process's ModuleCache (each pool worker has its own)."""
+    return _module_cache
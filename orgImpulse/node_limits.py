@@ -0,0 +1,154 @@
+"""
+Node Limits
+===========
+Memory admission for the scheduler and resource caps inside worker processes.
+
+A node's memory budget is declared in its resource hints,
+
+    node["data"]["resources"] = {"memory": "4GiB", "cpu_seconds": 600}
+
+or, when not declared, learned from the run history: the largest memory
+growth seen in its recent executions times NCPIPE_MEMORY_MARGIN (default
+1.25). The scheduler only starts a node when its budget fits both its
+memory ledger (memory available when no node was running, less
+NCPIPE_MEMORY_HEADROOM, shared by the budgets of the running nodes of all
+runs) and the memory available right now, so heavy blocks queue instead of
+pushing the machine into swap. A node alone is always admitted.
+
+Declared limits are also enforced in process workers while the node runs:
+its address space may grow by at most memory × NCPIPE_MEMORY_LIMIT_FACTOR
+(default 2, as virtual size runs ahead of resident memory; 0 disables the
+cap) and it may use cpu_seconds of CPU time. Exceeding either fails the node
+with ResourceLimitExceeded instead of taking the worker or the machine down.
+Thread-pool nodes share the server process and are admitted but not capped.
+A worker killed by the operating system anyway fails its node with a clear
+error, and the scheduler replaces the pool for the nodes that follow.
+"""
+
+import math
+import os
+import re
+import signal
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional, Union
+
+import psutil
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_UNITS = {"": 1, "b": 1, "k": 1000, "kb": 1000, "kib": 1024, "m": 1000**2, "mb": 1000**2, "mib": 1024**2,
+          "g": 1000**3, "gb": 1000**3, "gib": 1024**3, "t": 1000**4, "tb": 1000**4, "tib": 1024**4}
+
+
+def parse_bytes(value: Union[int, float, str, None]) -> Optional[int]:
+    """Byte count of 1073741824, "1GiB", "512 MB" or "2g"; None stays None."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r"\s*([\d.]+)\s*([a-zA-Z]*)\s*", str(value))
+    if not match or match.group(2).lower() not in _UNITS:
+        raise ValueError(f"Invalid memory size '{value}'")
+    return int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+
+
+def format_bytes(nbytes: int) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(nbytes) < 1024 or unit == "GiB":
+            return f"{nbytes:.0f} {unit}" if unit == "B" else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+
+
+MEMORY_HEADROOM = parse_bytes(os.environ.get("NCPIPE_MEMORY_HEADROOM", "512MiB"))
+MEMORY_MARGIN = float(os.environ.get("NCPIPE_MEMORY_MARGIN", 1.25))
+MEMORY_LIMIT_FACTOR = float(os.environ.get("NCPIPE_MEMORY_LIMIT_FACTOR", 2.0))
+
+
+class ResourceLimitExceeded(Exception):
+    """Raised in a worker when a node goes over its declared memory or CPU time."""
+
+
+@dataclass(frozen=True)
+class NodeLimits:
+    """Declared caps shipped with a worker call."""
+    memory: Optional[int] = None  # bytes of memory growth
+    cpu_seconds: Optional[float] = None
+
+    def __bool__(self) -> bool:
+        return self.memory is not None or self.cpu_seconds is not None
+
+
+def _raise_cpu_limit(signum, frame):
+    raise ResourceLimitExceeded("Node exceeded its CPU time limit")
+
+
+@contextmanager
+def enforced_limits(limits: Optional[NodeLimits]) -> Iterator[None]:
+    """Apply a node's caps to this worker process for the duration of the block.
+
+    No-op without limits, on platforms without rlimits and outside the main
+    thread (where neither the caps nor the SIGXCPU handler would be the node's own).
+    """
+    if not limits or resource is None or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    restore = []
+    try:
+        if limits.memory is not None and MEMORY_LIMIT_FACTOR > 0 and hasattr(resource, "RLIMIT_AS"):
+            cap = psutil.Process().memory_info().vms + int(limits.memory * MEMORY_LIMIT_FACTOR)
+            soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+            if hard != resource.RLIM_INFINITY:
+                cap = min(cap, hard)
+            try:
+                resource.setrlimit(resource.RLIMIT_AS, (cap, hard))
+                restore.append(lambda: resource.setrlimit(resource.RLIMIT_AS, (soft, hard)))
+            except (ValueError, OSError) as e:
+                print(f"Cannot cap node memory on this platform: {e}")
+        if limits.cpu_seconds is not None and hasattr(signal, "SIGXCPU"):
+            used = resource.getrusage(resource.RUSAGE_SELF)
+            cap = math.ceil(used.ru_utime + used.ru_stime + limits.cpu_seconds)
+            soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            if hard != resource.RLIM_INFINITY:
+                cap = min(cap, hard)
+            previous_handler = signal.signal(signal.SIGXCPU, _raise_cpu_limit)
+            restore.append(lambda: signal.signal(signal.SIGXCPU, previous_handler))
+            resource.setrlimit(resource.RLIMIT_CPU, (cap, hard))
+            restore.append(lambda: resource.setrlimit(resource.RLIMIT_CPU, (soft, hard)))
+        yield
+    except MemoryError as e:
+        if limits.memory is None:
+            raise
+        raise ResourceLimitExceeded(f"Node exceeded its memory limit of {format_bytes(limits.memory)}") from e
+    finally:
+        for undo in reversed(restore):
+            undo()
+
+
+class MemoryAdmission:
+    """Memory ledger of a scheduler: admits a budget when it fits the ledger and the memory available now.
+
+    The ledger's capacity is taken again whenever nothing is reserved, so it
+    follows memory used or freed by other programs between bursts of work.
+    """
+
+    def __init__(self, headroom: int = MEMORY_HEADROOM):
+        self.headroom = headroom
+        self.capacity = max(0, self.available_now())
+        self.reserved = 0
+
+    def available_now(self) -> int:
+        return psutil.virtual_memory().available - self.headroom
+
+    def fits(self, budget: int, held_elsewhere: int = 0) -> bool:
+        """Whether a node needing budget bytes can start while held_elsewhere is promised to another."""
+        needed = budget + held_elsewhere
+        available = self.available_now()
+        if self.reserved <= 0:
+            self.capacity = max(0, available)
+        return self.reserved + needed <= self.capacity and needed <= available
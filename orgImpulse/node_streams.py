@@ -0,0 +1,166 @@
+"""
+Node Streams
+============
+Pipelined execution between generator blocks and the blocks they feed.
+
+When a node's function is a generator and an edge binds its output to a
+parameter of another node, the edge becomes a stream: the downstream node
+starts as soon as the upstream one does and receives an iterator over the
+items as they are produced, instead of the finished result.
+
+Each stream edge is a StreamChannel: a bounded queue (NCPIPE_STREAM_QUEUE
+items, default 8) living in a multiprocessing manager, so both ends can run
+in any worker process or thread. A full queue blocks the producer
+(backpressure); large array and bytes items travel through shared memory
+(see result_transport.py) and are freed once the consumer moves on to the
+next item. The end of the stream and producer errors are forwarded to the
+consumer, where an upstream error raises StreamError. A consumer that stops
+reading early, or a cancelled run, sets the channel's stop flag so the
+producer does not block forever.
+
+Both ends of a stream run in a worker of their own, outside the CPU slot
+accounting, so they can never wait on each other for a pool worker. They are
+not cached or retried, and neither is anything downstream of them. A
+generator without a streaming consumer runs like any other node and returns
+the list of its items.
+"""
+
+import os
+import queue
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, List
+
+from result_transport import SharedBuffer, export_value, import_value, release
+
+STREAM_QUEUE_SIZE = int(os.environ.get("NCPIPE_STREAM_QUEUE", 8))
+# How often blocked queue operations look at the stop flag
+POLL_SECONDS = 0.2
+
+
+class StreamError(RuntimeError):
+    """Raised in a consumer when its stream fails or is stopped."""
+
+
+class StreamStopped(Exception):
+    """Raised in a producer when every consumer of it has stopped reading."""
+
+
+@dataclass(frozen=True)
+class StreamChannel:
+    """Picklable handle to one stream edge (manager proxies)."""
+    source: str
+    target: str
+    items: Any  # Queue of ("item", value) / ("end", None) / ("error", message)
+    stopped: Any  # Event set by the consumer or the scheduler
+    handles: Any  # List of every SharedBuffer sent, released when the run ends
+
+    @classmethod
+    def create(cls, manager, source: str, target: str, maxsize: int = STREAM_QUEUE_SIZE) -> 'StreamChannel':
+        return cls(source, target, manager.Queue(maxsize), manager.Event(), manager.list())
+
+    def _put(self, message):
+        while True:
+            if self.stopped.is_set():
+                raise StreamStopped(self.target)
+            try:
+                self.items.put(message, timeout=POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def send(self, item: Any):
+        item = export_value(item)
+        if isinstance(item, SharedBuffer):
+            self.handles.append(item)
+        try:
+            self._put(("item", item))
+        except StreamStopped:
+            if isinstance(item, SharedBuffer):
+                release([item])
+            raise
+
+    def close(self):
+        try:
+            self._put(("end", None))
+        except StreamStopped:
+            pass
+
+    def fail(self, message: str):
+        try:
+            self._put(("error", message))
+        except StreamStopped:
+            pass
+
+    def stop(self):
+        self.stopped.set()
+
+    def read(self) -> Iterator[Any]:
+        """Items in order; raises StreamError if the producer failed or the stream was stopped."""
+        previous = None
+        while True:
+            try:
+                kind, payload = self.items.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                if self.stopped.is_set():
+                    raise StreamError(f"Stream from node '{self.source}' was stopped")
+                continue
+            if previous is not None:
+                release([previous])
+                previous = None
+            if kind == "end":
+                return
+            if kind == "error":
+                raise StreamError(f"Upstream node '{self.source}' failed: {payload}")
+            if isinstance(payload, SharedBuffer):
+                previous = payload
+            yield import_value(payload)
+
+    def cleanup(self):
+        """Stop both ends and free any item nobody consumed (called by the scheduler)."""
+        self.stopped.set()
+        release(list(self.handles))
+
+
+def open_args(args: List[Any]) -> List[Any]:
+    """Worker-side arguments: streams become iterators, shared buffers views."""
+    return [arg.read() if isinstance(arg, StreamChannel) else import_value(arg) for arg in args]
+
+
+def stop_all(args: List[Any]):
+    """Tell producers feeding these arguments that nothing more will be read."""
+    for arg in args:
+        if isinstance(arg, StreamChannel):
+            arg.stop()
+
+
+def pump(func: Callable, args: List[Any], channels: List[StreamChannel]) -> Any:
+    """Run a generator function, sending every item to each channel.
+
+    Without channels the items are collected into a list instead. Returns
+    {"items": count} when streaming.
+    """
+    generator = func(*args)
+    if not channels:
+        return [export_value(item) for item in generator]
+
+    open_channels = list(channels)
+    count = 0
+    try:
+        for item in generator:
+            for channel in list(open_channels):
+                try:
+                    channel.send(item)
+                except StreamStopped:
+                    open_channels.remove(channel)
+            if not open_channels:
+                break
+            count += 1
+    except BaseException as e:
+        for channel in open_channels:
+            channel.fail(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        generator.close()
+    for channel in open_channels:
+        channel.close()
+    return {"items": count}
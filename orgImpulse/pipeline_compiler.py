@@ -0,0 +1,342 @@
+"""
+Pipeline Compiler
+=================
+Turns a canvas graph into a standalone Python runner that can be checked in
+next to the pipeline blocks and run without ncpipe:
+
+    python my_pipeline.py [--workers N] [--no-cache] [--folder DIR] [--timings timings.json]
+
+The graph is resolved exactly as for /execute-graph (functions, inputs and
+edge bindings). FunctionAnalyzer metadata adds the ordering the canvas does
+not show: when one block writes a folder another block of the graph reads,
+the reader waits for the writer, so running branches in parallel never reads
+half-written results.
+
+The generated runner only uses the standard library. It starts every node as
+soon as its upstream nodes are done (process pool, or threads for nodes with
+the "thread" executor hint), maps map nodes item by item, skips nodes whose
+function source, inputs and upstream results are unchanged since the last
+run (pickled in .ncpipe-cache next to the script), and prints per-node
+timings. Generator blocks are collected into lists instead of streamed.
+"""
+
+import os
+import pprint
+from typing import Any, Dict, List, Optional, Set
+
+from graph_scheduler import ExecutionGraph, GraphExecutionError, UpstreamResult
+
+
+def _encode_arg(task, index: int, arg: Any) -> Dict[str, Any]:
+    if isinstance(arg, UpstreamResult):
+        return {"upstream": arg.node_id}
+    if task.map_spec is not None and index == task.map_index and task.map_spec.has_source:
+        return {"value": None}  # Filled with each item
+    return {"value": arg}
+
+
+def folder_dependencies(graph: ExecutionGraph, analyzers: Dict[str, Any]) -> Dict[str, Set[str]]:
+    """Extra upstream nodes per node, from folders written by one block and read by another.
+
+    Dependencies that would close a cycle with the canvas edges are left out.
+    """
+    upstream = {node_id: set(task.upstream) for node_id, task in graph.tasks.items()}
+
+    def reaches(start: str, goal: str) -> bool:
+        pending, seen = [start], set()
+        while pending:
+            node_id = pending.pop()
+            if node_id == goal:
+                return True
+            if node_id not in seen:
+                seen.add(node_id)
+                pending.extend(child for child, parents in upstream.items() if node_id in parents)
+        return False
+
+    extra: Dict[str, Set[str]] = {node_id: set() for node_id in graph.tasks}
+    for node_id in graph.order:
+        task = graph.tasks[node_id]
+        analyzer = analyzers.get(task.folder_path)
+        if analyzer is None:
+            continue
+        producers = analyzer.get_pipeline_graph().upstream.get(task.func_name, [])
+        for other_id, other in graph.tasks.items():
+            if other_id == node_id or other.func_name not in producers or other_id in upstream[node_id]:
+                continue
+            if other.folder_path != task.folder_path or reaches(node_id, other_id):
+                continue
+            upstream[node_id].add(other_id)
+            extra[node_id].add(other_id)
+    return extra
+
+
+def compile_pipeline(graph: ExecutionGraph, analyzers: Optional[Dict[str, Any]] = None,
+                     name: str = "pipeline.py") -> str:
+    """Source of a standalone runner for a graph whose functions are resolved.
+
+    The same graph always gives the same source, so a checked-in runner only changes with the graph.
+    """
+    extra = folder_dependencies(graph, analyzers or {})
+    folders: List[str] = []
+    nodes = {}
+    for node_id in graph.order:
+        task = graph.tasks[node_id]
+        if task.function_file is None:
+            raise GraphExecutionError("Resolve the graph's functions before compiling it", node_id=node_id)
+        folder = os.path.dirname(os.path.abspath(task.function_file))
+        if folder not in folders:
+            folders.append(folder)
+        spec = task.map_spec
+        nodes[node_id] = {
+            "function": task.func_name,
+            "file": os.path.basename(task.function_file),
+            "folder": folders.index(folder),
+            "args": [_encode_arg(task, index, arg) for index, arg in enumerate(task.args)],
+            "upstream": sorted(task.upstream),
+            "after": sorted(extra[node_id]),  # Ordering only: reads a folder these nodes write
+            "executor": task.executor,
+            "cache": task.result_cacheable,
+            "map": None if spec is None else {
+                "index": task.map_index, "items": spec.items, "glob": spec.glob, "directory": spec.directory,
+            },
+        }
+
+    source = RUNNER_TEMPLATE
+    for placeholder, value in (
+        ("__NAME__", name),
+        ("__FOLDERS__", pprint.pformat(folders, width=100)),
+        ("__NODES__", pprint.pformat(nodes, width=100, sort_dicts=False)),
+    ):
+        source = source.replace(placeholder, value)
+    return source
+
+
+RUNNER_TEMPLATE = '''#!/usr/bin/env python
+"""
+__NAME__ - pipeline runner generated by ncpipe.
+Re-export it from the editor instead of editing NODES by hand.
+
+Independent branches run in parallel, nodes whose function source, inputs
+and upstream results did not change since the last run are skipped (results
+are kept in .ncpipe-cache next to this file), and per-node timings are
+printed at the end.
+
+    python __NAME__ [--workers N] [--no-cache] [--folder DIR] [--timings timings.json]
+"""
+
+import argparse
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Folders the blocks were loaded from when the runner was generated
+FOLDERS = __FOLDERS__
+
+NODES = __NODES__
+
+_modules = {}
+
+
+def block_file(node, folder=None):
+    """The block's file: next to --folder or this script if present there, else where it was compiled from."""
+    for candidate in (folder, HERE):
+        if candidate and os.path.isfile(os.path.join(candidate, node["file"])):
+            return os.path.join(candidate, node["file"])
+    return os.path.join(FOLDERS[node["folder"]], node["file"])
+
+
+def load_function(path, name):
+    if path not in _modules:
+        module_name = "ncpipe_block_" + hashlib.sha1(path.encode()).hexdigest()[:8]
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        sys.path.insert(0, os.path.dirname(path))
+        spec.loader.exec_module(module)
+        _modules[path] = module
+    return getattr(_modules[path], name)
+
+
+def call_block(path, name, args):
+    started = time.perf_counter()
+    result = load_function(path, name)(*args)
+    if hasattr(result, "__next__"):
+        result = list(result)  # Generator blocks
+    return result, time.perf_counter() - started
+
+
+_sources = {}
+
+
+def cache_key(node, path, args, upstream_keys):
+    if path not in _sources:
+        with open(path, "rb") as file:
+            _sources[path] = hashlib.sha1(file.read()).hexdigest()
+    payload = json.dumps({"source": _sources[path], "function": node["function"], "args": args,
+                          "upstream": upstream_keys}, sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class Cache:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pkl")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as file:
+                return True, pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False, None
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with open(path + ".tmp", "wb") as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + ".tmp", path)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            print(f"  (not cached: {e})", file=sys.stderr)
+
+
+def map_items(node, value, folder):
+    spec = node["map"]
+    if spec["items"] is not None:
+        return list(spec["items"])
+    if spec["glob"] is not None:
+        return sorted(glob.glob(os.path.join(folder, spec["glob"]), recursive=True))
+    if spec["directory"] is not None:
+        directory = os.path.join(folder, spec["directory"])
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if not name.startswith(".")]
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = [part.strip() for part in value.split(",") if part.strip()]
+    return list(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="Run every node")
+    parser.add_argument("--cache-dir", default=os.path.join(HERE, ".ncpipe-cache"))
+    parser.add_argument("--folder", help="Folder holding the block files (default: next to this script)")
+    parser.add_argument("--timings", help="Write per-node timings to this JSON file")
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else Cache(args.cache_dir)
+    pools = {"process": ProcessPoolExecutor(max_workers=args.workers),
+             "thread": ThreadPoolExecutor(max_workers=(args.workers or os.cpu_count() or 1) + 4)}
+    parents = {node_id: set(node["upstream"]) | set(node["after"]) for node_id, node in NODES.items()}
+    results, keys, timings = {}, {}, {}
+    running = {}  # future -> (node_id, (item position, item cache key) or None)
+    partial = {}  # map node id -> [outputs, items left, seconds, cached items]
+    started_at = time.time()
+
+    def finish(node_id, value, status, seconds):
+        results[node_id] = value
+        timings[node_id]["status"] = status
+        timings[node_id]["wall_time"] = seconds
+        print(f"{node_id:>6}  {NODES[node_id]['function']:<40} {status:<9} {seconds:8.3f} s", flush=True)
+
+    def start(node_id):
+        node = NODES[node_id]
+        path = block_file(node, args.folder)
+        call_args = [results[arg["upstream"]] if "upstream" in arg else arg["value"] for arg in node["args"]]
+        timings[node_id] = {"function": node["function"], "started_at": time.time() - started_at}
+        upstream_keys = [keys.get(parent) for parent in sorted(parents[node_id])]
+        key = None
+        if cache is not None and node["cache"] and None not in upstream_keys:
+            key_args = [None if "upstream" in arg else arg["value"] for arg in node["args"]]
+            key = cache_key(node, path, key_args, upstream_keys)
+        keys[node_id] = key
+        pool = pools[node["executor"]]
+
+        if node["map"] is None:
+            hit, value = cache.get(key) if key else (False, None)
+            if hit:
+                finish(node_id, value, "cached", 0.0)
+                return
+            running[pool.submit(call_block, path, node["function"], call_args)] = (node_id, None)
+            return
+
+        index = node["map"]["index"]
+        items = map_items(node, call_args[index], os.path.dirname(path))
+        partial[node_id] = [[None] * len(items), len(items), 0.0, 0]
+        keys[node_id] = None if key is None else hashlib.sha256(
+            (key + json.dumps(items, sort_keys=True, default=repr)).encode()).hexdigest()
+        for position, item in enumerate(items):
+            item_key = None if key is None else cache_key(node, path, [key, item], [])
+            hit, value = cache.get(item_key) if item_key else (False, None)
+            if hit:
+                partial[node_id][3] += 1
+                item_done(node_id, position, value, 0.0)
+                continue
+            item_args = list(call_args)
+            item_args[index] = item
+            running[pool.submit(call_block, path, node["function"], item_args)] = (node_id, (position, item_key))
+        if not items:
+            finish(node_id, [], "ran", 0.0)
+
+    def item_done(node_id, position, value, seconds):
+        outputs = partial[node_id]
+        outputs[0][position] = value
+        outputs[1] -= 1
+        outputs[2] += seconds
+        if outputs[1] == 0:
+            finish(node_id, outputs[0], "cached" if outputs[3] == len(outputs[0]) else "ran", outputs[2])
+
+    waiting = set(NODES)
+    print(f"{'node':>6}  {'function':<40} {'status':<9} {'time':>10}")
+    try:
+        while waiting or running:
+            for node_id in [node_id for node_id in waiting if parents[node_id] <= set(results)]:
+                waiting.discard(node_id)
+                start(node_id)
+            if not running:
+                if waiting and not [node_id for node_id in waiting if parents[node_id] <= set(results)]:
+                    raise RuntimeError(f"Nodes {sorted(waiting)} can never start")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node_id, shard = running.pop(future)
+                try:
+                    value, seconds = future.result()
+                except Exception as e:
+                    print(f"Node {node_id} ({NODES[node_id]['function']}) failed: {e}", file=sys.stderr)
+                    raise SystemExit(1)
+                if shard is None:
+                    if keys[node_id]:
+                        cache.put(keys[node_id], value)
+                    finish(node_id, value, "ran", seconds)
+                else:
+                    position, item_key = shard
+                    if item_key:
+                        cache.put(item_key, value)
+                    item_done(node_id, position, value, seconds)
+    finally:
+        for pool in pools.values():
+            pool.shutdown(cancel_futures=True)
+
+    total = time.time() - started_at
+    print(f"total wall time: {total:.3f} s")
+    if args.timings:
+        with open(args.timings, "w") as file:
+            json.dump({"wall_time": total, "nodes": timings}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
+'''
@@ -18,6 +18,7 @@ import './App.css'; // Import a CSS file for styling
 import { FaFileAlt, FaFolder, FaSave } from 'react-icons/fa'; // Import an icon
 import { saveAs } from 'file-saver'; // Import file-saver to save files
 import { ResizableBox } from 'react-resizable'; // Import ResizableBox from 'react-resizable'
+import { GraphSyncClient } from './graphSync'; // Patch-based graph sync with the server
 
 // Define the custom node component
 const CustomNode = ({ id, data, selected, type }) => {
@@ -52,6 +53,7 @@ const CustomNode = ({ id, data, selected, type }) => {
     };
     setInputs(updatedInputs);
     data.inputs = updatedInputs;
+    if (data.onInputsChange) data.onInputsChange();
   };
 
   const toggleExpand = () => {
@@ -384,7 +386,7 @@ const CustomNode = ({ id, data, selected, type }) => {
 };
 
 // TopToolbar component with run script and resource monitoring
-const TopToolbar = ({ isRunning, onRunScript, resourceData, scriptName, setScriptName, savePythonScript }) => {
+const TopToolbar = ({ isRunning, onRunScript, onCancelRun, resourceData, scriptName, setScriptName, savePythonScript }) => {
   const [isEditingScript, setIsEditingScript] = useState(false);
 
   const handleScriptNameClick = () => {
@@ -431,6 +433,11 @@ const TopToolbar = ({ isRunning, onRunScript, resourceData, scriptName, setScrip
             <span className="run-icon">▶</span>
             {isRunning ? 'Running...' : 'Run Analysis'}
           </button>
+          {isRunning && (
+            <button onClick={onCancelRun} className="save-button" style={{ marginLeft: '8px' }}>
+              Cancel
+            </button>
+          )}
         </div>
         <div className="resource-monitors">
           <div className="resource-monitor">
@@ -478,14 +485,13 @@ const FloatingDashboard = ({
   handleFolderSelect, 
   folderInputRef, 
   loading, 
-  setLoading,
   scriptName, 
   setScriptName, 
   createScriptFile, 
   fileList, 
-  setFileList,
+  loadFolder,
+  localEntries,
   onDragStart,
-  getFunctionsAndVariables,
   filteredFunctions,
   filterType,
   clearFilter
@@ -596,52 +602,22 @@ const FloatingDashboard = ({
           ref={folderInputRef}
           onChange={async (e) => {
             if (e.target.files.length > 0) {
-              setLoading(true);
-              const folderName = e.target.files[0].webkitRelativePath.split('/')[0];
+              const files = Array.from(e.target.files);
+              const folderName = files[0].webkitRelativePath.split('/')[0];
               setFolderPath(folderName);
 
-              try {
-                const functionsList = [];
-                const filePromises = Array.from(e.target.files)
+              // Used when the server cannot read the folder
+              const readLocal = () => Promise.all(
+                files
                   .filter(file => file.name.endsWith('.py'))
                   .filter(file => {
                     // Exclude files in subfolders
                     const relativePathParts = file.webkitRelativePath.split('/');
                     return relativePathParts.length === 2; // ['folderName', 'fileName.py']
                   })
-                  .map(file => new Promise((resolve) => {
-                    const reader = new FileReader();
-                    reader.onload = () => {
-                      const functions = getFunctionsAndVariables(reader.result);
-                      const functionNames = Object.keys(functions);
-                      // Only add the first function from each file
-                      if (functionNames.length > 0) {
-                        const firstFunctionName = functionNames[0];
-                        functionsList.push({
-                          filename: file.name,
-                          functionName: firstFunctionName,
-                          parameters: functions[firstFunctionName],
-                          input_folders: [],
-                          output_folders: [],
-                          input_count: 0,
-                          output_count: 0,
-                          block_type: 'unknown',
-                          pipeline_position: 0
-                        });
-                      }
-                      resolve();
-                    };
-                    reader.readAsText(file);
-                  }));
-
-                await Promise.all(filePromises);
-                functionsList.sort((a, b) => a.filename.localeCompare(b.filename));
-                setFileList(functionsList);
-              } catch (error) {
-                console.error("Failed to list files:", error);
-              } finally {
-                setLoading(false);
-              }
+                  .map(async (file) => localEntries(file.name, await file.text()))
+              ).then((entries) => entries.flat());
+              await loadFolder(folderName, readLocal);
             }
           }}
         />
@@ -800,10 +776,19 @@ const App = () => {
   // New state for run script and resource monitoring
   const [isRunning, setIsRunning] = useState(false);
   const [resourceData, setResourceData] = useState({ ram: 0, cpu: 0, gpu: 0 });
+  const [nodeProgress, setNodeProgress] = useState({}); // node id -> status of the current run
 
   const flowRef = useRef(null); // Ref for the flow container
   const wsRef = useRef(null); // Ref for the WebSocket
+  const runIdRef = useRef(null); // Id of the run started from this window
+  const pendingRunEventsRef = useRef(null); // Run events received while POST /runs has not answered yet
+  const clientIdRef = useRef(null); // Server-assigned id of this window's WebSocket connection
+  const watchedFolderRef = useRef(null); // Absolute path of the folder the server watches for this window
+  const relistFolderRef = useRef(null); // Lists the shown folder again (to watch it for a new connection)
+  const syncRef = useRef(null); // Sends graph changes to the server as patches
   const folderInputRef = useRef(null); // Add a ref for the folder input
+  const scriptGraphRef = useRef(null); // Graph (without positions) last compiled into the script file
+  const scriptContentRef = useRef(null); // Content last written to the script file
 
   // Function to generate Python script from nodes and edges
   const generatePythonScript = (nodes, edges) => {
@@ -840,9 +825,29 @@ const App = () => {
     return script;
   };
   
+  // Compile the graph into a standalone runner on the server (parallel branches, caching, timings)
+  const compileGraph = async (nodes, edges) => {
+    const response = await axios.post("http://localhost:8000/compile-graph", {
+      nodes,
+      edges,
+      name: scriptName,
+    });
+    return response.data.script;
+  };
+
+  // For exports: falls back to the plain sequential script when the graph cannot be compiled
+  const compilePythonScript = async (nodes, edges) => {
+    try {
+      return await compileGraph(nodes, edges);
+    } catch (error) {
+      console.error("Graph compilation failed, using the sequential script:", error);
+      return generatePythonScript(nodes, edges);
+    }
+  };
+
   // Function to save the generated Python script
-  const savePythonScript = () => {
-    const script = generatePythonScript(nodes, edges);
+  const savePythonScript = async () => {
+    const script = await compilePythonScript(nodes, edges);
     const blob = new Blob([script], { type: 'text/plain;charset=utf-8' });
     saveAs(blob, scriptName);
   };
@@ -886,37 +891,74 @@ const App = () => {
         variables: parameters,
         metadata: metadata,
         onHandleClick: handleNodeHandleClick,
-        onResizeStateChange: handleNodeResizeStateChange
+        onResizeStateChange: handleNodeResizeStateChange,
+        // Parameter edits mutate data.inputs in place, so they ask for a sync explicitly
+        onInputsChange: () => syncRef.current && syncRef.current.schedule(),
       },
       position: position || { x: Math.random() * 400, y: Math.random() * 400 },
     };
     const updatedNodes = [...nodes, newNode];
     setNodes(updatedNodes);
+  }, [nodes, folderPath, handleNodeHandleClick, handleNodeResizeStateChange]);
+
+  // Apply a progress message of the run started from this window
+  const applyRunEvent = useCallback((data) => {
+    if (data.type === "node_started") {
+      setNodeProgress((prev) => ({ ...prev, [data.node_id]: "running" }));
+    } else if (data.type === "node_progress") {
+      setNodeProgress((prev) => ({ ...prev, [data.node_id]: `running ${data.done}/${data.total}` }));
+    } else if (data.type === "node_finished") {
+      setNodeProgress((prev) => ({ ...prev, [data.node_id]: data.cached ? "cached" : "completed" }));
+    } else if (data.type === "node_failed") {
+      setNodeProgress((prev) => ({ ...prev, [data.node_id]: `failed: ${data.error}` }));
+    } else if (data.type === "run_finished") {
+      setResults(data.results);
+      setIsRunning(false);
+    } else if (data.type === "run_failed" || data.type === "run_cancelled") {
+      console.error(`Run ${data.run_id} ${data.type === "run_failed" ? "failed" : "cancelled"}`, data.error || "");
+      setIsRunning(false);
+    }
+  }, []);
 
-    // Send updated nodes and edges to the server
-    if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
-      wsRef.current.send(
-        JSON.stringify({
-          type: 'graph_update',
-          data: {
-            nodes: updatedNodes,
-            edges: edges,
-          },
-        })
-      );
+  // Apply GET /runs/<run_id>; messages already received take precedence for the nodes they cover
+  const applyRunStatus = useCallback((run) => {
+    const statuses = Object.fromEntries(
+      Object.entries(run.nodes || {}).filter(([, status]) => status !== "pending")
+    );
+    setNodeProgress((prev) => ({ ...statuses, ...prev }));
+    if (run.status === "completed") {
+      setResults(run.results);
+      setIsRunning(false);
+    } else if (["failed", "cancelled", "interrupted"].includes(run.status)) {
+      console.error(`Run ${run.run_id} ${run.status}`, run.error || "");
+      setIsRunning(false);
     }
-  }, [nodes, edges, folderPath, handleNodeHandleClick, handleNodeResizeStateChange]);
+  }, []);
 
-  // Execute graph logic by sending nodes/edges to the backend
+  // Submit the graph as a run; progress and results arrive over the WebSocket
   const executeGraph = async () => {
+    // The run starts before the reply arrives, so its first messages are kept until the id is known
+    runIdRef.current = null;
+    pendingRunEventsRef.current = [];
+    let runId;
     try {
-      const response = await axios.post("http://localhost:8000/execute-graph", {
+      const response = await axios.post("http://localhost:8000/runs", {
         nodes,
         edges,
+        client_id: clientIdRef.current, // Subscribes this window to the run's progress
       });
-      setResults(response.data.results);
+      runId = response.data.run_id;
+      runIdRef.current = runId;
+      pendingRunEventsRef.current.filter((data) => data.run_id === runId).forEach(applyRunEvent);
+    } finally {
+      pendingRunEventsRef.current = null;
+    }
+    // A run that ended before the WebSocket delivered anything is still shown
+    try {
+      const status = await axios.get(`http://localhost:8000/runs/${runId}`);
+      applyRunStatus(status.data);
     } catch (error) {
-      console.error("Execution failed:", error);
+      console.error("Could not fetch the run status:", error);
     }
   };
 
@@ -925,16 +967,26 @@ const App = () => {
     if (isRunning) return;
     
     setIsRunning(true);
+    setNodeProgress({});
     try {
       // Execute the graph
       await executeGraph();
     } catch (error) {
       console.error("Script execution failed:", error);
-    } finally {
       setIsRunning(false);
     }
   };
 
+  // Cancel the current run (pending and running nodes)
+  const handleCancelRun = async () => {
+    if (!runIdRef.current) return;
+    try {
+      await axios.delete(`http://localhost:8000/runs/${runIdRef.current}`);
+    } catch (error) {
+      console.error("Cancel failed:", error);
+    }
+  };
+
   // Function to fetch real resource data from backend
   const updateResourceData = useCallback(async () => {
     try {
@@ -962,39 +1014,68 @@ const App = () => {
     return () => clearInterval(interval);
   }, [updateResourceData]);
 
-  // Modify onConnect to send nodes and edges to the server
+  // New connections reach the server through the graph sync effect
   const onConnectWithSend = useCallback(
     (params) => {
-      setEdges((eds) => {
-        const updatedEdges = addEdge(params, eds);
-        if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
-          wsRef.current.send(
-            JSON.stringify({
-              type: "graph_update",
-              data: {
-                nodes: nodes,         // Include current nodes
-                edges: updatedEdges,  // Include updated edges
-              },
-            })
-          );
-        }
-        return updatedEdges;
-      });
+      setEdges((eds) => addEdge(params, eds));
     },
-    [nodes] // Include 'nodes' in dependencies
+    [setEdges]
   );
 
   useEffect(() => {
     wsRef.current = new WebSocket("ws://localhost:8000/realtime-updates");
+    const sendMessage = (message) => {
+      if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+        wsRef.current.send(JSON.stringify(message));
+      }
+    };
+    // Keep the session across reconnects so the server can tell whether it is still in sync
+    syncRef.current = syncRef.current || new GraphSyncClient(sendMessage);
+    syncRef.current.send = sendMessage;
 
     wsRef.current.onopen = () => {
       console.log("WebSocket connection established");
+      // Only receive progress of runs started from this window
+      sendMessage({ type: "subscribe", runs: runIdRef.current ? [runIdRef.current] : [] });
+      syncRef.current.hello();
+      syncRef.current.schedule();
     };
 
     wsRef.current.onmessage = (event) => {
       const data = JSON.parse(event.data);
-      console.log("Real-time update received:", data);
       // Handle real-time updates here
+      if (syncRef.current.handleMessage(data)) {
+        return;
+      }
+      console.log("Real-time update received:", data);
+      if (data.type === "connected") {
+        clientIdRef.current = data.client_id;
+        // A folder listed before this connection existed is not watched for it yet
+        if (relistFolderRef.current) {
+          relistFolderRef.current();
+        }
+      } else if (data.type === "functions_delta") {
+        if (data.folder_path !== watchedFolderRef.current) {
+          return; // A folder this window no longer shows
+        }
+        // Apply function add/modify/remove deltas pushed by the folder watcher
+        setFileList((prev) => {
+          const removed = new Set([
+            ...data.removed,
+            ...data.modified.map((entry) => entry.functionName),
+          ]);
+          const updated = prev
+            .filter((entry) => !removed.has(entry.functionName))
+            .concat(data.added, data.modified);
+          return updated.sort((a, b) => (a.pipeline_position || 0) - (b.pipeline_position || 0));
+        });
+      } else if (data.run_id && data.run_id === runIdRef.current) {
+        // Progress of the run started from this window
+        applyRunEvent(data);
+      } else if (data.run_id && pendingRunEventsRef.current) {
+        // Possibly the run being submitted, whose id is not known yet
+        pendingRunEventsRef.current.push(data);
+      }
     };
 
     wsRef.current.onerror = (error) => {
@@ -1004,7 +1085,7 @@ const App = () => {
     return () => {
       wsRef.current.close();
     };
-  }, []);
+  }, [applyRunEvent]);
 
   // Use the default onNodesChange without sending updates
   const onNodesChangeWithoutSend = useCallback(
@@ -1021,98 +1102,103 @@ const App = () => {
     [setNodes, resizingNodeId]
   );
 
-  // Modify onEdgesChange to send nodes and edges to the server
+  // Edge changes reach the server through the graph sync effect below
   const onEdgesChangeWithSend = useCallback(
     (changes) => {
-      const relevantChanges = changes.filter(
-        (change) => change.type === 'add' || change.type === 'remove'
-      );
-
-      setEdges((eds) => {
-        const updatedEdges = applyEdgeChanges(changes, eds);
-
-        if (relevantChanges.length > 0 && wsRef.current.readyState === WebSocket.OPEN) {
-          wsRef.current.send(
-            JSON.stringify({
-              type: 'graph_update',
-              data: {
-                nodes: nodes,        // Include current nodes
-                edges: updatedEdges, // Include updated edges
-              },
-            })
-          );
-        }
-
-        return updatedEdges;
-      });
+      setEdges((eds) => applyEdgeChanges(changes, eds));
     },
-    [nodes, edges]
+    [setEdges]
   );
 
-  // Add 'readFolderContents' function
-  const readFolderContents = async () => {
-    if (folderHandle) {
+  // Sync every graph change as a patch (bursts such as drags are coalesced)
+  useEffect(() => {
+    if (syncRef.current) {
+      syncRef.current.update(nodes, edges);
+    }
+  }, [nodes, edges]);
+
+  // Sidebar entries parsed in the browser, in the shape of the /list-files "files" items
+  const localEntries = (filename, content) =>
+    Object.entries(getFunctionsAndVariables(content))
+      .filter(([functionName]) => !functionName.startsWith('_'))
+      .map(([functionName, parameters]) => ({
+        filename,
+        functionName,
+        parameters,
+        input_folders: [],
+        output_folders: [],
+        input_count: 0,
+        output_count: 0,
+        block_type: 'unknown',
+        pipeline_position: 0,
+        connectable: { inputs: [], outputs: [] },
+      }));
+
+  // Parse the .py files of a picked folder in the browser (subdirectories are skipped)
+  const readFolderContents = async (handle) => {
+    const entries = [];
+    for await (const entry of handle.values()) {
+      if (entry.kind === 'file' && entry.name.endsWith('.py')) {
+        const file = await entry.getFile();
+        entries.push(...localEntries(entry.name, await file.text()));
+      }
+    }
+    return entries.sort((a, b) => a.filename.localeCompare(b.filename));
+  };
+
+  // List a folder through /list-files, which also watches it for this window's WebSocket connection,
+  // so the sidebar follows the folder through functions_delta messages. When the server cannot read
+  // the folder, readLocal() lists it in the browser instead.
+  const loadFolder = async (path, readLocal) => {
+    if (watchedFolderRef.current && wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify({ type: "unwatch_folder", folder_path: watchedFolderRef.current }));
+    }
+    watchedFolderRef.current = null;
+    relistFolderRef.current = () => loadFolder(path, readLocal);
+    setLoading(true);
+    try {
+      const response = await axios.post("http://localhost:8000/list-files", {
+        folder_path: path,
+        client_id: clientIdRef.current,
+      });
+      watchedFolderRef.current = response.data.folder_path;
+      setFileList(response.data.files);
+    } catch (error) {
+      console.warn("The server cannot list this folder, reading it in the browser:", error);
       try {
-        const functionsList = [];
-        for await (const entry of folderHandle.values()) {
-          // Only process files (not subdirectories) that end with .py
-          if (entry.kind === 'file' && entry.name.endsWith('.py')) {
-            const file = await entry.getFile();
-            const content = await file.text();
-            const functions = getFunctionsAndVariables(content);
-            const functionNames = Object.keys(functions);
-            // Only add the first function from each file
-            if (functionNames.length > 0) {
-              const firstFunctionName = functionNames[0];
-              functionsList.push({
-                filename: entry.name,
-                functionName: firstFunctionName,
-                parameters: functions[firstFunctionName],
-              });
-            }
-          }
-          // Explicitly skip directories - no recursive traversal
-          else if (entry.kind === 'directory') {
-            console.log(`Skipping directory: ${entry.name}`);
-            continue;
-          }
-        }
-        // Sort functionsList based on 'filename'
-        functionsList.sort((a, b) => a.filename.localeCompare(b.filename));
-        // Compare new functionsList with existing fileList
-        const isEqual = JSON.stringify(functionsList) === JSON.stringify(fileList);
-        if (!isEqual) {
-          setFileList(functionsList);
-        }
-      } catch (error) {
-        console.error('Failed to read folder contents:', error);
+        setFileList(await readLocal());
+      } catch (readError) {
+        console.error('Failed to read folder contents:', readError);
       }
+    } finally {
+      setLoading(false);
     }
   };
 
-  // Modify 'handleFolderSelect' to call 'readFolderContents'
   const handleFolderSelect = async () => {
     try {
       const handle = await window.showDirectoryPicker();
       setFolderHandle(handle);
       setFolderPath(handle.name);
-      await readFolderContents();
+      await loadFolder(handle.name, () => readFolderContents(handle));
     } catch (error) {
       console.error('Folder selection canceled or failed:', error);
     }
   };
 
-  // Add a useEffect hook to monitor changes
+  // Folders the server does not watch are read again in the browser every 5 seconds
   useEffect(() => {
-    let interval;
-    if (folderHandle) {
-      interval = setInterval(() => {
-        readFolderContents();
-      }, 5000); // Check every 5 seconds
-    }
-    return () => {
-      if (interval) clearInterval(interval);
-    };
+    if (!folderHandle) return undefined;
+    const interval = setInterval(async () => {
+      if (watchedFolderRef.current) return;
+      try {
+        const entries = await readFolderContents(folderHandle);
+        setFileList((prev) => (JSON.stringify(prev) === JSON.stringify(entries) ? prev : entries));
+      } catch (error) {
+        console.error('Failed to read folder contents:', error);
+      }
+    }, 5000);
+    return () => clearInterval(interval);
   }, [folderHandle]);
 
   // Function to create an empty Python script in the selected folder
@@ -1120,33 +1206,41 @@ const App = () => {
     if (folderHandle && scriptName) {
       try {
         const fileHandle = await folderHandle.getFileHandle(scriptName, { create: true });
-        setScriptFileHandle(fileHandle);
         // Write empty content to the file
         const writable = await fileHandle.createWritable();
         await writable.write('');
         await writable.close();
+        scriptGraphRef.current = null;
+        scriptContentRef.current = '';
+        setScriptFileHandle(fileHandle);
       } catch (error) {
         console.error('Failed to create script file:', error);
       }
     }
   };
 
-  // Implement real-time script updates
+  // Implement real-time script updates (debounced: compiling runs on the server). Moving nodes
+  // around does not change the script, and a graph that does not compile (e.g. a node whose
+  // inputs are not filled in yet) leaves the file as it is
   useEffect(() => {
-    const updateScriptFile = async () => {
-      if (scriptFileHandle) {
-        try {
-          const scriptContent = generatePythonScript(nodes, edges);
-          const writable = await scriptFileHandle.createWritable();
-          await writable.write(scriptContent);
-          await writable.close();
-        } catch (error) {
-          console.error('Failed to update script file:', error);
-        }
+    if (!scriptFileHandle) return undefined;
+    const graphKey = JSON.stringify([scriptName, nodes.map(({ id, data }) => ({ id, data })), edges]);
+    if (graphKey === scriptGraphRef.current) return undefined;
+    const timer = setTimeout(async () => {
+      try {
+        const scriptContent = await compileGraph(nodes, edges);
+        scriptGraphRef.current = graphKey;
+        if (scriptContent === scriptContentRef.current) return;
+        const writable = await scriptFileHandle.createWritable();
+        await writable.write(scriptContent);
+        await writable.close();
+        scriptContentRef.current = scriptContent;
+      } catch (error) {
+        console.error('Failed to update script file:', error);
       }
-    };
-    updateScriptFile();
-  }, [nodes, edges]);
+    }, 500);
+    return () => clearTimeout(timer);
+  }, [nodes, edges, scriptFileHandle, scriptName]);
 
   // Helper function to parse functions and variables from file content
   const getFunctionsAndVariables = (fileContent) => {
@@ -1209,6 +1303,7 @@ const App = () => {
       <TopToolbar 
         isRunning={isRunning}
         onRunScript={handleRunScript}
+        onCancelRun={handleCancelRun}
         resourceData={resourceData}
         scriptName={scriptName}
         setScriptName={setScriptName}
@@ -1221,14 +1316,13 @@ const App = () => {
           handleFolderSelect={handleFolderSelect}
           folderInputRef={folderInputRef}
           loading={loading}
-          setLoading={setLoading}
           scriptName={scriptName}
           setScriptName={setScriptName}
           createScriptFile={createScriptFile}
           fileList={fileList}
-          setFileList={setFileList}
+          loadFolder={loadFolder}
+          localEntries={localEntries}
           onDragStart={onDragStart}
-          getFunctionsAndVariables={getFunctionsAndVariables}
           filteredFunctions={filteredFunctions}
           filterType={filterType}
           clearFilter={clearFilter}
@@ -1258,6 +1352,14 @@ const App = () => {
             <Background />
           </ReactFlow>
 
+          {/* Display per-node progress of the current run */}
+          {isRunning && Object.keys(nodeProgress).length > 0 && (
+            <div style={{ position: 'absolute', bottom: 10, right: 10 }}>
+              <h3>Progress</h3>
+              <pre>{JSON.stringify(nodeProgress, null, 2)}</pre>
+            </div>
+          )}
+
           {/* Display Results */}
           {results && (
             <div style={{ position: 'absolute', bottom: 10, left: 10 }}>
@@ -0,0 +1,132 @@
+// src/graphSync.js
+// Keeps the server's copy of the canvas graph in sync by sending small,
+// versioned patches over /realtime-updates instead of the full nodes/edges
+// arrays on every change. See orgImpulse/graph_sync.py for the protocol.
+
+const DEBOUNCE_MS = 50;
+const TRANSIENT_NODE_KEYS = ['selected', 'dragging', 'resizing'];
+
+const escapePointer = (key) => String(key).replace(/~/g, '~0').replace(/\//g, '~1');
+
+const isPlainObject = (value) =>
+  value !== null && typeof value === 'object' && !Array.isArray(value);
+
+// JSON form of the graph keyed by id; callbacks in node data are dropped by the round trip
+export const toGraphMap = (nodes, edges) => {
+  const graph = { nodes: {}, edges: {} };
+  nodes.forEach((node) => {
+    const plain = JSON.parse(JSON.stringify(node));
+    TRANSIENT_NODE_KEYS.forEach((key) => delete plain[key]);
+    graph.nodes[node.id] = plain;
+  });
+  edges.forEach((edge) => {
+    graph.edges[edge.id] = JSON.parse(JSON.stringify(edge));
+  });
+  return graph;
+};
+
+// JSON-Patch ops turning `before` into `after`; arrays are replaced as a whole
+export const diffGraph = (before, after, path = '') => {
+  const ops = [];
+  Object.keys(before).forEach((key) => {
+    if (!(key in after)) {
+      ops.push({ op: 'remove', path: `${path}/${escapePointer(key)}` });
+    }
+  });
+  Object.keys(after).forEach((key) => {
+    const childPath = `${path}/${escapePointer(key)}`;
+    if (!(key in before)) {
+      ops.push({ op: 'add', path: childPath, value: after[key] });
+    } else if (isPlainObject(before[key]) && isPlainObject(after[key])) {
+      ops.push(...diffGraph(before[key], after[key], childPath));
+    } else if (JSON.stringify(before[key]) !== JSON.stringify(after[key])) {
+      ops.push({ op: 'replace', path: childPath, value: after[key] });
+    }
+  });
+  return ops;
+};
+
+export class GraphSyncClient {
+  constructor(send, sessionId) {
+    this.send = send;
+    this.sessionId = sessionId || `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+    this.synced = { nodes: {}, edges: {} }; // what the server has (or will have once acked)
+    this.version = 0; // server version the next patch applies to
+    this.seq = 0;
+    this.current = null;
+    this.timer = null;
+    this.awaitingSnapshotAck = false;
+  }
+
+  // Call after (re)connecting
+  hello() {
+    this.send({ type: 'graph_hello', session: this.sessionId, version: this.version, seq: ++this.seq });
+  }
+
+  // Record the latest graph; bursts of changes are coalesced into one patch
+  update(nodes, edges) {
+    this.current = { nodes, edges };
+    this.schedule();
+  }
+
+  schedule() {
+    if (this.timer) return;
+    this.timer = setTimeout(() => {
+      this.timer = null;
+      this.flush();
+    }, DEBOUNCE_MS);
+  }
+
+  flush() {
+    // Patches need a known base version; changes made meanwhile go out after the snapshot ack
+    if (!this.current || this.awaitingSnapshotAck) return;
+    const graph = toGraphMap(this.current.nodes, this.current.edges);
+    const ops = diffGraph(this.synced, graph);
+    if (ops.length === 0) return;
+    this.send({
+      type: 'graph_patch',
+      session: this.sessionId,
+      seq: ++this.seq,
+      base_version: this.version,
+      ops,
+    });
+    this.synced = graph;
+    this.version += 1;
+  }
+
+  sendSnapshot() {
+    const graph = this.current
+      ? toGraphMap(this.current.nodes, this.current.edges)
+      : { nodes: {}, edges: {} };
+    this.send({
+      type: 'graph_snapshot',
+      session: this.sessionId,
+      seq: ++this.seq,
+      nodes: Object.values(graph.nodes),
+      edges: Object.values(graph.edges),
+    });
+    this.synced = graph;
+    this.awaitingSnapshotAck = true;
+  }
+
+  // Returns true when the message belonged to the sync protocol
+  handleMessage(message) {
+    if (message.session !== this.sessionId) return false;
+    if (message.type === 'graph_ack') {
+      if (this.awaitingSnapshotAck) {
+        this.awaitingSnapshotAck = false;
+        this.version = message.version;
+        this.schedule();
+      } else if (message.seq === this.seq && message.version !== this.version) {
+        this.sendSnapshot();
+      }
+      return true;
+    }
+    if (message.type === 'graph_nack') {
+      // The server lost track of our state: send everything once, then resume patching
+      this.sendSnapshot();
+      return true;
+    }
+    return message.type === 'graph_snapshot';
+  }
+}
@@ -0,0 +1,309 @@
+"""
+System Resource Monitor
+=======================
+Background sampler for CPU, RAM, GPU, disk and network usage.
+
+Sampling used to happen inside the /system-resources handler and blocked the
+event loop for well over half a second per request (CPU percent intervals,
+pid enumeration and GPU tool subprocesses). ResourceMonitor instead collects a
+sample on a fixed cadence in a worker thread, keeps a fixed-size ring buffer
+of history and serves the latest sample instantly.
+
+The GPU backend (nvidia-smi, radeontop, intel_gpu_top, powermetrics) is probed
+once; afterwards only the backend that worked is queried.
+"""
+
+import asyncio
+import os
+import platform
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import psutil
+
+GPU_COMMAND_TIMEOUT = 5
+
+
+def _first_percent(output: str, marker: Callable[[str], bool]) -> Optional[float]:
+    for line in output.split('\n'):
+        if marker(line) and '%' in line:
+            match = re.search(r'(\d+\.?\d*)%', line)
+            if match:
+                return float(match.group(1))
+    return None
+
+
+def _nvidia_usage() -> Optional[float]:
+    result = subprocess.run(
+        ["nvidia-smi", "--query-gpu=utilization.gpu", "--format=csv,noheader,nounits"],
+        capture_output=True, text=True, timeout=GPU_COMMAND_TIMEOUT, check=True
+    )
+    return float(result.stdout.strip().split('\n')[0])
+
+
+def _amd_usage() -> Optional[float]:
+    result = subprocess.run(
+        ["radeontop", "-d", "-", "-l", "1"],
+        capture_output=True, text=True, timeout=GPU_COMMAND_TIMEOUT, check=True
+    )
+    return _first_percent(result.stdout, lambda line: 'gpu' in line.lower())
+
+
+def _intel_usage() -> Optional[float]:
+    result = subprocess.run(
+        ["intel_gpu_top", "-s", "1000", "-n", "1"],
+        capture_output=True, text=True, timeout=GPU_COMMAND_TIMEOUT, check=True
+    )
+    return _first_percent(result.stdout, lambda line: 'Render/3D' in line)
+
+
+def _apple_silicon_usage() -> Optional[float]:
+    result = subprocess.run(
+        ["powermetrics", "--samplers", "gpu_power", "-i", "100", "-n", "1"],
+        capture_output=True, text=True, timeout=GPU_COMMAND_TIMEOUT, check=True
+    )
+    return _first_percent(result.stdout, lambda line: 'GPU Busy' in line or 'GPU Active' in line)
+
+
+def gpu_backends() -> List[Callable[[], Optional[float]]]:
+    """GPU usage readers worth trying on this platform, in order of preference."""
+    system = platform.system()
+    if system == "Darwin":
+        # Intel Macs don't provide easy GPU utilization access
+        return [_apple_silicon_usage] if platform.machine() == "arm64" else []
+    if system == "Linux":
+        return [_nvidia_usage, _amd_usage, _intel_usage]
+    if system == "Windows":
+        # wmic doesn't expose utilization, so only NVIDIA cards are supported
+        return [_nvidia_usage]
+    return []
+
+
+class GpuProbe:
+    """Finds a working GPU backend once and keeps using it."""
+
+    def __init__(self, backends: Optional[List[Callable[[], Optional[float]]]] = None):
+        self._candidates = gpu_backends() if backends is None else backends
+        self.backend: Optional[Callable[[], Optional[float]]] = None
+        self.probed = False
+
+    @property
+    def backend_name(self) -> Optional[str]:
+        return self.backend.__name__.strip('_').replace('_usage', '') if self.backend else None
+
+    def read(self) -> float:
+        if self.probed:
+            if self.backend is None:
+                return 0
+            try:
+                return self.backend() or 0
+            except Exception as e:
+                print(f"GPU monitoring error ({self.backend_name}): {e}")
+                return 0
+
+        self.probed = True
+        for backend in self._candidates:
+            try:
+                value = backend()
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                print(f"GPU monitoring error ({backend.__name__}): {e}")
+                continue
+            if value is not None:
+                self.backend = backend
+                return value
+        return 0
+
+
+def _round_gb(value: float) -> float:
+    return round(value / (1024**3), 2)
+
+
+def fallback_resources() -> Dict[str, Any]:
+    """Zeroed sample returned when collection fails."""
+    return {
+        "cpu": 0,
+        "ram": 0,
+        "gpu": 0,
+        "cpu_detailed": {"percent": 0, "per_core": [], "count_physical": 0, "count_logical": 0},
+        "ram_detailed": {"percent": 0, "used_gb": 0, "total_gb": 0, "available_gb": 0},
+        "disk": {"percent": 0, "used_gb": 0, "total_gb": 0, "free_gb": 0},
+        "network": {"sent_mb": 0, "received_mb": 0},
+        "system": {"process_count": 0, "uptime_hours": 0, "platform": "unknown", "architecture": "unknown"}
+    }
+
+
+def collect_resources(gpu_probe: GpuProbe) -> Dict[str, Any]:
+    """Take one sample. CPU percentages are measured since the previous call, so this never sleeps."""
+    try:
+        cpu_percent = psutil.cpu_percent(interval=None)
+        cpu_per_core = psutil.cpu_percent(interval=None, percpu=True)
+
+        # CPU frequency
+        try:
+            cpu_freq = psutil.cpu_freq()
+            cpu_freq_current = cpu_freq.current if cpu_freq else 0
+            cpu_freq_max = cpu_freq.max if cpu_freq else 0
+        except (AttributeError, OSError):
+            cpu_freq_current = 0
+            cpu_freq_max = 0
+
+        memory = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+
+        try:
+            disk_usage = psutil.disk_usage('/')
+            disk = {
+                "percent": round((disk_usage.used / disk_usage.total) * 100, 1),
+                "used_gb": _round_gb(disk_usage.used),
+                "total_gb": _round_gb(disk_usage.total),
+                "free_gb": _round_gb(disk_usage.free)
+            }
+        except Exception:
+            disk = {"percent": 0, "used_gb": 0, "total_gb": 0, "free_gb": 0}
+
+        try:
+            net_io = psutil.net_io_counters()
+            network = {
+                "sent_mb": round(net_io.bytes_sent / (1024**2), 2),
+                "received_mb": round(net_io.bytes_recv / (1024**2), 2)
+            }
+        except Exception:
+            network = {"sent_mb": 0, "received_mb": 0}
+
+        try:
+            process_count = len(psutil.pids())
+        except Exception:
+            process_count = 0
+
+        try:
+            load_1min, load_5min, load_15min = os.getloadavg() if hasattr(os, 'getloadavg') else (0, 0, 0)
+        except Exception:
+            load_1min = load_5min = load_15min = 0
+
+        gpu_percent = gpu_probe.read()
+
+        try:
+            uptime_hours = (time.time() - psutil.boot_time()) / 3600
+        except Exception:
+            uptime_hours = 0
+
+        temperatures = {}
+        try:
+            if hasattr(psutil, 'sensors_temperatures'):
+                for name, entries in psutil.sensors_temperatures().items():
+                    if entries:
+                        temperatures[name] = entries[0].current
+        except Exception:
+            pass
+
+        return {
+            # Primary metrics (for compatibility)
+            "cpu": round(cpu_percent, 1),
+            "ram": round(memory.percent, 1),
+            "gpu": round(gpu_percent, 1),
+
+            "cpu_detailed": {
+                "percent": round(cpu_percent, 1),
+                "per_core": [round(core, 1) for core in cpu_per_core],
+                "count_physical": psutil.cpu_count(),
+                "count_logical": psutil.cpu_count(logical=True),
+                "frequency_current": round(cpu_freq_current, 1),
+                "frequency_max": round(cpu_freq_max, 1),
+                "load_avg": {
+                    "1min": round(load_1min, 2),
+                    "5min": round(load_5min, 2),
+                    "15min": round(load_15min, 2)
+                }
+            },
+
+            "ram_detailed": {
+                "percent": round(memory.percent, 1),
+                "used_gb": _round_gb(memory.used),
+                "total_gb": _round_gb(memory.total),
+                "available_gb": _round_gb(memory.available),
+                "swap_percent": round(swap.percent, 1),
+                "swap_used_gb": _round_gb(swap.used),
+                "swap_total_gb": _round_gb(swap.total)
+            },
+
+            "disk": disk,
+            "network": network,
+
+            "system": {
+                "process_count": process_count,
+                "uptime_hours": round(uptime_hours, 1),
+                "platform": platform.system(),
+                "architecture": platform.machine(),
+                "temperatures": temperatures,
+                "gpu_backend": gpu_probe.backend_name
+            }
+        }
+    except Exception as e:
+        print(f"Resource monitoring error: {e}")
+        return fallback_resources()
+
+
+class ResourceMonitor:
+    """Collects resource samples on a fixed cadence and keeps a ring buffer of history."""
+
+    def __init__(self, interval: float = 2.0, history_size: int = 300):
+        self.interval = interval
+        self.history_size = history_size
+        self.gpu_probe = GpuProbe()
+        self._samples: deque = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self) -> Dict[str, Any]:
+        """Collect one sample and append it to the history (blocking; run off the event loop)."""
+        sample = collect_resources(self.gpu_probe)
+        sample["timestamp"] = time.time()
+        with self._lock:
+            self._samples.append(sample)
+        return sample
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await asyncio.to_thread(self.sample)
+            except Exception as e:
+                print(f"Resource sampler error: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._task is None:
+            # Prime the CPU counters so the first sample is not a meaningless 0.0
+            psutil.cpu_percent(interval=None)
+            psutil.cpu_percent(interval=None, percpu=True)
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._samples[-1] if self._samples else None
+
+    def history(self, seconds: Optional[float] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Samples from the last `seconds` (and/or the last `limit` samples), oldest first."""
+        with self._lock:
+            samples = list(self._samples)
+        if seconds is not None:
+            cutoff = time.time() - seconds
+            samples = [sample for sample in samples if sample["timestamp"] >= cutoff]
+        if limit is not None:
+            samples = samples[-limit:] if limit > 0 else []
+        return samples
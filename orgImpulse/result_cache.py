@@ -0,0 +1,146 @@
+"""
+Result Cache
+============
+Content-addressed, on-disk memoisation of node results.
+
+A node's key is derived from the source of the file defining its function
+(together with the modules it imports from its own folder, see
+module_cache.dependency_hash), the function name, its argument values and the
+keys of its upstream nodes. Changing a parameter therefore changes the key of
+that node and of every node downstream of it, while untouched branches keep
+hitting the cache. A node opts out with node["data"]["cache"] = False.
+
+Nodes that save to data folders (output folders found by the analyzer, or
+"data_paths" outputs) are never cached, nor is anything downstream of them:
+the key does not cover files, so a hit would silently skip their writes. Make
+mode (data_manifest.py) is how such nodes are skipped when their data is up
+to date.
+
+Entries are pickled under the cache directory and evicted least-recently-used
+once the total size exceeds max_bytes.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ncpipe", "results")
+DEFAULT_MAX_BYTES = 5 * 1024**3
+
+
+def result_cache_key(source_hash: str, func_name: str, args: List[Any], upstream_keys: List[str]) -> str:
+    """Deterministic key for one node execution."""
+    payload = json.dumps(
+        {"source": source_hash, "function": func_name, "args": args, "upstream": upstream_keys},
+        sort_keys=True, default=repr,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU store of pickled node results."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size, oldest first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_existing()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".pkl")
+
+    def _load_existing(self):
+        """Rebuild the LRU order from disk (mtime is bumped on every hit)."""
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.endswith(".pkl"):
+                    stat = os.stat(os.path.join(root, filename))
+                    found.append((stat.st_mtime, filename[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (hit, value)."""
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries:
+                return False, None
+        # Unpickling a large entry must not hold up other reads and writes
+        try:
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:  # Evicted since the check
+                self._total_bytes -= self._entries.pop(key, 0)
+            return False, None
+        except Exception as e:
+            print(f"Dropping unreadable cache entry {key}: {e}")
+            with self._lock:
+                self._remove(key)
+            return False, None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return True, value
+
+    def put(self, key: str, value: Any) -> bool:
+        """Store a value; returns False if it cannot be pickled or is larger than the cache."""
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"Result for cache key {key} is not picklable, not caching: {e}")
+            return False
+        if len(data) > self.max_bytes:
+            return False
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total_bytes += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict()
+        return True
+
+    def _remove(self, key: str):
+        self._total_bytes -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._total_bytes, "max_bytes": self.max_bytes}
+
+
+def open_result_cache(cache_dir: Optional[str] = None, max_bytes: Optional[int] = None) -> ResultCache:
+    """Open a ResultCache, falling back to the NCPIPE_CACHE_DIR / NCPIPE_CACHE_MAX_BYTES settings."""
+    return ResultCache(
+        cache_dir or os.environ.get("NCPIPE_CACHE_DIR") or DEFAULT_CACHE_DIR,
+        max_bytes or int(os.environ.get("NCPIPE_CACHE_MAX_BYTES", 0)) or DEFAULT_MAX_BYTES,
+    )
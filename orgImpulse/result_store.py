@@ -0,0 +1,372 @@
+"""
+Result Store
+============
+Out-of-band storage of node results, fetched lazily by clients.
+
+Every node result of a run is written to NCPIPE_RESULTS_DIR instead of being
+held in server memory and serialised into the run response:
+
+    <root>/<run_id>/<node key>.npy   NumPy arrays (memory-mapped when read)
+    <root>/<run_id>/<node key>.bin   raw byte buffers
+    <root>/<run_id>/<node key>.pkl   anything else, pickled
+    <root>/<run_id>/<node key>.json  metadata (node id, format, size, description)
+
+Clients fetch results through GET /runs/<run_id>/results/<node_id>, which can
+slice arrays, page through sequences and tables, and stream the stored bytes
+with HTTP range support; see read_slice, read_page and parse_range.
+
+Entries are reference counted: a run holds its entries while it executes and
+every open reader holds the entry it streams. Unreferenced entries expire
+after ttl seconds without access and the least recently used are evicted once
+the store exceeds max_bytes.
+"""
+
+import dataclasses
+import io
+import json
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from module_cache import content_hash
+from result_transport import SharedBuffer, client_value, materialize
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ncpipe", "runs")
+DEFAULT_MAX_BYTES = 20 * 1024**3
+DEFAULT_TTL = 24 * 3600
+STREAM_CHUNK_BYTES = 1024 * 1024
+LOADED_OBJECTS = 2  # unpickled results kept in memory for paging
+
+_RUN_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class ResultNotFound(KeyError):
+    """Raised when a run or node result is not (or no longer) in the store."""
+
+
+@dataclasses.dataclass
+class StoredResult:
+    run_id: str
+    node_id: str
+    format: str  # npy, bin or pkl
+    path: str
+    nbytes: int
+    description: Any
+    last_access: float = dataclasses.field(default_factory=time.time)
+    readers: int = 0
+
+
+class ResultStore:
+    """Reference-counted, size- and TTL-bounded store of node results on disk."""
+
+    def __init__(self, root: str = DEFAULT_RESULTS_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl: float = DEFAULT_TTL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], StoredResult]" = OrderedDict()  # least recent first
+        self._active_runs: Dict[str, int] = {}
+        self._loaded: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        found = []
+        for run_id in os.listdir(self.root):
+            run_dir = os.path.join(self.root, run_id)
+            if not os.path.isdir(run_dir):
+                continue
+            for filename in os.listdir(run_dir):
+                if not filename.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(run_dir, filename), "r") as file:
+                        meta = json.load(file)
+                    entry = StoredResult(**meta)
+                    entry.last_access = os.path.getmtime(entry.path)
+                except (OSError, ValueError, TypeError):
+                    continue
+                found.append(entry)
+        for entry in sorted(found, key=lambda entry: entry.last_access):
+            self._entries[(entry.run_id, entry.node_id)] = entry
+            self._total_bytes += entry.nbytes
+
+    def _node_path(self, run_id: str, node_id: str, extension: str) -> str:
+        if not _RUN_ID.match(run_id):
+            raise ValueError(f"Invalid run id '{run_id}'")
+        return os.path.join(self.root, run_id, content_hash(node_id.encode())[:16] + extension)
+
+    # Run lifetime
+
+    def retain_run(self, run_id: str):
+        """Protect a run's entries from eviction while it executes."""
+        with self._lock:
+            self._active_runs[run_id] = self._active_runs.get(run_id, 0) + 1
+
+    def release_run(self, run_id: str):
+        with self._lock:
+            count = self._active_runs.get(run_id, 0) - 1
+            if count > 0:
+                self._active_runs[run_id] = count
+            else:
+                self._active_runs.pop(run_id, None)
+        self.evict()
+
+    # Writing
+
+    def put(self, run_id: str, node_id: str, value: Any) -> Any:
+        """Store one node result; returns the client description of it."""
+        if isinstance(value, SharedBuffer):
+            value = value.open()
+        elif isinstance(value, list):
+            value = materialize(value)  # A map node's outputs may hold shared buffers
+        description = client_value(value)
+        if np is not None and isinstance(value, np.ndarray) and not value.dtype.hasobject:
+            fmt = "npy"
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            fmt = "bin"
+        else:
+            fmt = "pkl"
+
+        path = self._node_path(run_id, node_id, "." + fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                if fmt == "npy":
+                    np.save(file, value, allow_pickle=False)
+                elif fmt == "bin":
+                    file.write(value)
+                else:
+                    pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        entry = StoredResult(run_id, node_id, fmt, path, os.path.getsize(path), description)
+        with open(self._node_path(run_id, node_id, ".json"), "w") as file:
+            json.dump(dataclasses.asdict(entry), file)
+
+        with self._lock:
+            old = self._entries.pop((run_id, node_id), None)
+            if old is not None:
+                self._total_bytes -= old.nbytes
+            self._entries[(run_id, node_id)] = entry
+            self._total_bytes += entry.nbytes
+            self._loaded.pop((run_id, node_id), None)
+        self.evict()
+        return description
+
+    # Reading
+
+    def get(self, run_id: str, node_id: str) -> StoredResult:
+        with self._lock:
+            entry = self._entries.get((run_id, node_id))
+            if entry is None:
+                raise ResultNotFound(f"No stored result for node '{node_id}' of run '{run_id}'")
+            entry.last_access = time.time()
+            self._entries.move_to_end((run_id, node_id))
+            return entry
+
+    def nodes(self, run_id: str) -> List[StoredResult]:
+        with self._lock:
+            return [entry for (entry_run, _), entry in self._entries.items() if entry_run == run_id]
+
+    @contextmanager
+    def reading(self, run_id: str, node_id: str) -> Iterator[StoredResult]:
+        """Hold an entry so it is not evicted while it is being read."""
+        entry = self.get(run_id, node_id)
+        with self._lock:
+            entry.readers += 1
+        try:
+            yield entry
+        finally:
+            with self._lock:
+                entry.readers -= 1
+            try:
+                os.utime(entry.path)
+            except OSError:
+                pass
+
+    def load(self, entry: StoredResult) -> Any:
+        """The stored value: a read-only memory map for arrays, the object otherwise."""
+        if entry.format == "npy":
+            return np.load(entry.path, mmap_mode="r", allow_pickle=False)
+        if entry.format == "bin":
+            with open(entry.path, "rb") as file:
+                return file.read()
+
+        key = (entry.run_id, entry.node_id)
+        with self._lock:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                return self._loaded[key]
+        with open(entry.path, "rb") as file:
+            value = pickle.load(file)
+        with self._lock:
+            self._loaded[key] = value
+            while len(self._loaded) > LOADED_OBJECTS:
+                self._loaded.popitem(last=False)
+        return value
+
+    # Eviction
+
+    def _removable(self, entry: StoredResult) -> bool:
+        return entry.readers == 0 and entry.run_id not in self._active_runs
+
+    def _remove(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.nbytes
+        self._loaded.pop(key, None)
+        for path in (entry.path, self._node_path(entry.run_id, entry.node_id, ".json")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        run_dir = os.path.dirname(entry.path)
+        if not any(run_id == entry.run_id for run_id, _ in self._entries):
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones above max_bytes; returns the count."""
+        removed = 0
+        now = time.time()
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if self.ttl and now - entry.last_access > self.ttl and self._removable(entry):
+                    self._remove(key)
+                    removed += 1
+            for key, entry in list(self._entries.items()):
+                if self._total_bytes <= self.max_bytes:
+                    break
+                if self._removable(entry):
+                    self._remove(key)
+                    removed += 1
+        return removed
+
+    def delete_run(self, run_id: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == run_id]:
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "total_bytes": self._total_bytes,
+                    "max_bytes": self.max_bytes, "ttl": self.ttl}
+
+
+def open_result_store() -> ResultStore:
+    """Result store configured from NCPIPE_RESULTS_DIR, NCPIPE_RESULTS_MAX_BYTES and NCPIPE_RESULTS_TTL."""
+    return ResultStore(
+        root=os.environ.get("NCPIPE_RESULTS_DIR", DEFAULT_RESULTS_DIR),
+        max_bytes=int(os.environ.get("NCPIPE_RESULTS_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        ttl=float(os.environ.get("NCPIPE_RESULTS_TTL", DEFAULT_TTL)),
+    )
+
+
+# Request helpers
+
+def parse_slice(text: str) -> Tuple[Any, ...]:
+    """Parse a NumPy-style index such as "0:10,:,5" or "::2"."""
+    index = []
+    for part in text.split(","):
+        part = part.strip()
+        if part in ("", ":"):
+            index.append(slice(None))
+        elif ":" in part:
+            bounds = [int(bound) if bound.strip() else None for bound in part.split(":")]
+            if len(bounds) > 3:
+                raise ValueError(f"Invalid slice '{part}'")
+            index.append(slice(*bounds))
+        else:
+            index.append(int(part))
+    return tuple(index)
+
+
+def read_slice(array: Any, index: Tuple[Any, ...]) -> Any:
+    """View of the requested part of a (memory-mapped) array, without reading the rest."""
+    if len(index) > array.ndim:
+        raise ValueError(f"Too many indices for array with {array.ndim} dimension(s)")
+    return array[index]
+
+
+def read_page(value: Any, offset: int, limit: Optional[int]) -> Tuple[Any, Optional[int]]:
+    """One page of a sequence or table, plus its total length (None if not pageable)."""
+    end = None if limit is None else offset + limit
+    if hasattr(value, "iloc") and hasattr(value, "to_dict"):  # pandas DataFrame / Series
+        page = value.iloc[offset:end]
+        records = page.to_dict(orient="records") if hasattr(page, "columns") else page.tolist()
+        return records, len(value)
+    if isinstance(value, (list, tuple, str)):
+        return value[offset:end], len(value)
+    if isinstance(value, dict):
+        keys = list(value)[offset:end]
+        return {key: value[key] for key in keys}, len(value)
+    return value, None
+
+
+def iter_npy(array: Any, chunk_bytes: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """Encode an array as a .npy file in chunks, reading it row block by row block."""
+    header = np.lib.format.header_data_from_array_1_0(np.empty((0,), dtype=array.dtype))
+    header["shape"] = array.shape
+    header["fortran_order"] = False
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(buffer, header)
+    yield buffer.getvalue()
+
+    if array.ndim == 0:
+        yield np.ascontiguousarray(array).tobytes()
+        return
+    row_bytes = max(1, array[0:1].nbytes) if len(array) else 1
+    rows = max(1, chunk_bytes // row_bytes)
+    for start in range(0, len(array), rows):
+        yield np.ascontiguousarray(array[start:start + rows]).tobytes()
+
+
+def iter_file(path: str, start: int = 0, end: Optional[int] = None,
+              chunk_bytes: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """Bytes [start, end) of a file in chunks."""
+    with open(path, "rb") as file:
+        file.seek(start)
+        remaining = None if end is None else end - start
+        while remaining is None or remaining > 0:
+            chunk = file.read(chunk_bytes if remaining is None else min(chunk_bytes, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single "bytes=start-end" Range header into [start, end); None for no/invalid range."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) + 1 if end_text else size
+        else:
+            start, end = max(0, size - int(end_text)), size
+    except ValueError:
+        return None
+    if start >= size or start >= end:
+        return None
+    return start, min(end, size)
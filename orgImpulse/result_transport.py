@@ -0,0 +1,253 @@
+"""
+Result Transport
+================
+Moves large node results between worker processes without pickling them.
+
+When a node running in the process pool returns a NumPy array or another
+buffer-protocol object (bytes, bytearray, memoryview) of at least
+NCPIPE_SHARE_MIN_BYTES, the worker copies it once into a
+multiprocessing.shared_memory block and returns a small SharedBuffer handle
+instead. If shared memory is unavailable or too full, the buffer is spilled to
+a file under NCPIPE_SPILL_DIR and memory-mapped instead.
+
+Downstream nodes receive zero-copy, copy-on-write views of the same memory
+(np.ndarray for arrays, memoryview for raw bytes): a block may edit its input
+in place, and only the pages it writes are copied, privately, so the producer
+and other consumers keep the original. Clients only ever see describe():
+shape, dtype, nbytes and a short preview.
+
+Blocks are owned by the scheduler run that produced them and released when
+that run ends.
+"""
+
+import json
+import mmap
+import os
+import reprlib
+import sys
+import tempfile
+import uuid
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+SHARE_MIN_BYTES = int(os.environ.get("NCPIPE_SHARE_MIN_BYTES", 1024 * 1024))
+SPILL_DIR = os.environ.get("NCPIPE_SPILL_DIR") or os.path.join(tempfile.gettempdir(), "ncpipe-spill")
+SHM_ROOT = "/dev/shm"
+# Leave this much of /dev/shm free; tmpfs raises SIGBUS instead of an error when it runs out
+SHM_HEADROOM_BYTES = 64 * 1024 * 1024
+PREVIEW_CHARS = 200
+# Larger JSON results are summarised for clients and fetched from the result store instead
+INLINE_MAX_BYTES = int(os.environ.get("NCPIPE_INLINE_MAX_BYTES", 64 * 1024))
+
+_summary_repr = reprlib.Repr()
+_summary_repr.maxstring = _summary_repr.maxother = PREVIEW_CHARS
+
+def _loaded_numpy():
+    """NumPy if something already imported it. A value can only be an ndarray then,
+    so type checks need not pay for importing it (raw buffers are shared without it)."""
+    return sys.modules.get("numpy")
+
+
+@dataclass(frozen=True)
+class SharedBuffer:
+    """Picklable handle to a result living in shared memory or a spill file."""
+    kind: str  # "shm" or "file"
+    location: str  # shared memory name or spill file path
+    nbytes: int
+    shape: Optional[Tuple[int, ...]] = None  # None for raw bytes
+    dtype: Optional[str] = None
+    preview: str = ""
+
+    def describe(self) -> Dict[str, Any]:
+        """JSON-safe description sent to clients instead of the payload."""
+        return {
+            "type": "ndarray" if self.shape is not None else "bytes",
+            "shape": list(self.shape) if self.shape is not None else None,
+            "dtype": self.dtype,
+            "nbytes": self.nbytes,
+            "preview": self.preview,
+            "transport": self.kind,
+        }
+
+    def open(self) -> Any:
+        """Writable, copy-on-write view of the buffer in this process; writes stay private to it."""
+        path = os.path.join(SHM_ROOT, self.location) if self.kind == "shm" else self.location
+        if not self.nbytes:
+            buffer = bytearray()
+        elif os.path.exists(path):
+            with open(path, "rb") as file:
+                buffer = mmap.mmap(file.fileno(), self.nbytes, access=mmap.ACCESS_COPY)
+        else:
+            # Shared memory outside /dev/shm cannot be mapped privately, so the view is a copy
+            block = shared_memory.SharedMemory(name=self.location)
+            try:
+                buffer = bytearray(block.buf[:self.nbytes])
+            finally:
+                block.close()
+
+        if self.shape is None:
+            return memoryview(buffer)
+        import numpy as np
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=buffer)
+
+
+def _as_buffer(value: Any) -> Optional[Tuple[memoryview, Optional[Tuple[int, ...]], Optional[str]]]:
+    """(bytes view, shape, dtype) for values worth sharing, otherwise None."""
+    np = _loaded_numpy()
+    if np is not None and isinstance(value, np.ndarray):
+        if value.dtype.hasobject or value.nbytes < SHARE_MIN_BYTES:
+            return None
+        array = np.ascontiguousarray(value)
+        return memoryview(array.reshape(-1).view(np.uint8)), array.shape, array.dtype.str
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        view = memoryview(value).cast("B")
+        if view.nbytes < SHARE_MIN_BYTES:
+            return None
+        return view, None, None
+    return None
+
+
+def _preview(value: Any) -> str:
+    np = _loaded_numpy()
+    if np is not None and isinstance(value, np.ndarray):
+        text = np.array2string(value, threshold=20, edgeitems=2)
+    else:
+        text = repr(bytes(memoryview(value)[:48])) + "..."
+    return text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS] + "..."
+
+
+def _shm_has_room(nbytes: int) -> bool:
+    if not os.path.isdir(SHM_ROOT):
+        return True  # Not a tmpfs-backed platform; creation fails cleanly instead
+    stats = os.statvfs(SHM_ROOT)
+    return stats.f_bavail * stats.f_frsize - nbytes > SHM_HEADROOM_BYTES
+
+
+def export_value(value: Any) -> Any:
+    """Move a large buffer into shared memory (or a spill file); other values pass through."""
+    if isinstance(value, SharedBuffer):
+        return value
+    found = _as_buffer(value)
+    if found is None:
+        return value
+    data, shape, dtype = found
+    nbytes = data.nbytes
+    preview = _preview(value)
+
+    if nbytes and _shm_has_room(nbytes):
+        try:
+            block = shared_memory.SharedMemory(create=True, size=nbytes, name=f"ncpipe_{uuid.uuid4().hex[:16]}")
+        except OSError:
+            block = None
+        if block is not None:
+            block.buf[:nbytes] = data
+            handle = SharedBuffer("shm", block.name, nbytes, shape, dtype, preview)
+            block.close()
+            return handle
+
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    path = os.path.join(SPILL_DIR, uuid.uuid4().hex + ".bin")
+    with open(path, "wb") as file:
+        file.write(data)
+    return SharedBuffer("file", path, nbytes, shape, dtype, preview)
+
+
+def import_value(value: Any) -> Any:
+    """Replace a SharedBuffer handle (or a map node's list of them) by views of the data."""
+    if isinstance(value, list):
+        return [import_value(item) for item in value]
+    return value.open() if isinstance(value, SharedBuffer) else value
+
+
+def materialize(value: Any) -> Any:
+    """Private copy of a handle's data, e.g. for pickling into the result cache."""
+    if isinstance(value, list):
+        return [materialize(item) for item in value]
+    if not isinstance(value, SharedBuffer):
+        return value
+    view = value.open()
+    if value.shape is None:
+        return bytes(view)
+    import numpy as np
+    return np.array(view)
+
+
+def describe_value(value: Any) -> Any:
+    """What clients get for a result: descriptions for handles and buffers, the value otherwise."""
+    if isinstance(value, SharedBuffer):
+        return value.describe()
+    if isinstance(value, list) and any(isinstance(item, SharedBuffer) for item in value):
+        return [describe_value(item) for item in value]
+    np = _loaded_numpy()
+    if np is not None and isinstance(value, np.ndarray):
+        return {"type": "ndarray", "shape": list(value.shape), "dtype": value.dtype.str,
+                "nbytes": value.nbytes, "preview": _preview(value), "transport": "memory"}
+    if isinstance(value, (bytes, bytearray, memoryview)) and memoryview(value).nbytes >= SHARE_MIN_BYTES:
+        return {"type": "bytes", "shape": None, "dtype": None,
+                "nbytes": memoryview(value).nbytes, "preview": _preview(value), "transport": "memory"}
+    return value
+
+
+def summarize_value(value: Any) -> Dict[str, Any]:
+    """Small, JSON-safe description of any value (type, bounded repr, shape or length)."""
+    if isinstance(value, SharedBuffer):
+        return value.describe()
+    text = _summary_repr.repr(value)
+    summary = {
+        "type": type(value).__name__,
+        "repr": text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS] + "...",
+    }
+    shape = getattr(value, "shape", None)
+    if isinstance(shape, tuple):
+        summary["shape"] = list(shape)
+        if getattr(value, "dtype", None) is not None:
+            summary["dtype"] = str(value.dtype)
+    elif isinstance(value, (list, tuple, dict, set, str, bytes)):
+        summary["length"] = len(value)
+    return summary
+
+
+def client_value(value: Any) -> Any:
+    """What clients get inline for a result: small JSON values as is, a summary otherwise."""
+    value = describe_value(value)
+    try:
+        text = json.dumps(value)
+    except (TypeError, ValueError):
+        return summarize_value(value)
+    return value if len(text) <= INLINE_MAX_BYTES else summarize_value(value)
+
+
+def value_nbytes(value: Any) -> Optional[int]:
+    """Size in bytes of array, bytes and shared-buffer values (and lists of them), None for anything else."""
+    if isinstance(value, SharedBuffer):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        sizes = [value_nbytes(item) for item in value]
+        return sum(sizes) if value and None not in sizes else None
+    np = _loaded_numpy()
+    if np is not None and isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return memoryview(value).nbytes
+    return None
+
+
+def release(handles: List[SharedBuffer]):
+    """Free the memory behind handles owned by a finished run."""
+    for handle in handles:
+        if handle.kind == "file":
+            try:
+                os.remove(handle.location)
+            except OSError:
+                pass
+            continue
+        try:
+            block = shared_memory.SharedMemory(name=handle.location)
+        except FileNotFoundError:
+            continue
+        block.close()
+        try:
+            block.unlink()  # Views still in use keep their pages until they are dropped
+        except FileNotFoundError:
+            pass
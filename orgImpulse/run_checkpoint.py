@@ -0,0 +1,177 @@
+"""
+Run Checkpoints
+===============
+Completion state of every run, persisted while it executes so that a failed,
+cancelled or interrupted run (including a server crash) can be resumed with
+POST /runs/<run_id>/resume.
+
+A checkpoint is an append-only JSON lines file per run in
+NCPIPE_CHECKPOINT_DIR (default ~/.cache/ncpipe/checkpoints; an empty value
+disables checkpoints):
+
+    {"type": "run", "run_id", "nodes", "edges", "options", "created_at"}
+    {"type": "node", "node_id", "status", "source_hash", "args", "error", "at"}
+    {"type": "status", "status", "error", "node_id", "at"}
+
+Node outputs are not copied: they are the run's entries in the ResultStore,
+which stay pinned (never expired or evicted) while the run can be resumed.
+A node line is only written once its output is in the store, so a crash in
+between re-executes the node rather than restoring nothing.
+
+Resuming restores a node from the store when it completed, its function
+source and arguments are unchanged, its output is still stored and every
+upstream node is restored too; all other nodes (failed, never started,
+edited, or downstream of any of those) run again. Checkpointed runs keep
+going past a failed node, so independent branches finish and need not run
+again on resume. Checkpoints of completed
+runs are removed; the others are dropped when the server starts once they
+saw no activity for NCPIPE_CHECKPOINT_TTL seconds (default 7 days).
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ncpipe", "checkpoints")
+DEFAULT_TTL = 7 * 24 * 3600
+# Node statuses whose output can be restored
+RESTORABLE_STATUSES = ("completed", "cached", "restored")
+
+_RUN_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def args_digest(args: List[Any]) -> str:
+    return hashlib.sha256(json.dumps(args, sort_keys=True, default=repr).encode()).hexdigest()
+
+
+@dataclass
+class RunCheckpoint:
+    """State of one run folded from its checkpoint file."""
+    run_id: str
+    nodes: List[Dict[str, Any]]
+    edges: List[Dict[str, Any]]
+    options: Dict[str, Any] = field(default_factory=dict)  # "cache", "make"
+    status: str = "running"
+    error: Optional[str] = None
+    error_node: Optional[str] = None
+    node_states: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # latest "node" line per node
+    attempts: int = 1  # times the run was started (1 + resumes)
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def resumable(self) -> bool:
+        return self.status != "completed"
+
+
+def restorable_nodes(graph, checkpoint: RunCheckpoint, stored: Set[str]) -> Set[str]:
+    """Nodes of a resolved ExecutionGraph whose checkpointed output can be reused on resume."""
+    restorable: Set[str] = set()
+    for node_id in graph.order:
+        task = graph.tasks[node_id]
+        state = checkpoint.node_states.get(node_id)
+        if (state is None or state["status"] not in RESTORABLE_STATUSES or node_id not in stored
+                or state.get("source_hash") != task.source_hash or state.get("args") != args_digest(task.args)):
+            continue
+        # Stream ends only exist together, and a re-executed upstream node invalidates this one
+        if task.streamed or task.stream_outputs or not task.upstream <= restorable:
+            continue
+        restorable.add(node_id)
+    return restorable
+
+
+class CheckpointStore:
+    """Checkpoint files of runs, one JSON lines file per run; safe to use from worker threads."""
+
+    def __init__(self, root: str = DEFAULT_CHECKPOINT_DIR, ttl: float = DEFAULT_TTL):
+        self.root = root
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, run_id: str) -> str:
+        if not _RUN_ID.match(run_id):
+            raise ValueError(f"Invalid run id '{run_id}'")
+        return os.path.join(self.root, run_id + ".jsonl")
+
+    def _append(self, run_id: str, record: Dict[str, Any]):
+        line = json.dumps(record, default=repr) + "\n"
+        with self._lock:
+            with open(self._path(run_id), "a") as file:
+                file.write(line)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def create(self, run_id: str, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]],
+               options: Dict[str, Any]):
+        self._append(run_id, {"type": "run", "run_id": run_id, "nodes": nodes, "edges": edges,
+                              "options": options, "created_at": time.time()})
+
+    def node(self, run_id: str, node_id: str, status: str, source_hash: Optional[str] = None,
+             args: Optional[str] = None, error: Optional[str] = None):
+        self._append(run_id, {"type": "node", "node_id": node_id, "status": status, "source_hash": source_hash,
+                              "args": args, "error": error, "at": time.time()})
+
+    def status(self, run_id: str, status: str, error: Optional[str] = None, node_id: Optional[str] = None):
+        self._append(run_id, {"type": "status", "status": status, "error": error, "node_id": node_id,
+                              "at": time.time()})
+
+    def load(self, run_id: str) -> Optional[RunCheckpoint]:
+        try:
+            with self._lock, open(self._path(run_id)) as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            return None
+        checkpoint = None
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line torn by a crash
+            if record.get("type") == "run":
+                checkpoint = RunCheckpoint(run_id=run_id, nodes=record["nodes"], edges=record["edges"],
+                                           options=record.get("options", {}), created_at=record["created_at"],
+                                           updated_at=record["created_at"])
+            elif checkpoint is None:
+                continue
+            elif record.get("type") == "node":
+                checkpoint.node_states[record["node_id"]] = record
+                checkpoint.updated_at = record["at"]
+            elif record.get("type") == "status":
+                if record["status"] == "running" and checkpoint.status != "running":
+                    checkpoint.attempts += 1
+                checkpoint.status, checkpoint.error = record["status"], record.get("error")
+                checkpoint.error_node = record.get("node_id")
+                checkpoint.updated_at = record["at"]
+        return checkpoint
+
+    def run_ids(self) -> List[str]:
+        return sorted(name[:-len(".jsonl")] for name in os.listdir(self.root) if name.endswith(".jsonl"))
+
+    def delete(self, run_id: str):
+        with self._lock:
+            try:
+                os.remove(self._path(run_id))
+            except FileNotFoundError:
+                pass
+
+    def expired(self, checkpoint: RunCheckpoint) -> bool:
+        return bool(self.ttl) and time.time() - checkpoint.updated_at > self.ttl
+
+
+def open_checkpoint_store(root: Optional[str] = None) -> Optional[CheckpointStore]:
+    """Checkpoint store at root or NCPIPE_CHECKPOINT_DIR (NCPIPE_CHECKPOINT_TTL); None when disabled."""
+    if root is None:
+        root = os.environ.get("NCPIPE_CHECKPOINT_DIR", DEFAULT_CHECKPOINT_DIR)
+    if not root:
+        return None
+    try:
+        return CheckpointStore(root, ttl=float(os.environ.get("NCPIPE_CHECKPOINT_TTL", DEFAULT_TTL)))
+    except OSError as e:
+        print(f"Run checkpoints disabled, cannot use {root}: {e}")
+        return None
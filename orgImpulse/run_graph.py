@@ -0,0 +1,206 @@
+"""
+Headless Graph Runner
+=====================
+Runs a saved graph without the server, e.g. from cron or a SLURM job:
+
+    cd orgImpulse
+    python -m run_graph pipeline.json
+    python -m run_graph pipeline.json --json > report.json
+    python -m run_graph - --no-cache --workers 8 < pipeline.json
+
+The graph file holds the same {"nodes": [...], "edges": [...]} payload that
+POST /execute-graph accepts (a GET /graph-sessions/<id> snapshot works too).
+Nodes run on the same scheduler, worker pools and result cache as in the
+server, configured by the same NCPIPE_* variables unless overridden by flags.
+
+Only argparse and json are imported up front; the engine is imported once
+the arguments are parsed, so --help and argument errors return at once and
+nothing here pulls in the server, tkinter or NumPy.
+
+Exit status: 0 when every node completed, 1 when a node failed, 2 for an
+invalid graph or arguments, 130 when interrupted.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m run_graph",
+        description="Run a saved ncpipe graph (nodes/edges JSON) without the server.",
+    )
+    parser.add_argument("graph", help="Graph JSON file, or - to read it from stdin")
+    parser.add_argument("--folder", help="Use this folder for every node instead of the saved folderPath")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("NCPIPE_PROCESS_WORKERS", 0)) or None,
+                        help="Process pool size (default: NCPIPE_PROCESS_WORKERS or the number of CPUs)")
+    parser.add_argument("--thread-workers", type=int,
+                        default=int(os.environ.get("NCPIPE_THREAD_WORKERS", 0)) or None,
+                        help="Thread pool size (default: NCPIPE_THREAD_WORKERS or workers + 4)")
+    parser.add_argument("--no-cache", action="store_true", help="Execute every node instead of reusing cached results")
+    parser.add_argument("--cache-dir", help="Result cache directory (default: NCPIPE_CACHE_DIR)")
+    parser.add_argument("--make", nargs="?", const="mtime", choices=("mtime", "hash"),
+                        help="Skip nodes whose data folders are up to date (compare file mtimes, or content hashes)")
+    parser.add_argument("--manifest-dir", help="Data manifest directory for --make (default: NCPIPE_MANIFEST_DIR)")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Neither use nor extend the run history (NCPIPE_HISTORY_DB) for priorities")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON instead of a timing table")
+    parser.add_argument("--trace", metavar="FILE", help="Also write a Chrome/Perfetto trace of the run to FILE")
+    parser.add_argument("--quiet", "-q", action="store_true", help="Do not print node progress to stderr")
+    return parser.parse_args(argv)
+
+
+def load_graph(path: str, folder=None):
+    """Nodes and edges of a saved graph, optionally pointed at another folder."""
+    if path == "-":
+        payload = json.load(sys.stdin)
+    else:
+        with open(path) as file:
+            payload = json.load(file)
+    nodes = payload.get("nodes", [])
+    edges = payload.get("edges", [])
+    if isinstance(nodes, dict):  # Keyed by id, as the server stores synced graphs
+        nodes, edges = list(nodes.values()), list(edges.values())
+    if folder:
+        nodes = [{**node, "data": {**node.get("data", {}), "folderPath": os.path.abspath(folder)}}
+                 for node in nodes]
+    return nodes, edges
+
+
+def _format_bytes(nbytes) -> str:
+    if nbytes is None:
+        return "-"
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(nbytes) < 1024 or unit == "GiB":
+            return f"{nbytes:.0f} {unit}" if unit == "B" else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+
+
+def _format_seconds(seconds) -> str:
+    return "-" if seconds is None else f"{seconds:.3f}"
+
+
+def format_timings(profile: dict) -> str:
+    """Per-node timing table of a RunProfile.to_dict()."""
+    header = ("node", "function", "status", "wall s", "cpu s", "queued s", "peak rss +")
+    rows = [header]
+    for node in profile["nodes"]:
+        rows.append((
+            node["node_id"], node["func_name"], node["status"],
+            _format_seconds(node["wall_time"]), _format_seconds(node["cpu_time"]),
+            _format_seconds(node["queue_wait"]), _format_bytes(node["peak_rss_delta"]),
+        ))
+    widths = [max(len(str(row[column])) for row in rows) for column in range(len(header))]
+    lines = ["  ".join(str(value).ljust(width) for value, width in zip(row, widths)).rstrip() for row in rows]
+    lines.append(f"total wall time: {profile['wall_time']:.3f} s")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        nodes, edges = load_graph(args.graph, args.folder)
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"Cannot read graph '{args.graph}': {e}", file=sys.stderr)
+        return 2
+
+    # The engine is only imported now, see the module docstring
+    import asyncio
+    import uuid
+    from graph_scheduler import ExecutionGraph, GraphExecutionError, GraphScheduler
+    from result_transport import client_value
+    from run_profile import RunProfile
+
+    result_cache = None
+    if not args.no_cache:
+        from result_cache import open_result_cache
+        result_cache = open_result_cache(args.cache_dir)
+    manifest_store = None
+    if args.make:
+        from data_manifest import open_manifest_store
+        manifest_store = open_manifest_store(args.manifest_dir)
+    history = None
+    if not args.no_history:
+        from run_history import open_run_history
+        history = open_run_history()
+    scheduler = GraphScheduler(max_workers=args.workers, thread_workers=args.thread_workers,
+                               result_cache=result_cache, manifest_store=manifest_store, history=history)
+    profile = RunProfile(run_id=uuid.uuid4().hex[:12])
+
+    async def progress(event, task, info):
+        if args.quiet:
+            return
+        if event == "node_started":
+            print(f"[{time.strftime('%H:%M:%S')}] {task.node_id} {task.func_name} started", file=sys.stderr)
+        elif event == "node_finished":
+            node_profile = info["profile"]
+            if node_profile.status == "skipped":
+                state = f"up to date: {node_profile.freshness}"
+            else:
+                state = "cached" if node_profile.cache_hit else "finished"
+            print(f"[{time.strftime('%H:%M:%S')}] {task.node_id} {task.func_name} {state}", file=sys.stderr)
+        elif event == "node_failed":
+            print(f"[{time.strftime('%H:%M:%S')}] {task.node_id} {task.func_name} failed: {info.get('error')}",
+                  file=sys.stderr)
+
+    async def execute():
+        graph = ExecutionGraph.from_payload(nodes, edges)
+        graph.resolve_functions()
+        if not args.quiet:
+            plan = scheduler.plan(graph)
+            print(f"[{time.strftime('%H:%M:%S')}] {len(graph.tasks)} nodes, predicted {plan.makespan:.1f} s "
+                  f"(critical path: {' -> '.join(plan.critical_path)})", file=sys.stderr)
+        return await scheduler.run(graph, use_cache=not args.no_cache, profile=profile, listener=progress,
+                                   make=args.make)
+
+    report = None
+    error = None
+    status = "completed"
+    try:
+        report = asyncio.run(execute())
+    except GraphExecutionError as e:
+        error = {"error": str(e), "node_id": e.node_id}
+        status = "failed"
+    except KeyboardInterrupt:
+        status = "cancelled"
+    finally:
+        scheduler.shutdown()
+
+    profile_dict = profile.to_dict()
+    if args.trace:
+        with open(args.trace, "w") as file:
+            json.dump(profile.to_chrome_trace(), file)
+
+    if args.json:
+        output = {"run_id": profile.run_id, "status": status, "profile": profile_dict}
+        if report is not None:
+            output["results"] = {node_id: client_value(value) for node_id, value in report.results.items()}
+            output["cache_hits"] = report.cache_hits
+            output["skipped"] = report.skipped
+        if error:
+            output.update(error)
+        print(json.dumps(output, indent=2))
+    else:
+        if profile_dict["nodes"]:
+            print(format_timings(profile_dict))
+        if report is not None and report.cache_hits:
+            print(f"cached: {', '.join(report.cache_hits)}")
+        if report is not None and report.skipped:
+            print(f"up to date: {', '.join(report.skipped)}")
+        if error:
+            where = f" (node {error['node_id']})" if error["node_id"] else ""
+            print(f"Run failed{where}: {error['error']}", file=sys.stderr)
+
+    if status == "cancelled":
+        return 130
+    if error:
+        # Problems found before anything ran (bad graph, missing function or input) are usage errors
+        return 1 if any(node["started_at"] for node in profile_dict["nodes"]) else 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
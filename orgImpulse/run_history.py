@@ -0,0 +1,138 @@
+"""
+Run History
+===========
+Persistent record of every node execution, used to estimate how long (and
+how much memory) a node will take the next time it runs.
+
+Each finished run appends one row per node to a SQLite database
+(NCPIPE_HISTORY_DB, default ~/.cache/ncpipe/history.sqlite3; an empty value
+disables the history): function name, source hash, status, wall and CPU
+time, peak RSS growth and result size. Estimates are the median over the
+most recent executions of the same function and source, falling back to
+other versions of the function and then to DEFAULT_DURATION.
+"""
+
+import os
+import sqlite3
+import statistics
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_HISTORY_DB = os.path.join(os.path.expanduser("~"), ".cache", "ncpipe", "history.sqlite3")
+# Seconds assumed for a node that never ran before
+DEFAULT_DURATION = float(os.environ.get("NCPIPE_DEFAULT_DURATION", 1.0))
+# Executions an estimate is based on
+ESTIMATE_SAMPLES = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS node_runs (
+    run_id TEXT NOT NULL,
+    node_id TEXT NOT NULL,
+    func_name TEXT NOT NULL,
+    source_hash TEXT,
+    status TEXT NOT NULL,
+    wall_time REAL,
+    cpu_time REAL,
+    peak_rss_delta INTEGER,
+    result_bytes INTEGER,
+    error TEXT,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS node_runs_function ON node_runs (func_name, source_hash, finished_at);
+"""
+
+
+@dataclass
+class NodeEstimate:
+    """Expected cost of one node execution."""
+    duration: float
+    peak_rss: Optional[int] = None  # bytes, the largest growth seen
+    samples: int = 0
+    failure_rate: float = 0.0
+    basis: str = "default"  # "source" (same function version), "function" (any version) or "default"
+
+
+class RunHistory:
+    """SQLite-backed history of node executions; safe to use from worker threads."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+
+    def record(self, run_id: str, rows: Iterable[Dict]):
+        """Append node executions: dicts with the node_runs columns (run_id is filled in)."""
+        now = time.time()
+        values = [(run_id, row["node_id"], row["func_name"], row.get("source_hash"), row["status"],
+                   row.get("wall_time"), row.get("cpu_time"), row.get("peak_rss_delta"),
+                   row.get("result_bytes"), row.get("error"), row.get("finished_at") or now)
+                  for row in rows]
+        if not values:
+            return
+        with self._lock, self._db:
+            self._db.executemany("INSERT INTO node_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", values)
+
+    def _recent(self, func_name: str, source_hash: Optional[str]) -> List[Tuple]:
+        query = "SELECT status, wall_time, peak_rss_delta FROM node_runs WHERE func_name = ?"
+        params: list = [func_name]
+        if source_hash is not None:
+            query += " AND source_hash = ?"
+            params.append(source_hash)
+        query += " AND status IN ('completed', 'failed') ORDER BY finished_at DESC LIMIT ?"
+        params.append(ESTIMATE_SAMPLES)
+        with self._lock:
+            return self._db.execute(query, params).fetchall()
+
+    def estimate(self, func_name: str, source_hash: Optional[str] = None) -> NodeEstimate:
+        """Expected cost of running a function (at a given source version when known)."""
+        attempts = [("source", source_hash), ("function", None)] if source_hash else [("function", None)]
+        for basis, version in attempts:
+            rows = self._recent(func_name, version)
+            durations = [wall for status, wall, _ in rows if status == "completed" and wall is not None]
+            if durations:
+                peaks = [peak for status, _, peak in rows if status == "completed" and peak is not None]
+                return NodeEstimate(
+                    duration=statistics.median(durations),
+                    peak_rss=max(peaks) if peaks else None,
+                    samples=len(durations),
+                    failure_rate=sum(status == "failed" for status, _, _ in rows) / len(rows),
+                    basis=basis,
+                )
+        return NodeEstimate(duration=DEFAULT_DURATION)
+
+    def estimates(self, keys: Iterable[Tuple[str, Optional[str]]]) -> Dict[Tuple[str, Optional[str]], NodeEstimate]:
+        return {key: self.estimate(*key) for key in set(keys)}
+
+    def function_stats(self, func_name: str, limit: int = 50) -> List[Dict]:
+        """Most recent executions of a function, newest first."""
+        columns = ("run_id", "node_id", "source_hash", "status", "wall_time", "cpu_time",
+                   "peak_rss_delta", "result_bytes", "error", "finished_at")
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(columns)} FROM node_runs WHERE func_name = ? ORDER BY finished_at DESC LIMIT ?",
+                (func_name, limit),
+            ).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_run_history(path: Optional[str] = None) -> Optional[RunHistory]:
+    """Open the history at path or NCPIPE_HISTORY_DB; None when disabled or unusable."""
+    if path is None:
+        path = os.environ.get("NCPIPE_HISTORY_DB", DEFAULT_HISTORY_DB)
+    if not path:
+        return None
+    try:
+        return RunHistory(path)
+    except sqlite3.Error as e:
+        print(f"Run history disabled, cannot open {path}: {e}")
+        return None
@@ -0,0 +1,412 @@
+"""
+Run Manager
+===========
+Graph executions as background jobs.
+
+submit() schedules a run on the GraphScheduler and returns immediately with its
+run id; progress is pushed to websocket clients while the run executes:
+
+    {"type": "run_started",   "run_id", "nodes": [node_id, ...], "prediction", "attempt"}
+    {"type": "node_started",  "run_id", "node_id", "func_name", "executor"}
+    {"type": "node_progress", "run_id", "node_id", "func_name", "done", "total"}  (map nodes)
+    {"type": "node_retrying", "run_id", "node_id", "func_name", "attempt", "error", "delay"}
+    {"type": "node_finished", "run_id", "node_id", "func_name", "cached",
+                              "wall_time", "cpu_time", "summary"[, "skipped": reason][, "restored": true]}
+    {"type": "node_failed",   "run_id", "node_id", "func_name", "error"}
+    {"type": "run_finished",  "run_id", "results", "cache_hits", "skipped"}
+    {"type": "run_failed",    "run_id", "error", "node_id"}
+    {"type": "run_cancelled", "run_id", "cancelled_nodes": [node_id, ...]}
+
+cancel() stops a run: queued nodes never start, and nodes already running in a
+worker are abandoned (their results are dropped).
+
+With a ResultStore, every node result is also written to the store as soon as
+the node finishes; run messages then only carry small JSON values inline and
+summaries of everything else, and clients fetch the rest from the store.
+
+With a CheckpointStore as well, runs submitted with their nodes/edges payload
+are checkpointed (see run_checkpoint.py): a failed node only stops its own
+descendants, and resume() starts a failed, cancelled or interrupted run again
+under the same run id, restoring the nodes that completed. Runs left
+unfinished by a server crash show up as "interrupted" after a restart.
+"""
+
+import asyncio
+import copy
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from graph_scheduler import ExecutionGraph, GraphExecutionError, GraphScheduler, NodeTask, SchedulePlan
+from result_store import ResultStore
+from result_transport import SharedBuffer, client_value, release, summarize_value
+from run_checkpoint import CheckpointStore, RunCheckpoint, args_digest, restorable_nodes
+from run_profile import RunProfile, RunProfileStore
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled", "interrupted")
+
+
+@dataclass
+class Run:
+    """One submitted graph execution."""
+    run_id: str
+    graph: ExecutionGraph
+    profile: RunProfile
+    status: str = "pending"  # pending, running, completed, failed, cancelled, interrupted
+    results: Dict[str, Any] = field(default_factory=dict)
+    cache_hits: List[str] = field(default_factory=list)
+    skipped: Dict[str, str] = field(default_factory=dict)  # make mode: node id -> reason
+    restored: List[str] = field(default_factory=list)  # nodes restored from an earlier attempt
+    source: Optional[Dict[str, Any]] = None  # {"nodes", "edges"} the graph was built from
+    checkpointed: bool = False
+    attempt: int = 1
+    prediction: Optional[Dict[str, Any]] = None  # SchedulePlan.to_dict() at submission
+    error: Optional[str] = None
+    error_status: Optional[int] = None
+    error_node: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    task: Optional[asyncio.Task] = None
+    writes: List[asyncio.Future] = field(default_factory=list)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def client_results(self) -> Dict[str, Any]:
+        """Results as sent to clients: small JSON values inline, everything else summarised."""
+        return {node_id: client_value(value) for node_id, value in self.results.items()}
+
+    def to_dict(self, include_results: bool = True) -> Dict[str, Any]:
+        run = {
+            "run_id": self.run_id,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+            "nodes": {node.node_id: node.status for node in self.profile.nodes.values()},
+            "cache_hits": self.cache_hits,
+            "skipped": self.skipped,
+            "restored": self.restored,
+            "prediction": self.prediction,
+            "attempt": self.attempt,
+            "resumable": self.checkpointed and self.finished and self.status != "completed",
+        }
+        if self.error is not None:
+            run.update(error=self.error, node_id=self.error_node)
+        if include_results:
+            run["results"] = self.client_results()
+        return run
+
+
+class RunManager:
+    """Runs graphs in the background and broadcasts their progress."""
+
+    def __init__(self, scheduler: GraphScheduler, broadcast: Callable[[Dict[str, Any]], Awaitable[None]],
+                 profiles: Optional[RunProfileStore] = None, store: Optional[ResultStore] = None,
+                 max_runs: int = 100, checkpoints: Optional[CheckpointStore] = None):
+        self.scheduler = scheduler
+        self.broadcast = broadcast
+        self.store = store
+        # Checkpointed outputs are the run's entries in the result store
+        self.checkpoints = checkpoints if store is not None else None
+        self.profiles = profiles if profiles is not None else RunProfileStore(max_runs)
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, Run]" = OrderedDict()
+        self._pinned: Set[str] = set()  # runs whose stored results are kept for a resume
+        if self.checkpoints is not None:
+            self._recover()
+
+    def submit(self, graph: ExecutionGraph, use_cache: bool = True, make: Optional[str] = None,
+               plan: Optional[SchedulePlan] = None, source: Optional[Dict[str, Any]] = None) -> Run:
+        """Start executing the graph in the background; must be called on the event loop.
+
+        make ("mtime" or "hash") skips nodes whose data folders are up to date;
+        a plan (GraphScheduler.plan) gives the run its predicted completion time.
+        source, the {"nodes", "edges"} payload of the graph, makes the run resumable.
+        """
+        run_id = uuid.uuid4().hex[:12]
+        run = Run(run_id=run_id, graph=graph, profile=self.profiles.add(RunProfile(run_id=run_id)))
+        if plan is not None:
+            run.prediction = plan.to_dict(run.submitted_at)
+        if source is not None and self.checkpoints is not None:
+            run.source = copy.deepcopy(source)  # Session graphs keep changing while the run executes
+        self._start(run, use_cache, make)
+        return run
+
+    def _start(self, run: Run, use_cache: bool, make: Optional[str], resume: Optional[RunCheckpoint] = None):
+        self._runs[run.run_id] = run
+        self._runs.move_to_end(run.run_id)
+        if self.store is not None:
+            self.store.retain_run(run.run_id)
+        self._evict()
+        run.task = asyncio.ensure_future(self._execute(run, use_cache, make, resume))
+        run.task.add_done_callback(lambda task: self._on_done(run, task))
+
+    async def resume(self, run_id: str) -> Run:
+        """Start a failed, cancelled or interrupted run again, restoring the nodes that completed.
+
+        Raises GraphExecutionError (404 without a checkpoint, 409 while the run is active or once it completed).
+        """
+        if self.checkpoints is None:
+            raise GraphExecutionError("Run checkpoints are disabled", status=404)
+        try:
+            checkpoint = await asyncio.to_thread(self.checkpoints.load, run_id)
+        except ValueError as e:
+            raise GraphExecutionError(str(e))
+        current = self._runs.get(run_id)
+        if current is not None and not current.finished:
+            raise GraphExecutionError(f"Run '{run_id}' is still {current.status}", status=409)
+        if checkpoint is None:
+            if current is not None and current.status == "completed":
+                raise GraphExecutionError(f"Run '{run_id}' already completed", status=409)
+            raise GraphExecutionError(f"No checkpoint for run '{run_id}'", status=404)
+
+        run = Run(run_id=run_id, graph=ExecutionGraph.from_payload(checkpoint.nodes, checkpoint.edges),
+                  profile=self.profiles.add(RunProfile(run_id=run_id)), attempt=checkpoint.attempts + 1,
+                  source={"nodes": checkpoint.nodes, "edges": checkpoint.edges})
+        self._start(run, checkpoint.options.get("cache", True), checkpoint.options.get("make"), checkpoint)
+        return run
+
+    def _recover(self):
+        """Pick up the checkpoints left on disk: drop expired ones, list the others as resumable runs."""
+        for run_id in self.checkpoints.run_ids():
+            try:
+                checkpoint = self.checkpoints.load(run_id)
+                if checkpoint is None or checkpoint.status == "completed" or self.checkpoints.expired(checkpoint):
+                    self.checkpoints.delete(run_id)
+                    continue
+                if checkpoint.status == "running":
+                    # The server stopped while the run executed
+                    checkpoint.status = "interrupted"
+                    self.checkpoints.status(run_id, "interrupted", "The server stopped during the run")
+                graph = ExecutionGraph.from_payload(checkpoint.nodes, checkpoint.edges)
+            except (OSError, ValueError, KeyError, GraphExecutionError) as e:
+                print(f"Ignoring unreadable run checkpoint {run_id}: {e}")
+                continue
+            run = Run(run_id=run_id, graph=graph, profile=RunProfile(run_id=run_id, started_at=checkpoint.created_at),
+                      status=checkpoint.status, error=checkpoint.error, error_node=checkpoint.error_node,
+                      submitted_at=checkpoint.created_at, finished_at=checkpoint.updated_at,
+                      checkpointed=True, attempt=checkpoint.attempts)
+            for node_id, state in checkpoint.node_states.items():
+                if node_id in graph.tasks:
+                    task = graph.tasks[node_id]
+                    node = run.profile.node(node_id, task.func_name, task.executor)
+                    node.status, node.error = state["status"], state.get("error")
+            self._runs[run_id] = run
+            self._pin(run_id)
+
+    def _pin(self, run_id: str):
+        if run_id not in self._pinned:
+            self._pinned.add(run_id)
+            self.store.retain_run(run_id)
+
+    def _unpin(self, run_id: str):
+        if run_id in self._pinned:
+            self._pinned.discard(run_id)
+            self.store.release_run(run_id)
+
+    def _checkpoint(self, run: Run, method: str, *args):
+        """Append to the run's checkpoint off the event loop; finishing the run waits for it."""
+        async def write():
+            try:
+                await asyncio.to_thread(getattr(self.checkpoints, method), run.run_id, *args)
+            except (OSError, ValueError) as e:
+                print(f"Could not update the checkpoint of run {run.run_id}: {e}")
+        run.writes.append(asyncio.ensure_future(write()))
+
+    async def _close_checkpoint(self, run: Run):
+        """Record how the run ended: a completed run needs its checkpoint no more, others keep it."""
+        if not run.checkpointed:
+            return
+        try:
+            if run.status == "completed":
+                await asyncio.to_thread(self.checkpoints.delete, run.run_id)
+                self._unpin(run.run_id)
+            else:
+                await asyncio.to_thread(self.checkpoints.status, run.run_id, run.status, run.error, run.error_node)
+        except OSError as e:
+            print(f"Could not update the checkpoint of run {run.run_id}: {e}")
+
+    def _restore_results(self, run: Run, checkpoint: RunCheckpoint) -> Dict[str, Any]:
+        """Stored results of the nodes a resumed run does not need to execute again."""
+        stored = {entry.node_id for entry in self.store.nodes(run.run_id)}
+        candidates = restorable_nodes(run.graph, checkpoint, stored)
+        values = {}
+        for node_id in candidates:
+            try:
+                values[node_id] = self.store.load(self.store.get(run.run_id, node_id))
+            except Exception as e:
+                print(f"Cannot restore node {node_id} of run {run.run_id}, running it again: {e}")
+        if len(values) < len(candidates):
+            # Nodes downstream of one that could not be loaded run again as well
+            keep = restorable_nodes(run.graph, checkpoint, set(values))
+            values = {node_id: value for node_id, value in values.items() if node_id in keep}
+        return values
+
+    def _evict(self):
+        # Only finished runs are forgotten; active ones stay reachable for cancel()
+        for run_id in list(self._runs):
+            if len(self._runs) <= self.max_runs:
+                break
+            if self._runs[run_id].finished:
+                del self._runs[run_id]
+
+    async def _node_event(self, run: Run, event: str, task: NodeTask, info: Dict[str, Any]):
+        node_profile = info["profile"]
+        message = {"type": event, "run_id": run.run_id, "node_id": task.node_id, "func_name": task.func_name}
+        if event == "node_started":
+            message["executor"] = task.executor
+        elif event == "node_progress":
+            message.update(done=info["done"], total=info["total"])
+        elif event == "node_retrying":
+            message.update(attempt=info["attempt"], error=info["error"], delay=info["delay"])
+        elif event == "node_finished" and node_profile.status == "skipped":
+            message.update(cached=False, skipped=node_profile.freshness)
+        elif event == "node_finished" and node_profile.status == "restored":
+            message.update(cached=False, restored=True, summary=summarize_value(info["result"]))
+        elif event == "node_finished":
+            if self.store is not None:
+                run.writes.append(asyncio.ensure_future(self._store_result(run, task, info["result"],
+                                                                           node_profile.status)))
+            message.update(
+                cached=node_profile.cache_hit,
+                wall_time=node_profile.wall_time,
+                cpu_time=node_profile.cpu_time,
+                summary=summarize_value(info["result"]),
+            )
+        elif event == "node_failed":
+            message["error"] = info["error"]
+            if run.checkpointed:
+                self._checkpoint(run, "node", task.node_id, "failed", task.source_hash, args_digest(task.args),
+                                 info["error"])
+        await self.broadcast(message)
+
+    async def _store_result(self, run: Run, task: NodeTask, value: Any, status: str):
+        try:
+            await asyncio.to_thread(self.store.put, run.run_id, task.node_id, value)
+        except Exception as e:
+            print(f"Could not store result of node {task.node_id} (run {run.run_id}): {e}")
+            return
+        # Only a stored output makes the node restorable
+        if run.checkpointed:
+            try:
+                await asyncio.to_thread(self.checkpoints.node, run.run_id, task.node_id, status, task.source_hash,
+                                        args_digest(task.args))
+            except (OSError, ValueError) as e:
+                print(f"Could not update the checkpoint of run {run.run_id}: {e}")
+
+    async def _finish(self, run: Run, owned: List[SharedBuffer]):
+        """Wait for pending store and checkpoint writes, then free the run's shared buffers."""
+        while run.writes:
+            writes, run.writes = run.writes, []
+            await asyncio.gather(*writes, return_exceptions=True)
+        if owned:
+            await asyncio.to_thread(release, owned)
+        if self.store is not None:
+            self.store.release_run(run.run_id)
+
+    async def _open_checkpoint(self, run: Run, use_cache: bool, make: Optional[str],
+                               resume: Optional[RunCheckpoint]):
+        try:
+            if resume is None:
+                await asyncio.to_thread(self.checkpoints.create, run.run_id, run.source["nodes"],
+                                        run.source["edges"], {"cache": use_cache, "make": make})
+            await asyncio.to_thread(self.checkpoints.status, run.run_id, "running")
+        except (OSError, ValueError) as e:
+            print(f"Run {run.run_id} is not checkpointed: {e}")
+            return
+        run.checkpointed = True
+        self._pin(run.run_id)
+
+    async def _execute(self, run: Run, use_cache: bool, make: Optional[str] = None,
+                       resume: Optional[RunCheckpoint] = None):
+        run.status = "running"
+        owned: List[SharedBuffer] = []
+        try:
+            if run.source is not None:
+                await self._open_checkpoint(run, use_cache, make, resume)
+            await self.broadcast({"type": "run_started", "run_id": run.run_id, "nodes": run.graph.order,
+                                  "prediction": run.prediction, "attempt": run.attempt})
+            if not run.graph.resolved:  # Submitted graphs are resolved before they are accepted
+                await asyncio.to_thread(run.graph.resolve_functions)
+            restored = None
+            if resume is not None and run.checkpointed:
+                restored = await asyncio.to_thread(self._restore_results, run, resume)
+            report = await self.scheduler.run(
+                run.graph, use_cache=use_cache, profile=run.profile,
+                listener=lambda event, task, info: self._node_event(run, event, task, info),
+                owned=owned, make=make, restored=restored, keep_going=run.checkpointed,
+            )
+        except asyncio.CancelledError:
+            await self._finish(run, owned)
+            await self._cancelled(run)
+            return
+        except GraphExecutionError as e:
+            await self._finish(run, owned)
+            run.status, run.finished_at = "failed", time.time()
+            run.error, run.error_status, run.error_node = str(e), e.status, e.node_id
+            await self._close_checkpoint(run)
+            await self.broadcast({"type": "run_failed", "run_id": run.run_id, "error": run.error, "node_id": e.node_id})
+            return
+        except Exception as e:
+            await self._finish(run, owned)
+            run.status, run.finished_at = "failed", time.time()
+            run.error, run.error_status = str(e), 500
+            await self._close_checkpoint(run)
+            await self.broadcast({"type": "run_failed", "run_id": run.run_id, "error": run.error, "node_id": None})
+            return
+
+        await self._finish(run, owned)
+        # Only the inline form is kept in memory; full results live in the store
+        run.results = {node_id: client_value(value) for node_id, value in report.results.items()}
+        run.cache_hits = report.cache_hits
+        run.skipped = report.skipped
+        run.restored = report.restored
+        run.status, run.finished_at = "completed", time.time()
+        await self._close_checkpoint(run)
+        await self.broadcast({
+            "type": "run_finished", "run_id": run.run_id,
+            "results": run.client_results(), "cache_hits": run.cache_hits, "skipped": run.skipped,
+        })
+
+    async def _cancelled(self, run: Run):
+        run.status, run.finished_at = "cancelled", time.time()
+        await self._close_checkpoint(run)
+        cancelled = [node.node_id for node in run.profile.nodes.values() if node.status == "cancelled"]
+        await self.broadcast({"type": "run_cancelled", "run_id": run.run_id, "cancelled_nodes": cancelled})
+
+    def _on_done(self, run: Run, task: asyncio.Task):
+        # A run cancelled before its coroutine started never reaches _execute's handler
+        if task.cancelled() and not run.finished:
+            if self.store is not None:
+                self.store.release_run(run.run_id)
+            asyncio.ensure_future(self._cancelled(run))
+
+    def get(self, run_id: str) -> Optional[Run]:
+        return self._runs.get(run_id)
+
+    @property
+    def runs(self) -> List[Run]:
+        return list(self._runs.values())
+
+    def cancel(self, run_id: str) -> Optional[Run]:
+        """Request cancellation; returns the run, or None if it is unknown."""
+        run = self._runs.get(run_id)
+        if run is not None and not run.finished and run.task is not None:
+            run.task.cancel()
+        return run
+
+    async def wait(self, run: Run) -> Run:
+        """Wait until the run has finished; cancelling the waiter does not cancel the run."""
+        if run.task is not None:
+            await asyncio.wait([run.task])
+        return run
+
+    async def shutdown(self):
+        active = [run.task for run in self._runs.values() if run.task is not None and not run.task.done()]
+        for task in active:
+            task.cancel()
+        if active:
+            await asyncio.gather(*active, return_exceptions=True)
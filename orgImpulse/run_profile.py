@@ -0,0 +1,254 @@
+"""
+Run Profiling
+=============
+Per-node execution metrics and a timeline for every graph run.
+
+Each node execution is measured inside the worker that runs it:
+- wall and CPU time (thread CPU time for thread-pool nodes)
+- growth of the worker's RSS while the node ran (the larger of the peak RSS
+  growth and the RSS sampled every RSS_SAMPLE_INTERVAL, as workers are reused
+  and their peak is often already above what a node needs)
+- bytes read and written (psutil io counters, where the platform has them)
+- time spent queued between becoming ready and starting
+- optionally (node["data"]["profile"] = True) a cProfile summary of the hottest
+  functions
+
+RunProfile collects these per run and exports them as JSON or as a Chrome
+trace (load it in chrome://tracing or https://ui.perfetto.dev).
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psutil
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CPROFILE_TOP_N = 30
+RSS_SAMPLE_INTERVAL = 0.05
+
+
+def _peak_rss() -> int:
+    """Peak resident set size of this process in bytes."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    return psutil.Process().memory_info().rss
+
+
+class _RssSampler:
+    """Largest RSS of this process seen by a background thread between start() and stop().
+
+    One sampler per worker process, its thread started on first use.
+    """
+
+    def __init__(self):
+        self.process = psutil.Process()
+        self.start_rss = self.peak = 0
+        self.active = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        # Polls rather than waking on start(), so nodes shorter than the interval never contend with it
+        while True:
+            time.sleep(RSS_SAMPLE_INTERVAL)
+            if self.active:
+                try:
+                    self.peak = max(self.peak, self.process.memory_info().rss)
+                except psutil.Error:
+                    return
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        self.start_rss = self.peak = self.process.memory_info().rss
+        self.active = True
+
+    def stop(self) -> int:
+        """RSS growth since start()."""
+        self.active = False
+        self.peak = max(self.peak, self.process.memory_info().rss)
+        return max(0, self.peak - self.start_rss)
+
+
+_rss_sampler: Optional[_RssSampler] = None
+
+
+def _io_counters(process: psutil.Process) -> Tuple[Optional[int], Optional[int]]:
+    try:
+        counters = process.io_counters()
+        return counters.read_bytes, counters.write_bytes
+    except (AttributeError, psutil.Error, OSError):
+        return None, None
+
+
+def _cprofile_summary(profiler: cProfile.Profile) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, lineno, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{name} ({os.path.basename(filename)}:{lineno})",
+            "calls": ncalls,
+            "total_time": round(tottime, 6),
+            "cumulative_time": round(cumtime, 6),
+        })
+    rows.sort(key=lambda row: row["cumulative_time"], reverse=True)
+    return rows[:CPROFILE_TOP_N]
+
+
+def measure_call(func: Callable, args: List[Any], per_thread: bool = False,
+                 profile: bool = False) -> Tuple[Any, Dict[str, Any]]:
+    """Call func(*args) and return (result, metrics) measured in the current worker."""
+    process = psutil.Process()
+    cpu_clock = time.thread_time if per_thread else time.process_time
+    read_before, write_before = _io_counters(process)
+    rss_before = _peak_rss()
+    profiler = cProfile.Profile() if profile else None
+    # Threads share the server's RSS, so sampling it would not tell much about the node
+    global _rss_sampler
+    if not per_thread and _rss_sampler is None:
+        _rss_sampler = _RssSampler()
+    sampler = _rss_sampler if not per_thread else None
+
+    started_at = time.time()
+    wall_start = time.perf_counter()
+    cpu_start = cpu_clock()
+    if sampler:
+        sampler.start()
+    try:
+        if profiler:
+            result = profiler.runcall(func, *args)
+        else:
+            result = func(*args)
+    finally:
+        rss_growth = sampler.stop() if sampler else 0
+    cpu_time = cpu_clock() - cpu_start
+    wall_time = time.perf_counter() - wall_start
+
+    read_after, write_after = _io_counters(process)
+    metrics = {
+        "started_at": started_at,
+        "wall_time": wall_time,
+        "cpu_time": cpu_time,
+        "peak_rss_delta": max(_peak_rss() - rss_before, rss_growth, 0),
+        "read_bytes": read_after - read_before if read_before is not None else None,
+        "write_bytes": write_after - write_before if write_before is not None else None,
+        "worker_pid": os.getpid(),
+        "worker_thread": threading.get_ident(),
+    }
+    if profiler:
+        metrics["cprofile"] = _cprofile_summary(profiler)
+    return result, metrics
+
+
+@dataclass
+class NodeProfile:
+    """Metrics for one node of a run."""
+    node_id: str
+    func_name: str
+    executor: str
+    status: str = "pending"  # pending, running, retrying, completed, cached, skipped, restored, failed, cancelled
+    queued_at: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    queue_wait: Optional[float] = None
+    wall_time: Optional[float] = None
+    cpu_time: Optional[float] = None
+    peak_rss_delta: Optional[int] = None
+    read_bytes: Optional[int] = None
+    write_bytes: Optional[int] = None
+    worker_pid: Optional[int] = None
+    worker_thread: Optional[int] = None
+    cache_hit: bool = False
+    error: Optional[str] = None
+    cprofile: Optional[List[Dict[str, Any]]] = None
+    shards: Optional[Dict[str, int]] = None  # map nodes: total, cached, completed, retried items
+    retries: int = 0  # attempts that failed and were retried
+    result_bytes: Optional[int] = None  # size of array and bytes results
+    memory_budget: Optional[int] = None  # bytes the node was admitted with (declared or learned)
+    freshness: Optional[str] = None  # make mode: why the node was skipped or had to run
+
+    def record(self, metrics: Dict[str, Any]):
+        for key, value in metrics.items():
+            setattr(self, key, value)
+        self.finished_at = self.started_at + self.wall_time
+        self.queue_wait = max(0.0, self.started_at - self.queued_at) if self.queued_at else None
+
+
+@dataclass
+class RunProfile:
+    """Timeline of one graph run."""
+    run_id: str
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    nodes: Dict[str, NodeProfile] = field(default_factory=dict)
+
+    def node(self, node_id: str, func_name: str, executor: str) -> NodeProfile:
+        if node_id not in self.nodes:
+            self.nodes[node_id] = NodeProfile(node_id=node_id, func_name=func_name, executor=executor)
+        return self.nodes[node_id]
+
+    def to_dict(self) -> Dict[str, Any]:
+        finished = self.finished_at or time.time()
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "wall_time": finished - self.started_at,
+            "nodes": [asdict(node) for node in self.nodes.values()],
+        }
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Chrome trace event format: one lane per worker, queue waits on their own lane."""
+        events = []
+        to_us = lambda t: int((t - self.started_at) * 1e6)
+        for node in self.nodes.values():
+            if node.started_at is None:
+                continue
+            args = {key: value for key, value in asdict(node).items()
+                    if key not in ("cprofile",) and value is not None}
+            pid = node.worker_pid or 0
+            tid = node.worker_thread or 0
+            if node.queue_wait:
+                events.append({
+                    "name": f"queued {node.func_name}", "cat": "queue", "ph": "X",
+                    "ts": to_us(node.queued_at), "dur": int(node.queue_wait * 1e6),
+                    "pid": 0, "tid": node.node_id, "args": {"node_id": node.node_id},
+                })
+            events.append({
+                "name": node.func_name, "cat": node.status, "ph": "X",
+                "ts": to_us(node.started_at),
+                "dur": int(((node.finished_at or node.started_at) - node.started_at) * 1e6),
+                "pid": pid, "tid": tid, "args": args,
+            })
+        events.append({"name": "process_name", "ph": "M", "pid": 0, "args": {"name": "scheduler queue"}})
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"run_id": self.run_id}}
+
+
+class RunProfileStore:
+    """Keeps the profiles of the most recent runs in memory."""
+
+    def __init__(self, max_runs: int = 100):
+        self.max_runs = max_runs
+        self._profiles: "OrderedDict[str, RunProfile]" = OrderedDict()
+
+    def add(self, profile: RunProfile) -> RunProfile:
+        self._profiles[profile.run_id] = profile
+        while len(self._profiles) > self.max_runs:
+            self._profiles.popitem(last=False)
+        return profile
+
+    def get(self, run_id: str) -> Optional[RunProfile]:
+        return self._profiles.get(run_id)
@@ -1,463 +1,437 @@
 # server.py
-import tkinter as tk
-from tkinter import filedialog
 from sanic import Sanic
 from sanic.response import json as sanic_json  # Rename to avoid conflict
+from sanic.response import raw
 from sanic_cors import CORS
 import json as json_module  # Rename json module import
 import os
 import inspect  # Add import for inspect module
-import ast  # Add import for ast module
-import psutil  # For CPU and RAM monitoring
-import platform  # For system detection
-import subprocess  # For GPU monitoring commands
-from function_analyzer import FunctionAnalyzer, analyze_folder
+import asyncio
+from dataclasses import asdict
+from broadcaster import Broadcaster
+from analysis_cache import FolderAnalysisCache
+from data_manifest import MAKE_MODES, open_manifest_store
+from folder_watcher import FolderWatcher
+from graph_scheduler import ExecutionGraph, GraphExecutionError, GraphScheduler
+from graph_sync import GraphSessions
+from module_cache import get_function_index
+from pipeline_compiler import compile_pipeline
+from result_cache import open_result_cache
+from run_checkpoint import open_checkpoint_store
+from run_history import open_run_history
+from result_store import (ResultNotFound, iter_file, iter_npy, open_result_store, parse_range,
+                          parse_slice, read_page, read_slice)
+from resource_monitor import ResourceMonitor
+from run_manager import RunManager
+from run_profile import RunProfileStore
+from symbol_index import MAX_SEARCH_LIMIT, SEARCH_LIMIT, SymbolIndexRefresher, open_symbol_index
 
 app = Sanic("NodePythonExecutor")
 CORS(app)
 
-clients = []
-
-def get_functions_and_variables(file_path):
-    with open(file_path, "r") as file:
-        file_content = file.read()
-    
-    tree = ast.parse(file_content)
-    functions = {}
-    
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            func_name = node.name
-            param_names = [arg.arg for arg in node.args.args]
-            functions[func_name] = param_names
-    
-    return functions
+# Per-client bounded outbound queues; a slow or dead websocket never stalls the others
+broadcaster = Broadcaster(
+    max_queue=int(os.environ.get("NCPIPE_WS_QUEUE", 256)),
+    send_timeout=float(os.environ.get("NCPIPE_WS_SEND_TIMEOUT", 10.0)),
+    heartbeat_interval=float(os.environ.get("NCPIPE_WS_HEARTBEAT", 15.0)),
+    heartbeat_timeout=float(os.environ.get("NCPIPE_WS_HEARTBEAT_TIMEOUT", 10.0)),
+)
+
+# Full node/edge payloads are only printed with NCPIPE_LOG_GRAPH=1
+LOG_GRAPH_PAYLOADS = os.environ.get("NCPIPE_LOG_GRAPH", "") not in ("", "0")
+
+# Authoritative canvas graph per client session, kept in sync by patches over /realtime-updates
+graph_sessions = GraphSessions()
+GRAPH_SYNC_TYPES = ("graph_hello", "graph_patch", "graph_snapshot", "graph_resync", "graph_update")
+
+async def broadcast(message):
+    """Queue a JSON message for every interested websocket client (does not wait for delivery)."""
+    broadcaster.publish(message)
+
+# Background sampler behind /system-resources
+resource_monitor = ResourceMonitor(
+    interval=float(os.environ.get("NCPIPE_MONITOR_INTERVAL", 2.0)),
+    history_size=int(os.environ.get("NCPIPE_MONITOR_HISTORY", 300)),
+)
+
+# Worker pools for graph execution (sizes can be overridden through the environment)
+scheduler = GraphScheduler(
+    max_workers=int(os.environ.get("NCPIPE_PROCESS_WORKERS", 0)) or None,
+    thread_workers=int(os.environ.get("NCPIPE_THREAD_WORKERS", 0)) or None,
+    result_cache=open_result_cache(),
+    manifest_store=open_manifest_store(),
+    # Past node durations drive critical-path priorities and run predictions
+    history=open_run_history(),
+)
+
+# Timelines of recent runs, served by /runs/<run_id>/profile
+run_profiles = RunProfileStore()
+
+# Node results are kept on disk and fetched through /runs/<run_id>/results/<node_id>
+result_store = open_result_store()
+
+# Graph executions run as background jobs and stream their progress over /realtime-updates;
+# checkpoints (NCPIPE_CHECKPOINT_DIR) let failed or interrupted runs resume through /runs/<run_id>/resume
+run_manager = RunManager(scheduler, broadcast, run_profiles, result_store, checkpoints=open_checkpoint_store())
+
+# Largest array slice or page returned as JSON; bigger selections must use format=npy or raw
+RESULT_JSON_MAX_BYTES = int(os.environ.get("NCPIPE_RESULT_JSON_MAX_BYTES", 16 * 1024 * 1024))
+
+# Incremental per-folder analysis; set NCPIPE_ANALYSIS_DIR="" to disable the on-disk snapshot
+analysis_cache = FolderAnalysisCache(
+    snapshot_dir=os.environ.get(
+        "NCPIPE_ANALYSIS_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ncpipe", "analysis")
+    ) or None,
+    workers=int(os.environ.get("NCPIPE_ANALYSIS_WORKERS", 0)) or None,
+)
+
+# Pushes function add/remove/modify deltas for folders listed through /list-files
+watcher = FolderWatcher(
+    analysis_cache, broadcaster, interval=float(os.environ.get("NCPIPE_WATCH_INTERVAL", 1.0))
+)
+
+# Persistent function index of every registered folder behind /symbols/search (NCPIPE_SYMBOL_DB)
+symbol_index = open_symbol_index(workers=int(os.environ.get("NCPIPE_ANALYSIS_WORKERS", 0)) or None)
+symbol_refresher = SymbolIndexRefresher(
+    symbol_index, interval=float(os.environ.get("NCPIPE_SYMBOL_INTERVAL", 5.0))
+) if symbol_index else None
+
+def register_symbol_folder(folder_path, recursive=False):
+    """Index a folder from now on; a new folder is indexed in the background right away."""
+    if symbol_index and symbol_index.register(folder_path, recursive):
+        symbol_refresher.request()
+
+def page_params(args, default_limit=SEARCH_LIMIT):
+    """(offset, limit) from query or body parameters."""
+    offset, limit = int(args.get("offset", 0)), int(args.get("limit", default_limit))
+    if offset < 0 or not 0 < limit <= MAX_SEARCH_LIMIT:
+        raise ValueError(f"offset must be >= 0 and limit between 1 and {MAX_SEARCH_LIMIT}")
+    return offset, limit
+
+async def sync_graph(connection, queue):
+    """Apply graph sync messages in bursts: everything queued is applied, then acked once."""
+    while True:
+        messages = [await queue.get()]
+        while not queue.empty():
+            messages.append(queue.get_nowait())
+        if LOG_GRAPH_PAYLOADS:
+            for message in messages:
+                print("Received graph sync message:", message, flush=True)
+        for reply in graph_sessions.handle(messages):
+            broadcaster.send_to(connection, reply)
 
 @app.websocket("/realtime-updates")
 async def realtime_updates(request, ws):
-    clients.append(ws)
+    connection = broadcaster.register(ws)
+    broadcaster.send_to(connection, {"type": "connected", "client_id": connection.client_id})
+    sync_queue = asyncio.Queue()
+    sync_task = asyncio.ensure_future(sync_graph(connection, sync_queue))
     try:
         while True:
             data = await ws.recv()
+            if data is None:
+                break
             message = json_module.loads(data)
-            if message.get("type") == "graph_update":
-                nodes = message["data"]["nodes"]
-                edges = message["data"]["edges"]
-                print("Received nodes:", nodes, flush=True)
-                print("Received edges:", edges, flush=True)
-            else:
+            if message.get("type") == "unwatch_folder":
+                watcher.unwatch(message.get("folder_path", ""), connection.client_id)
+            elif message.get("type") == "subscribe":
+                # "runs": [ids] follows those runs only (plus runs submitted with this client_id), "*" follows all
+                broadcaster.subscribe(connection, message.get("runs", []))
+            elif message.get("type") == "unsubscribe":
+                broadcaster.unsubscribe(connection, message.get("runs", []))
+            elif message.get("type") in GRAPH_SYNC_TYPES:
+                sync_queue.put_nowait(message)
+            elif LOG_GRAPH_PAYLOADS:
                 print("Received data from client:", data, flush=True)
     except Exception as e:
         print("WebSocket error:", e)
     finally:
-        clients.remove(ws)
-
-def get_gpu_usage():
-    """Get GPU usage percentage for different GPU types"""
-    try:
-        system = platform.system()
-        
-        if system == "Darwin":  # macOS
-            if platform.machine() == "arm64":  # Apple Silicon
-                try:
-                    # Try powermetrics without sudo first
-                    result = subprocess.run(
-                        ["powermetrics", "--samplers", "gpu_power", "-i", "100", "-n", "1"],
-                        capture_output=True, text=True, timeout=10
-                    )
-                    if result.returncode == 0:
-                        # Parse powermetrics output for GPU usage
-                        for line in result.stdout.split('\n'):
-                            if ('GPU Busy' in line or 'GPU Active' in line) and '%' in line:
-                                import re
-                                match = re.search(r'(\d+\.?\d*)%', line)
-                                if match:
-                                    return float(match.group(1))
-                    
-                    return 0  # Return 0 if not found or command fails
-                except (FileNotFoundError, Exception) as e:
-                    print(f"Apple Silicon GPU monitoring error with powermetrics: {e}")
-                    return 0
-            else:
-                # Intel Macs - try system_profiler for basic GPU info
-                try:
-                    result = subprocess.run(
-                        ["system_profiler", "SPDisplaysDataType"],
-                        capture_output=True, text=True, timeout=5
-                    )
-                    # Intel Macs don't provide easy GPU utilization access
-                    return 0
-                except Exception:
-                    return 0
-                
-        elif system == "Linux":
-            # Try NVIDIA first
-            try:
-                result = subprocess.run(
-                    ["nvidia-smi", "--query-gpu=utilization.gpu", "--format=csv,noheader,nounits"],
-                    capture_output=True, text=True, timeout=5, check=True
-                )
-                return float(result.stdout.strip().split('\n')[0])
-            except (FileNotFoundError, subprocess.CalledProcessError, Exception) as e:
-                if not isinstance(e, FileNotFoundError):
-                    print(f"NVIDIA GPU monitoring error: {e}")
-
-            # Try AMD GPU with radeontop
-            try:
-                result = subprocess.run(
-                    ["radeontop", "-d", "-", "-l", "1"],
-                    capture_output=True, text=True, timeout=5, check=True
-                )
-                # Parse radeontop output for GPU usage
-                for line in result.stdout.split('\n'):
-                    if 'gpu' in line.lower() and '%' in line:
-                        import re
-                        match = re.search(r'(\d+\.?\d*)%', line)
-                        if match:
-                            return float(match.group(1))
-            except (FileNotFoundError, subprocess.CalledProcessError, Exception) as e:
-                if not isinstance(e, FileNotFoundError):
-                    print(f"AMD GPU monitoring error: {e}")
-
-            # Try Intel GPU on Linux
-            try:
-                result = subprocess.run(
-                    ["intel_gpu_top", "-s", "1000", "-n", "1"],
-                    capture_output=True, text=True, timeout=5, check=True
-                )
-                for line in result.stdout.split('\n'):
-                    if 'Render/3D' in line and '%' in line:
-                        import re
-                        match = re.search(r'(\d+\.?\d*)%', line)
-                        if match:
-                            return float(match.group(1))
-            except (FileNotFoundError, subprocess.CalledProcessError, Exception) as e:
-                if not isinstance(e, FileNotFoundError):
-                    print(f"Intel GPU monitoring error: {e}")
-                
-        elif system == "Windows":
-            # Windows GPU monitoring
-            try:
-                # Try nvidia-smi first
-                result = subprocess.run(
-                    ["nvidia-smi", "--query-gpu=utilization.gpu", "--format=csv,noheader,nounits"],
-                    capture_output=True, text=True, timeout=5, check=True
-                )
-                return float(result.stdout.strip().split('\n')[0])
-            except (FileNotFoundError, subprocess.CalledProcessError, Exception):
-                pass
-            
-            # Try wmic for basic GPU info (limited utilization data)
-            try:
-                result = subprocess.run(
-                    ["wmic", "path", "win32_videocontroller", "get", "name"],
-                    capture_output=True, text=True, timeout=5
-                )
-                # Windows doesn't provide easy GPU utilization via wmic
-                return 0
-            except Exception:
-                return 0
-                
-        # Fallback for other systems or if monitoring fails
-        return 0
-        
-    except Exception as e:
-        print(f"GPU monitoring error: {e}")
-        return 0
+        sync_task.cancel()
+        watcher.unwatch_client(connection.client_id)
+        broadcaster.unregister(ws)
 
-def get_system_resources():
-    """Get current system resource usage with detailed metrics"""
-    try:
-        # CPU usage - use longer interval for more accurate reading
-        cpu_percent = psutil.cpu_percent(interval=0.5)
-        
-        # Get per-core CPU usage for more detailed monitoring
-        cpu_per_core = psutil.cpu_percent(interval=0.1, percpu=True)
-        cpu_count = psutil.cpu_count()
-        cpu_count_logical = psutil.cpu_count(logical=True)
-        
-        # CPU frequency
-        try:
-            cpu_freq = psutil.cpu_freq()
-            cpu_freq_current = cpu_freq.current if cpu_freq else 0
-            cpu_freq_max = cpu_freq.max if cpu_freq else 0
-        except (AttributeError, OSError):
-            cpu_freq_current = 0
-            cpu_freq_max = 0
-        
-        # RAM usage with detailed breakdown
-        memory = psutil.virtual_memory()
-        ram_percent = memory.percent
-        ram_used_gb = memory.used / (1024**3)  # Convert to GB
-        ram_total_gb = memory.total / (1024**3)  # Convert to GB
-        ram_available_gb = memory.available / (1024**3)  # Convert to GB
-        
-        # Swap memory
-        swap = psutil.swap_memory()
-        swap_percent = swap.percent
-        swap_used_gb = swap.used / (1024**3)
-        swap_total_gb = swap.total / (1024**3)
-        
-        # Disk usage for the current directory
-        try:
-            disk_usage = psutil.disk_usage('/')
-            disk_percent = (disk_usage.used / disk_usage.total) * 100
-            disk_used_gb = disk_usage.used / (1024**3)
-            disk_total_gb = disk_usage.total / (1024**3)
-            disk_free_gb = disk_usage.free / (1024**3)
-        except Exception:
-            disk_percent = 0
-            disk_used_gb = 0
-            disk_total_gb = 0
-            disk_free_gb = 0
-        
-        # Network I/O
-        try:
-            net_io = psutil.net_io_counters()
-            net_sent_mb = net_io.bytes_sent / (1024**2)  # Convert to MB
-            net_recv_mb = net_io.bytes_recv / (1024**2)  # Convert to MB
-        except Exception:
-            net_sent_mb = 0
-            net_recv_mb = 0
-        
-        # Process count
-        try:
-            process_count = len(psutil.pids())
-        except Exception:
-            process_count = 0
-        
-        # Load average (Unix-like systems)
-        try:
-            if hasattr(os, 'getloadavg'):
-                load_avg = os.getloadavg()
-                load_1min, load_5min, load_15min = load_avg
-            else:
-                load_1min = load_5min = load_15min = 0
-        except Exception:
-            load_1min = load_5min = load_15min = 0
-        
-        # GPU usage
-        gpu_percent = get_gpu_usage()
-        
-        # System uptime
-        try:
-            boot_time = psutil.boot_time()
-            uptime_seconds = psutil.time.time() - boot_time
-            uptime_hours = uptime_seconds / 3600
-        except Exception:
-            uptime_hours = 0
-        
-        # Temperature monitoring (if available)
-        temperatures = {}
-        try:
-            if hasattr(psutil, 'sensors_temperatures'):
-                temp_sensors = psutil.sensors_temperatures()
-                for name, entries in temp_sensors.items():
-                    if entries:
-                        temperatures[name] = entries[0].current
-        except (AttributeError, Exception):
-            pass
-        
-        return {
-            # Primary metrics (for compatibility)
-            "cpu": round(cpu_percent, 1),
-            "ram": round(ram_percent, 1),
-            "gpu": round(gpu_percent, 1),
-            
-            # Detailed CPU metrics
-            "cpu_detailed": {
-                "percent": round(cpu_percent, 1),
-                "per_core": [round(core, 1) for core in cpu_per_core],
-                "count_physical": cpu_count,
-                "count_logical": cpu_count_logical,
-                "frequency_current": round(cpu_freq_current, 1),
-                "frequency_max": round(cpu_freq_max, 1),
-                "load_avg": {
-                    "1min": round(load_1min, 2),
-                    "5min": round(load_5min, 2),
-                    "15min": round(load_15min, 2)
-                }
-            },
-            
-            # Detailed RAM metrics
-            "ram_detailed": {
-                "percent": round(ram_percent, 1),
-                "used_gb": round(ram_used_gb, 2),
-                "total_gb": round(ram_total_gb, 2),
-                "available_gb": round(ram_available_gb, 2),
-                "swap_percent": round(swap_percent, 1),
-                "swap_used_gb": round(swap_used_gb, 2),
-                "swap_total_gb": round(swap_total_gb, 2)
-            },
-            
-            # Disk metrics
-            "disk": {
-                "percent": round(disk_percent, 1),
-                "used_gb": round(disk_used_gb, 2),
-                "total_gb": round(disk_total_gb, 2),
-                "free_gb": round(disk_free_gb, 2)
-            },
-            
-            # Network metrics
-            "network": {
-                "sent_mb": round(net_sent_mb, 2),
-                "received_mb": round(net_recv_mb, 2)
-            },
-            
-            # System metrics
-            "system": {
-                "process_count": process_count,
-                "uptime_hours": round(uptime_hours, 1),
-                "platform": platform.system(),
-                "architecture": platform.machine(),
-                "temperatures": temperatures
-            }
-        }
-    except Exception as e:
-        print(f"Resource monitoring error: {e}")
-        # Return fallback values
-        return {
-            "cpu": 0,
-            "ram": 0,
-            "gpu": 0,
-            "cpu_detailed": {"percent": 0, "per_core": [], "count_physical": 0, "count_logical": 0},
-            "ram_detailed": {"percent": 0, "used_gb": 0, "total_gb": 0, "available_gb": 0},
-            "disk": {"percent": 0, "used_gb": 0, "total_gb": 0, "free_gb": 0},
-            "network": {"sent_mb": 0, "received_mb": 0},
-            "system": {"process_count": 0, "uptime_hours": 0, "platform": "unknown", "architecture": "unknown"}
-        }
+@app.get("/realtime-clients")
+async def realtime_clients(request):
+    """Connected websocket clients with their queue depth, dropped messages and subscriptions."""
+    return sanic_json({"clients": broadcaster.stats()})
 
 @app.route("/system-resources", methods=["GET"])
 async def system_resources(request):
-    """Endpoint to get current system resource usage"""
-    resources = get_system_resources()
+    """Endpoint to get current system resource usage (latest background sample).
+
+    Optional query parameters: history_seconds and/or history_limit add a
+    "history" list of earlier samples, oldest first.
+    """
+    resources = resource_monitor.latest()
+    if resources is None:
+        # No sample yet (server just started): take one off the event loop
+        resources = await asyncio.to_thread(resource_monitor.sample)
+
+    seconds = request.args.get("history_seconds")
+    limit = request.args.get("history_limit")
+    if seconds is not None or limit is not None:
+        try:
+            history = resource_monitor.history(
+                seconds=float(seconds) if seconds is not None else None,
+                limit=int(limit) if limit is not None else None,
+            )
+        except ValueError:
+            return sanic_json({"error": "Invalid history window"}, status=400)
+        resources = {**resources, "history": history}
+
     return sanic_json(resources)
 
+def payload_nodes_edges(payload):
+    """The nodes and edges of a payload, or of the synced session graph it names."""
+    if payload.get("session"):
+        session = graph_sessions.get(str(payload["session"]))
+        if session is None:
+            raise GraphExecutionError(f"Unknown graph session '{payload['session']}'", status=404)
+        nodes, edges = session.nodes, session.edges
+    else:
+        nodes = payload.get("nodes", [])
+        edges = payload.get("edges", [])
+
+    if LOG_GRAPH_PAYLOADS:
+        print("Received nodes:", nodes, flush=True)
+        print("Received edges:", edges, flush=True)
+    return nodes, edges
+
+def payload_graph(payload):
+    """Dependency graph of a nodes/edges payload, or of a synced session graph."""
+    return ExecutionGraph.from_payload(*payload_nodes_edges(payload))
+
+def subscribe_client(payload, run):
+    # Subscribed before the run task gets to emit anything, so no event is missed
+    connection = broadcaster.get(str(payload.get("client_id") or ""))
+    if connection is not None and connection.runs is not None:
+        broadcaster.subscribe(connection, [run.run_id])
+
+async def submit_run(payload):
+    """Build and resolve the dependency graph of a payload, predict its duration and start running it."""
+    # Independent nodes run concurrently on the scheduler's worker pools
+    nodes, edges = payload_nodes_edges(payload)
+    graph = ExecutionGraph.from_payload(nodes, edges)
+    # "make": true (or "hash") skips nodes whose data folders are already up to date
+    make = payload.get("make") or None
+    make = "mtime" if make is True else make
+    if make is not None and make not in MAKE_MODES:
+        raise GraphExecutionError(f"Unknown make mode '{make}' (expected true or one of {', '.join(MAKE_MODES)})")
+    # Unknown functions, missing inputs and bad bindings are rejected here rather than as a failed run
+    await asyncio.to_thread(graph.resolve_functions)
+    plan = await asyncio.to_thread(scheduler.plan, graph)
+    run = run_manager.submit(graph, use_cache=payload.get("cache", True), make=make, plan=plan,
+                             source={"nodes": nodes, "edges": edges})
+    subscribe_client(payload, run)
+    return run
+
+@app.post("/runs")
+async def create_run(request):
+    """Submit a graph; returns its run id at once, progress arrives over /realtime-updates."""
+    try:
+        run = await submit_run(request.json)
+    except GraphExecutionError as e:
+        return sanic_json({"error": str(e)}, status=e.status)
+    return sanic_json({"run_id": run.run_id, "status": run.status, "prediction": run.prediction}, status=202)
+
+@app.get("/graph-sessions/<session_id>")
+async def get_graph_session(request, session_id):
+    """The server's copy of a synced canvas graph."""
+    session = graph_sessions.get(session_id)
+    if session is None:
+        return sanic_json({"error": f"Graph session '{session_id}' not found"}, status=404)
+    return sanic_json(session.snapshot())
+
+@app.get("/runs")
+async def list_runs(request):
+    return sanic_json({"runs": [run.to_dict(include_results=False) for run in run_manager.runs]})
+
+@app.get("/runs/<run_id>")
+async def get_run(request, run_id):
+    run = run_manager.get(run_id)
+    if run is None:
+        return sanic_json({"error": f"Run '{run_id}' not found"}, status=404)
+    return sanic_json(run.to_dict())
+
+@app.post("/runs/<run_id>/resume")
+async def resume_run(request, run_id):
+    """Run a failed, cancelled or interrupted run again; nodes that completed are restored, not re-executed."""
+    try:
+        run = await run_manager.resume(run_id)
+    except GraphExecutionError as e:
+        return sanic_json({"error": str(e)}, status=e.status)
+    subscribe_client(request.json or {}, run)
+    return sanic_json({"run_id": run.run_id, "status": run.status, "attempt": run.attempt}, status=202)
+
+@app.delete("/runs/<run_id>")
+async def cancel_run(request, run_id):
+    run = run_manager.cancel(run_id)
+    if run is None:
+        return sanic_json({"error": f"Run '{run_id}' not found"}, status=404)
+    if run.finished:
+        return sanic_json({"error": f"Run '{run_id}' already {run.status}", "status": run.status}, status=409)
+    return sanic_json({"run_id": run_id, "status": "cancelling"}, status=202)
+
 @app.post("/execute-graph")
 async def execute_graph(request):
-    nodes = request.json.get("nodes", [])
-    edges = request.json.get("edges", [])
-
-    # Print nodes and edges to the terminal
-    print("Received nodes:", nodes, flush=True)
-    print("Received edges:", edges, flush=True)
-
-    # Create a mapping of node IDs to their data
-    node_data = {node["id"]: node for node in nodes}
-
-    # Prepare execution order based on edges (simple topological sort)
-    execution_order = []
-    visited = set()
-
-    def visit(node_id):
-        if node_id in visited:
-            return
-        visited.add(node_id)
-        for edge in edges:
-            if edge["target"] == node_id:
-                visit(edge["source"])
-        execution_order.append(node_id)
-
-    for node in nodes:
-        visit(node["id"])
-
-    results = {}
-    for node_id in execution_order:
-        node = node_data[node_id]
-        func_name = node["data"].get("label")
-        inputs = node["data"].get("inputs", {})
-        folder_path = node["data"].get("folderPath")
-
-        if not folder_path or not os.path.isdir(folder_path):
-            return sanic_json({"error": "Invalid folder path"}, status=400)
-
-        # Fetch function from the file and parse its arguments
-        function_file = None
-        function_node = None
-        for filename in os.listdir(folder_path):
-            if filename.endswith(".py"):
-                full_path = os.path.join(folder_path, filename)
-                with open(full_path, "r") as file:
-                    file_content = file.read()
-                    tree = ast.parse(file_content)
-                    for n in ast.walk(tree):
-                        if isinstance(n, ast.FunctionDef) and n.name == func_name:
-                            function_file = full_path
-                            function_node = n
-                            break
-                if function_file:
-                    break
-
-        if not function_file or not function_node:
-            return sanic_json({"error": f"Function '{func_name}' not found"}, status=400)
-
-        # Get the parameter names from the function definition
-        param_names = [arg.arg for arg in function_node.args.args]
-
-        # Prepare arguments in the correct order
-        args = []
-        for param in param_names:
-            value = inputs.get(param)
-            if value is None:
-                return sanic_json({"error": f"Input '{param}' not provided for function '{func_name}'"}, status=400)
-            args.append(value)
-
-        # Load and execute the function
-        function_globals = {}
-        with open(function_file, "r") as file:
-            file_content = file.read()
-        exec(file_content, function_globals)
-
-        if func_name not in function_globals:
-            return sanic_json({"error": f"Function '{func_name}' not found in file"}, status=400)
-
-        func = function_globals[func_name]
-
-        # Execute the function and store result
-        try:
-            result = func(*args)
-            results[node_id] = result
-        except Exception as e:
-            return sanic_json({"error": str(e)}, status=500)
-
-    # Send real-time update to all connected clients
-    for client in clients:
-        await client.send(json_module.dumps({"results": results}))
-
-    return sanic_json({"results": results})
+    """Blocking variant of POST /runs: waits for the run and returns its results."""
+    try:
+        run = await submit_run(request.json)
+    except GraphExecutionError as e:
+        return sanic_json({"error": str(e)}, status=e.status)
+
+    await run_manager.wait(run)
+    if run.status != "completed":
+        return sanic_json({"error": run.error or f"Run {run.status}", "run_id": run.run_id},
+                          status=run.error_status or 409)
+    return sanic_json({"run_id": run.run_id, "results": run.client_results(), "cache_hits": run.cache_hits,
+                       "skipped": run.skipped})
+
+@app.post("/compile-graph")
+async def compile_graph(request):
+    """Compile a graph into a standalone runner script (parallel branches, caching, timings).
+
+    Body: the /execute-graph payload plus an optional "name" for the script.
+    """
+    payload = request.json or {}
+    name = os.path.basename(payload.get("name") or "pipeline.py")
+    try:
+        graph = payload_graph(payload)
+        await asyncio.to_thread(graph.resolve_functions)
+        folders = {task.folder_path for task in graph.tasks.values()}
+        # Folder reads/writes found by the analyzer order blocks the canvas leaves unconnected
+        analyzers = {folder: await asyncio.to_thread(analysis_cache.get_analyzer, folder) for folder in folders}
+        script = compile_pipeline(graph, analyzers, name)
+    except GraphExecutionError as e:
+        return sanic_json({"error": str(e), "node_id": e.node_id}, status=e.status)
+    return sanic_json({"name": name, "script": script})
+
+@app.get("/history/<func_name>")
+async def function_history(request, func_name):
+    """Recent executions of a function and the estimate the scheduler derives from them."""
+    if scheduler.history is None:
+        return sanic_json({"error": "Run history is disabled"}, status=404)
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return sanic_json({"error": "Invalid limit"}, status=400)
+    history = scheduler.history
+    estimate = await asyncio.to_thread(history.estimate, func_name)
+    runs = await asyncio.to_thread(history.function_stats, func_name, limit)
+    return sanic_json({"function": func_name, "estimate": asdict(estimate), "runs": runs})
+
+@app.get("/runs/<run_id>/profile")
+async def run_profile(request, run_id):
+    """Per-node timings of a run; ?format=chrome returns a Chrome/Perfetto trace instead."""
+    profile = run_profiles.get(run_id)
+    if profile is None:
+        return sanic_json({"error": f"Run '{run_id}' not found"}, status=404)
+    if request.args.get("format") == "chrome":
+        return sanic_json(profile.to_chrome_trace())
+    return sanic_json(profile.to_dict())
+
+@app.get("/runs/<run_id>/results")
+async def list_run_results(request, run_id):
+    entries = result_store.nodes(run_id)
+    if not entries and run_manager.get(run_id) is None:
+        return sanic_json({"error": f"Run '{run_id}' not found"}, status=404)
+    return sanic_json({"results": [
+        {"node_id": entry.node_id, "format": entry.format, "nbytes": entry.nbytes, "description": entry.description}
+        for entry in entries
+    ]})
+
+async def stream_chunks(request, chunks, content_type, status=200, headers=None):
+    """Stream an iterator of byte chunks, reading each chunk off the event loop."""
+    response = await request.respond(status=status, headers=headers, content_type=content_type)
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        await response.send(chunk)
+    await response.eof()
+
+@app.get("/runs/<run_id>/results/<node_id>")
+async def get_run_result(request, run_id, node_id):
+    """Fetch one stored node result.
+
+    Query parameters:
+    - format: json (default for objects), npy (default for arrays) or raw (the stored file, honours Range)
+    - slice: NumPy-style index for arrays, e.g. "0:10,:,5"
+    - offset / limit: page through lists, dicts and tables
+    """
+    fmt = request.args.get("format")
+    try:
+        with result_store.reading(run_id, node_id) as entry:
+            if fmt == "raw" or (fmt is None and entry.format == "bin"):
+                size = entry.nbytes
+                byte_range = parse_range(request.headers.get("range"), size)
+                start, end = byte_range or (0, size)
+                headers = {"accept-ranges": "bytes", "content-length": str(end - start)}
+                if byte_range:
+                    headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+                await stream_chunks(request, iter_file(entry.path, start, end), "application/octet-stream",
+                                    status=206 if byte_range else 200, headers=headers)
+                return
+
+            value = await asyncio.to_thread(result_store.load, entry)
+            if entry.format == "npy":
+                if request.args.get("slice"):
+                    value = read_slice(value, parse_slice(request.args.get("slice")))
+                if fmt in (None, "npy"):
+                    await stream_chunks(request, iter_npy(value), "application/octet-stream")
+                    return
+                if value.nbytes > RESULT_JSON_MAX_BYTES:
+                    return sanic_json({"error": "Selection too large for JSON; use a smaller slice or format=npy",
+                                       "nbytes": int(value.nbytes)}, status=413)
+                return sanic_json({"node_id": node_id, "shape": list(value.shape), "dtype": value.dtype.str,
+                                   "data": value.tolist()})
+
+            offset = int(request.args.get("offset", 0))
+            limit = request.args.get("limit")
+            limit = int(limit) if limit is not None else None
+            page, total = read_page(value, offset, limit)
+            body = json_module.dumps({"node_id": node_id, "offset": offset, "total": total, "data": page},
+                                     default=repr)
+            if len(body) > RESULT_JSON_MAX_BYTES:
+                return sanic_json({"error": "Page too large for JSON; pass a smaller limit or format=raw",
+                                   "total": total}, status=413)
+            return raw(body, content_type="application/json")
+    except ResultNotFound as e:
+        return sanic_json({"error": str(e.args[0])}, status=404)
+    except (ValueError, IndexError) as e:
+        return sanic_json({"error": str(e)}, status=400)
 
 @app.post("/list-files")
 async def list_files(request):
     folder_path = request.json.get("folder_path")
+    recursive = bool(request.json.get("recursive", False))
     if not folder_path or not os.path.isdir(folder_path):
         return sanic_json({"error": "Invalid folder path"}, status=400)
 
     try:
-        # Use the new function analyzer
-        analyzer = analyze_folder(folder_path)
+        # Only files changed since the last request are re-analyzed
+        analyzer = await asyncio.to_thread(analysis_cache.get_analyzer, folder_path, recursive)
         
         # Convert to the expected format with enhanced metadata
-        files = []
-        for func_name, func_meta in analyzer.functions.items():
-            # Only include main functions (not private helper functions)
-            if not func_name.startswith('_'):
-                files.append({
-                    "filename": func_meta.filename,
-                    "functionName": func_meta.name,
-                    "parameters": func_meta.parameters,
-                    "input_folders": func_meta.input_folders,
-                    "output_folders": func_meta.output_folders,
-                    "input_count": func_meta.input_count,
-                    "output_count": func_meta.output_count,
-                    "block_type": func_meta.block_type,
-                    "pipeline_position": func_meta.get_pipeline_position(),
-                    "connectable": analyzer.get_connectable_functions(func_name)
-                })
-        
-        # Sort by pipeline position
-        files.sort(key=lambda x: x["pipeline_position"])
-        
-        return sanic_json({"files": files, "pipeline_metadata": analyzer.to_dict()})
+        files = analyzer.to_file_list()
+
+        # Keep the sidebar live: changes in this folder are pushed over /realtime-updates
+        # "client_id" (from the websocket's "connected" message) ties the watch to that connection
+        watcher.watch(folder_path, analyzer, recursive, request.json.get("client_id"))
+        register_symbol_folder(folder_path, recursive)
+
+        # "limit" (and "offset") return one page of the catalogue, with the metadata of those functions only
+        if "limit" in request.json or "offset" in request.json:
+            offset, limit = page_params(request.json)
+            page = files[offset:offset + limit]
+            metadata = {entry["functionName"]: analyzer.function_dict(entry["functionName"]) for entry in page}
+            return sanic_json({"files": page, "total": len(files), "offset": offset, "limit": limit,
+                               "pipeline_metadata": metadata, "folder_path": os.path.abspath(folder_path)})
+        # "folder_path" is the watched path that functions_delta messages carry
+        return sanic_json({"files": files, "pipeline_metadata": analyzer.to_dict(),
+                           "folder_path": os.path.abspath(folder_path)})
+    except ValueError as e:
+        return sanic_json({"error": str(e)}, status=400)
     except Exception as e:
         return sanic_json({"error": str(e)}, status=500)
 
@@ -465,6 +439,7 @@ async def list_files(request):
 async def get_connectable_functions(request):
     function_name = request.json.get("function_name")
     folder_path = request.json.get("folder_path")
+    recursive = bool(request.json.get("recursive", False))
     
     if not folder_path or not os.path.isdir(folder_path):
         return sanic_json({"error": "Invalid folder path"}, status=400)
@@ -473,7 +448,7 @@ async def get_connectable_functions(request):
         return sanic_json({"error": "Function name required"}, status=400)
     
     try:
-        analyzer = analyze_folder(folder_path)
+        analyzer = await asyncio.to_thread(analysis_cache.get_analyzer, folder_path, recursive)
         connectable = analyzer.get_connectable_functions(function_name)
         
         if function_name in analyzer.functions:
@@ -501,19 +476,85 @@ async def list_function_variables(request):
 
     if not folder_path or not os.path.isdir(folder_path):
         return sanic_json({"error": "Invalid folder path"}, status=400)
-
-    function_found = False
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".py"):
-            full_path = os.path.join(folder_path, filename)
-            functions = get_functions_and_variables(full_path)
-            if function_name in functions:
-                variables = functions[function_name]
-                function_found = True
-                return sanic_json({"variables": variables})
-    
-    if not function_found:
+    if not symbol_index:
+        # Without the symbol index, the scheduler's in-memory function index answers
+        function = await asyncio.to_thread(get_function_index(folder_path).lookup, function_name)
+        if function is None:
+            return sanic_json({"error": f"Function '{function_name}' not found"}, status=400)
+        return sanic_json({"variables": function.parameters, "filename": os.path.basename(function.file_path),
+                           "lineno": function.lineno})
+
+    # Brings just this folder's changed files up to date, then answers from the index
+    register_symbol_folder(folder_path)
+    await asyncio.to_thread(symbol_index.update, folder_path)
+    symbol = await asyncio.to_thread(symbol_index.get, function_name, folder_path)
+    if symbol is None:
         return sanic_json({"error": f"Function '{function_name}' not found"}, status=400)
+    return sanic_json({"variables": symbol.variables, "signature": symbol.signature,
+                       "parameters": symbol.parameters, "filename": symbol.filename, "lineno": symbol.lineno})
+
+@app.get("/symbols/search")
+async def search_symbols(request):
+    """Functions of the registered folders matching ?q= (match=text|prefix, folder=, blocks=1, offset=, limit=)."""
+    if not symbol_index:
+        return sanic_json({"error": "Symbol index disabled (NCPIPE_SYMBOL_DB is empty)"}, status=503)
+    query = request.args.get("q", "")
+    try:
+        offset, limit = page_params(request.args)
+        total, symbols = await asyncio.to_thread(
+            symbol_index.search, query, folder=request.args.get("folder") or None,
+            match=request.args.get("match", "text"), blocks_only=request.args.get("blocks", "") not in ("", "0"), offset=offset, limit=limit,
+        )
+    except ValueError as e:
+        return sanic_json({"error": str(e)}, status=400)
+    return sanic_json({"query": query, "total": total, "offset": offset, "limit": limit,
+                       "results": [symbol.to_dict() for symbol in symbols]})
+
+@app.get("/symbols/folders")
+async def list_symbol_folders(request):
+    if not symbol_index:
+        return sanic_json({"error": "Symbol index disabled (NCPIPE_SYMBOL_DB is empty)"}, status=503)
+    return sanic_json({"folders": symbol_index.folders()})
+
+@app.post("/symbols/folders")
+async def register_symbol_folders(request):
+    """Register a folder ({"folder_path", "recursive"}) and index it before returning."""
+    if not symbol_index:
+        return sanic_json({"error": "Symbol index disabled (NCPIPE_SYMBOL_DB is empty)"}, status=503)
+    folder_path = request.json.get("folder_path")
+    if not folder_path or not os.path.isdir(folder_path):
+        return sanic_json({"error": "Invalid folder path"}, status=400)
+    symbol_index.register(folder_path, bool(request.json.get("recursive", False)))
+    update = (await asyncio.to_thread(symbol_index.update, folder_path))[0]
+    return sanic_json({"folder": update.folder, "files": update.files, "symbols": update.symbols,
+                       "changed": len(update.changed), "seconds": update.seconds})
+
+@app.delete("/symbols/folders")
+async def unregister_symbol_folder(request):
+    """Stop indexing ?folder_path= and drop its symbols."""
+    if not symbol_index:
+        return sanic_json({"error": "Symbol index disabled (NCPIPE_SYMBOL_DB is empty)"}, status=503)
+    folder_path = request.args.get("folder_path", "")
+    if not folder_path or not await asyncio.to_thread(symbol_index.unregister, folder_path):
+        return sanic_json({"error": "Folder is not registered"}, status=404)
+    return sanic_json({"removed": os.path.abspath(folder_path)})
+
+@app.after_server_start
+async def start_background_tasks(app, loop):
+    watcher.start()
+    resource_monitor.start()
+    if symbol_refresher:
+        symbol_refresher.start()
+
+@app.after_server_stop
+async def shutdown_scheduler(app, loop):
+    await resource_monitor.stop()
+    await watcher.stop()
+    if symbol_refresher:
+        await symbol_refresher.stop()
+    await run_manager.shutdown()
+    await broadcaster.close()
+    scheduler.shutdown()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8000)
\ No newline at end of file
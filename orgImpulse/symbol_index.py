@@ -0,0 +1,549 @@
+"""
+Symbol Index
+============
+Persistent index of the functions in every registered folder, so the sidebar
+can search across several large repositories without loading and filtering
+the whole catalogue.
+
+Folders are registered by /list-files, /list-function-variables and POST
+/symbols/folders, and stay registered across restarts. For every function
+(methods and nested functions included) the index keeps its name and
+qualified name, file and line, full signature (positional-only and
+keyword-only arguments, defaults, annotations, return annotation),
+docstring, and for pipeline blocks the FunctionAnalyzer metadata (block
+type, input and output folders, pipeline position).
+
+The index is a SQLite database (NCPIPE_SYMBOL_DB, default
+~/.cache/ncpipe/symbols.sqlite3; an empty value disables it) with an FTS5
+table over names, name words, docstrings, signatures, paths and block
+folders. Updates are incremental like the FolderAnalysisCache: only files
+whose (mtime, size) signature and content hash changed are parsed again,
+and SymbolIndexRefresher re-checks the registered folders every
+NCPIPE_SYMBOL_INTERVAL seconds (default 5) in the background.
+
+search() matches either name prefixes ("prefix") or words anywhere in the
+indexed text ("text", each query word as a prefix, names starting with the
+query ranked first), and pages through the matches with offset and limit.
+"""
+
+import ast
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from function_analyzer import PARALLEL_MIN_FILES, FunctionAnalyzer, list_python_files
+from module_cache import content_hash, file_signature
+
+DEFAULT_SYMBOL_DB = os.path.join(os.path.expanduser("~"), ".cache", "ncpipe", "symbols.sqlite3")
+SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 500
+# Bumped whenever the stored symbols change shape; older databases are rebuilt
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    folder TEXT PRIMARY KEY,
+    recursive INTEGER NOT NULL,
+    registered_at REAL NOT NULL,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS files (
+    folder TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (folder, path)
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    id INTEGER PRIMARY KEY,
+    folder TEXT NOT NULL,
+    path TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    name TEXT NOT NULL,
+    qualname TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    lineno INTEGER NOT NULL,
+    end_lineno INTEGER,
+    signature TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    returns TEXT,
+    docstring TEXT,
+    is_block INTEGER NOT NULL,
+    block_type TEXT,
+    position INTEGER,
+    block TEXT
+);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS symbols_file ON symbols (folder, path);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS symbols_fts USING fts5(name, words, docstring, signature, path, block);
+"""
+
+# Column weights of the FTS ranking: name, words, docstring, signature, path, block
+FTS_WEIGHTS = (10.0, 5.0, 1.0, 2.0, 1.0, 1.0)
+
+_SYMBOL_COLUMNS = ("folder", "path", "filename", "name", "qualname", "kind", "lineno", "end_lineno", "signature",
+                   "parameters", "returns", "docstring", "is_block", "block_type", "position", "block")
+
+
+@dataclass
+class Symbol:
+    """One function of an indexed file."""
+    name: str
+    qualname: str  # Class.method, outer.inner
+    kind: str  # "function", "async_function", "method" or "async_method"
+    lineno: int
+    end_lineno: Optional[int]
+    signature: str  # name(a, /, b: int = 1, *args, c=None, **kwargs) -> str
+    parameters: List[Dict[str, Any]]  # {"name", "kind", "annotation", "default"}
+    returns: Optional[str]
+    docstring: Optional[str]
+    block: Optional[Dict[str, Any]] = None  # block_type, input/output folders and position of pipeline blocks
+    filename: str = ""
+    path: str = ""
+    folder: str = ""
+
+    @property
+    def variables(self) -> List[str]:
+        """Names of the plain positional parameters (what /list-function-variables reports)."""
+        return [param["name"] for param in self.parameters if param["kind"] == "positional"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "is_block": self.block is not None}
+
+
+def _unparse(node: Optional[ast.AST]) -> Optional[str]:
+    return ast.unparse(node) if node is not None else None
+
+
+def _parameters(args: ast.arguments) -> List[Dict[str, Any]]:
+    positional = args.posonlyargs + args.args
+    # Defaults belong to the last positional parameters
+    defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    params = []
+    for index, arg in enumerate(positional):
+        params.append({"name": arg.arg, "kind": "positional_only" if index < len(args.posonlyargs) else "positional",
+                       "annotation": _unparse(arg.annotation), "default": _unparse(defaults[index])})
+    if args.vararg:
+        params.append({"name": args.vararg.arg, "kind": "var_positional",
+                       "annotation": _unparse(args.vararg.annotation), "default": None})
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        params.append({"name": arg.arg, "kind": "keyword_only",
+                       "annotation": _unparse(arg.annotation), "default": _unparse(default)})
+    if args.kwarg:
+        params.append({"name": args.kwarg.arg, "kind": "var_keyword",
+                       "annotation": _unparse(args.kwarg.annotation), "default": None})
+    return params
+
+
+def format_signature(name: str, parameters: List[Dict[str, Any]], returns: Optional[str] = None) -> str:
+    parts = []
+    for index, param in enumerate(parameters):
+        text = {"var_positional": "*", "var_keyword": "**"}.get(param["kind"], "") + param["name"]
+        if param["annotation"]:
+            text += f": {param['annotation']}"
+        if param["default"] is not None:
+            text += f" = {param['default']}" if param["annotation"] else f"={param['default']}"
+        following = parameters[index + 1]["kind"] if index + 1 < len(parameters) else None
+        if param["kind"] == "positional_only" and following != "positional_only":
+            text += ", /"
+        parts.append(text)
+        if following == "keyword_only" and param["kind"] not in ("keyword_only", "var_positional"):
+            parts.append("*")
+    if parameters and parameters[0]["kind"] == "keyword_only":
+        parts.insert(0, "*")
+    return f"{name}({', '.join(parts)})" + (f" -> {returns}" if returns else "")
+
+
+def extract_symbols(content: str, file_path: str) -> List[Symbol]:
+    """Every function defined in a file's source, in source order; [] when it does not parse."""
+    try:
+        tree = ast.parse(content)
+    except SyntaxError as e:
+        print(f"Syntax error in {file_path}: {e}")
+        return []
+    blocks = {meta.name: meta for meta in FunctionAnalyzer().analyze_source(content, file_path, tree)}
+
+    symbols = []
+    pending = [(node, "", False) for node in tree.body]
+    while pending:
+        node, prefix, in_class = pending.pop(0)
+        if isinstance(node, ast.ClassDef):
+            pending.extend((child, f"{prefix}{node.name}.", True) for child in node.body)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            kind = ("async_" if isinstance(node, ast.AsyncFunctionDef) else "") + ("method" if in_class else "function")
+            parameters = _parameters(node.args)
+            returns = _unparse(node.returns)
+            block = None
+            # Only module-level functions are pipeline blocks
+            if not prefix and node.name in blocks:
+                meta = blocks[node.name]
+                block = {"block_type": meta.block_type, "input_folders": meta.input_folders,
+                         "output_folders": meta.output_folders, "pipeline_position": meta.get_pipeline_position()}
+            symbols.append(Symbol(
+                name=node.name, qualname=prefix + node.name, kind=kind, lineno=node.lineno,
+                end_lineno=getattr(node, "end_lineno", None),
+                signature=format_signature(node.name, parameters, returns), parameters=parameters,
+                returns=returns, docstring=ast.get_docstring(node), block=block,
+            ))
+            pending.extend((child, f"{prefix}{node.name}.", False) for child in node.body)
+        else:
+            # Functions defined under if/try/with at this level
+            for attr in ("body", "orelse", "finalbody", "handlers"):
+                children = getattr(node, attr, None)
+                if isinstance(children, list):
+                    pending.extend((child, prefix, in_class) for child in children)
+    symbols.sort(key=lambda symbol: symbol.lineno)
+    return symbols
+
+
+def _extract_paths(file_paths: List[str]) -> List[Tuple[str, List[Symbol]]]:
+    """Extract a chunk of files. Runs in a worker process for parallel indexing."""
+    results = []
+    for file_path in file_paths:
+        try:
+            with open(file_path, "r", encoding="utf-8") as file:
+                symbols = extract_symbols(file.read(), file_path)
+        except Exception as e:
+            print(f"Error indexing {os.path.basename(file_path)}: {e}")
+            symbols = []
+        results.append((file_path, symbols))
+    return results
+
+
+def extract_files(file_paths: List[str], workers: Optional[int] = None) -> Dict[str, List[Symbol]]:
+    """Symbols of many files, parsed in a process pool when there are enough of them."""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(file_paths) < PARALLEL_MIN_FILES:
+        return dict(_extract_paths(file_paths))
+    chunksize = max(1, -(-len(file_paths) // (workers * 4)))
+    chunks = [file_paths[i:i + chunksize] for i in range(0, len(file_paths), chunksize)]
+    results = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        for chunk_results in pool.map(_extract_paths, chunks):
+            results.update(chunk_results)
+    return results
+
+
+def _name_words(name: str) -> str:
+    """block_o2_BSC_segmentation -> "block o2 BSC segmentation", loadFolder -> "load Folder"."""
+    return " ".join(re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+", name))
+
+
+def _fts_query(query: str) -> Optional[str]:
+    """Every word of the query, quoted, as a prefix; None when the query has no words."""
+    words = re.findall(r"[^\W_]+", query)
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+def _like_prefix(query: str) -> str:
+    return re.sub(r"([\\%_])", r"\\\1", query) + "%"
+
+
+@dataclass
+class IndexUpdate:
+    """Outcome of indexing one folder."""
+    folder: str
+    files: int = 0
+    symbols: int = 0
+    changed: List[str] = field(default_factory=list)  # files parsed again or removed
+    seconds: float = 0.0
+
+
+class SymbolIndex:
+    """SQLite-backed symbol index of the registered folders; safe to use from worker threads."""
+
+    def __init__(self, path: str = DEFAULT_SYMBOL_DB, workers: Optional[int] = None):
+        self.path = path
+        self.workers = workers
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        # One update at a time, so two refreshes never parse and write the same folder
+        self._update_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                # The index is derived data: rebuild it rather than migrate it
+                for table in ("symbols_fts", "symbols", "files"):
+                    self._db.execute(f"DROP TABLE IF EXISTS {table}")
+                if self._has_table("folders"):
+                    self._db.execute("UPDATE folders SET indexed_at = NULL")
+                self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._db.executescript(SCHEMA)
+            try:
+                self._db.executescript(FTS_SCHEMA)
+                self.full_text = True
+            except sqlite3.OperationalError:
+                print("SQLite has no FTS5, symbol search falls back to substring matching")
+                self.full_text = False
+
+    def _has_table(self, name: str) -> bool:
+        return self._db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                (name,)).fetchone() is not None
+
+    # Registered folders
+
+    def register(self, folder: str, recursive: bool = False) -> bool:
+        """Add a folder, or start walking it recursively; True when that changed what is indexed.
+
+        A folder registered recursively stays recursive when it is registered again without it.
+        """
+        folder = os.path.abspath(folder)
+        with self._lock, self._db:
+            row = self._db.execute("SELECT recursive FROM folders WHERE folder = ?", (folder,)).fetchone()
+            if row is not None and (row[0] or not recursive):
+                return False
+            self._db.execute("INSERT OR REPLACE INTO folders VALUES (?, ?, ?, NULL)", (folder, int(recursive), time.time()))
+            return True
+
+    def unregister(self, folder: str) -> bool:
+        folder = os.path.abspath(folder)
+        with self._update_lock, self._lock, self._db:
+            self._delete_files(folder)
+            return self._db.execute("DELETE FROM folders WHERE folder = ?", (folder,)).rowcount > 0
+
+    def folders(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT f.folder, f.recursive, f.registered_at, f.indexed_at, "
+                "(SELECT COUNT(*) FROM files WHERE folder = f.folder), "
+                "(SELECT COUNT(*) FROM symbols WHERE folder = f.folder) FROM folders f ORDER BY f.folder"
+            ).fetchall()
+        return [{"folder": folder, "recursive": bool(recursive), "registered_at": registered_at,
+                 "indexed_at": indexed_at, "files": files, "symbols": symbols}
+                for folder, recursive, registered_at, indexed_at, files, symbols in rows]
+
+    # Updates
+
+    def update(self, folder: Optional[str] = None) -> List[IndexUpdate]:
+        """Re-index changed files of one registered folder (or all); folders that are gone are skipped."""
+        with self._lock:
+            query, params = "SELECT folder, recursive FROM folders", ()
+            if folder is not None:
+                query, params = query + " WHERE folder = ?", (os.path.abspath(folder),)
+            registered = self._db.execute(query, params).fetchall()
+        updates = []
+        for path, recursive in registered:
+            if os.path.isdir(path):
+                updates.append(self._update_folder(path, bool(recursive)))
+        return updates
+
+    def _update_folder(self, folder: str, recursive: bool) -> IndexUpdate:
+        started = time.perf_counter()
+        with self._update_lock:
+            with self._lock:
+                known = {path: (mtime_ns, size, digest) for path, mtime_ns, size, digest in self._db.execute(
+                    "SELECT path, mtime_ns, size, digest FROM files WHERE folder = ?", (folder,))}
+            current = {}
+            for file_path in list_python_files(folder, recursive):
+                try:
+                    current[file_path] = file_signature(file_path)
+                except OSError:
+                    continue
+
+            removed = [path for path in known if path not in current]
+            touched, to_index = {}, {}
+            for file_path, signature in current.items():
+                entry = known.get(file_path)
+                if entry is not None and entry[:2] == signature:
+                    continue
+                try:
+                    with open(file_path, "rb") as file:
+                        digest = content_hash(file.read())
+                except OSError:
+                    continue
+                if entry is not None and entry[2] == digest:
+                    touched[file_path] = (signature, digest)  # Touched but not edited
+                else:
+                    to_index[file_path] = (signature, digest)
+            extracted = extract_files(list(to_index), self.workers) if to_index else {}
+
+            with self._lock, self._db:
+                for file_path, ((mtime_ns, size), digest) in touched.items():
+                    self._db.execute("UPDATE files SET mtime_ns = ?, size = ?, digest = ? WHERE folder = ? AND path = ?",
+                                     (mtime_ns, size, digest, folder, file_path))
+                for file_path in removed:
+                    self._delete_files(folder, file_path)
+                for file_path, ((mtime_ns, size), digest) in to_index.items():
+                    self._delete_files(folder, file_path)
+                    self._db.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?)", (folder, file_path, mtime_ns, size, digest))
+                    self._insert_symbols(folder, file_path, extracted.get(file_path, []))
+                self._db.execute("UPDATE folders SET indexed_at = ? WHERE folder = ?", (time.time(), folder))
+                symbols = self._db.execute("SELECT COUNT(*) FROM symbols WHERE folder = ?", (folder,)).fetchone()[0]
+        return IndexUpdate(folder=folder, files=len(current), symbols=symbols, changed=sorted(removed + list(to_index)),
+                           seconds=time.perf_counter() - started)
+
+    def _delete_files(self, folder: str, file_path: Optional[str] = None):
+        """Drop indexed files of a folder (one or all) with their symbols; caller holds the lock."""
+        where, params = "folder = ?", [folder]
+        if file_path is not None:
+            where, params = where + " AND path = ?", params + [file_path]
+        if self.full_text:
+            self._db.execute(f"DELETE FROM symbols_fts WHERE rowid IN (SELECT id FROM symbols WHERE {where})", params)
+        self._db.execute(f"DELETE FROM symbols WHERE {where}", params)
+        self._db.execute(f"DELETE FROM files WHERE {where}", params)
+
+    def _insert_symbols(self, folder: str, file_path: str, symbols: List[Symbol]):
+        filename = os.path.relpath(file_path, folder)
+        for symbol in symbols:
+            block = symbol.block or {}
+            cursor = self._db.execute(
+                f"INSERT INTO symbols ({', '.join(_SYMBOL_COLUMNS)}) VALUES ({', '.join('?' * len(_SYMBOL_COLUMNS))})",
+                (folder, file_path, filename, symbol.name, symbol.qualname, symbol.kind, symbol.lineno,
+                 symbol.end_lineno, symbol.signature, json.dumps(symbol.parameters), symbol.returns,
+                 symbol.docstring, int(symbol.block is not None), block.get("block_type"),
+                 block.get("pipeline_position"), json.dumps(symbol.block) if symbol.block else None),
+            )
+            if self.full_text:
+                self._db.execute(
+                    "INSERT INTO symbols_fts (rowid, name, words, docstring, signature, path, block) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    # Enclosing classes and functions are searchable, but weigh like the file
+                    (cursor.lastrowid, symbol.name, _name_words(symbol.name), symbol.docstring or "",
+                     symbol.signature, f"{filename} {_name_words(symbol.qualname)}",
+                     " ".join([block.get("block_type") or ""] + block.get("input_folders", [])
+                              + block.get("output_folders", []))),
+                )
+
+    # Queries
+
+    @staticmethod
+    def _symbol(row: Tuple) -> Symbol:
+        values = dict(zip(_SYMBOL_COLUMNS, row))
+        return Symbol(
+            name=values["name"], qualname=values["qualname"], kind=values["kind"], lineno=values["lineno"],
+            end_lineno=values["end_lineno"], signature=values["signature"],
+            parameters=json.loads(values["parameters"]), returns=values["returns"], docstring=values["docstring"],
+            block=json.loads(values["block"]) if values["block"] else None,
+            filename=values["filename"], path=values["path"], folder=values["folder"],
+        )
+
+    def search(self, query: str = "", folder: Optional[str] = None, match: str = "text", blocks_only: bool = False,
+               offset: int = 0, limit: int = SEARCH_LIMIT) -> Tuple[int, List[Symbol]]:
+        """(total matches, one page of symbols) for a query; an empty query lists everything.
+
+        match="prefix" matches the start of function names, "text" every query
+        word as a prefix of any word of the name, docstring, signature, file or
+        block folders.
+        """
+        if match not in ("prefix", "text"):
+            raise ValueError(f"Unknown match '{match}', expected 'prefix' or 'text'")
+        if offset < 0 or not 0 < limit <= MAX_SEARCH_LIMIT:
+            raise ValueError(f"offset must be >= 0 and limit between 1 and {MAX_SEARCH_LIMIT}")
+        query = query.strip()
+        columns = ", ".join(f"s.{column}" for column in _SYMBOL_COLUMNS)
+        where, params = [], []
+        if folder is not None:
+            where.append("s.folder = ?")
+            params.append(os.path.abspath(folder))
+        if blocks_only:
+            where.append("s.is_block = 1")
+        source, order = "symbols s", "s.folder, s.is_block DESC, s.position, s.name, s.path, s.lineno"
+        if query and match == "prefix":
+            where.append("s.name LIKE ? ESCAPE '\\'")
+            params.append(_like_prefix(query))
+            order = "s.name COLLATE NOCASE, s.path, s.lineno"
+        elif query:
+            fts_query = _fts_query(query)
+            if fts_query is None:
+                return 0, []
+            if self.full_text:
+                source = "symbols_fts JOIN symbols s ON s.id = symbols_fts.rowid"
+                where.append("symbols_fts MATCH ?")
+                params.append(fts_query)
+                order = f"s.name LIKE ? ESCAPE '\\' DESC, bm25(symbols_fts, {', '.join(map(str, FTS_WEIGHTS))}), s.name"
+            else:
+                for word in re.findall(r"[^\W_]+", query):
+                    where.append("(s.qualname LIKE ? OR s.docstring LIKE ? OR s.signature LIKE ? OR s.filename LIKE ?)")
+                    params.extend([f"%{word}%"] * 4)
+                order = "s.name LIKE ? ESCAPE '\\' DESC, s.name"
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+        order_params = [_like_prefix(query)] if "LIKE" in order else []
+
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM {source}{where_sql}", params).fetchone()[0]
+            rows = self._db.execute(f"SELECT {columns} FROM {source}{where_sql} ORDER BY {order} LIMIT ? OFFSET ?",
+                                    params + order_params + [limit, offset]).fetchall()
+        return total, [self._symbol(row) for row in rows]
+
+    def get(self, name: str, folder: Optional[str] = None) -> Optional[Symbol]:
+        """A function by name, preferring module-level functions, then the first file and line."""
+        query = f"SELECT {', '.join(_SYMBOL_COLUMNS)} FROM symbols WHERE name = ?"
+        params = [name]
+        if folder is not None:
+            query += " AND folder = ?"
+            params.append(os.path.abspath(folder))
+        query += " ORDER BY qualname != name, path, lineno LIMIT 1"
+        with self._lock:
+            row = self._db.execute(query, params).fetchone()
+        return self._symbol(row) if row else None
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class SymbolIndexRefresher:
+    """Re-indexes the registered folders every interval, or right away when asked to."""
+
+    def __init__(self, index: SymbolIndex, interval: float = 5.0):
+        self.index = index
+        self.interval = interval
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def request(self):
+        """Refresh now rather than at the next interval (e.g. after registering a folder)."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await asyncio.to_thread(self.index.update)
+            except Exception as e:
+                print(f"Symbol index refresh failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._wake.set()  # Catch up with edits made while the server was down
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def open_symbol_index(path: Optional[str] = None, workers: Optional[int] = None) -> Optional[SymbolIndex]:
+    """Open the index at path or NCPIPE_SYMBOL_DB; None when disabled or unusable."""
+    if path is None:
+        path = os.environ.get("NCPIPE_SYMBOL_DB", DEFAULT_SYMBOL_DB)
+    if not path:
+        return None
+    try:
+        return SymbolIndex(path, workers)
+    except sqlite3.Error as e:
+        print(f"Symbol index disabled, cannot open {path}: {e}")
+        return None
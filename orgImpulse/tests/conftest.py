@@ -0,0 +1,53 @@
+"""Shared fixtures: block folders written to a temporary directory and a scheduler per test."""
+
+import os
+import sys
+import textwrap
+from typing import Any, Dict, Optional
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from graph_scheduler import GraphScheduler  # noqa: E402
+
+
+class BlockFolder:
+    """A folder of block scripts for one test."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, filename: str, source: str) -> str:
+        path = os.path.join(self.path, filename)
+        previous = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+        with open(path, "w") as file:
+            file.write(textwrap.dedent(source).lstrip())
+        if previous is not None:
+            # Change detection compares (mtime, size); a rewrite within one clock tick must still count
+            stamp = max(os.stat(path).st_mtime_ns, previous + 1_000_000_000)
+            os.utime(path, ns=(stamp, stamp))
+        return path
+
+    def node(self, node_id: str, label: str, inputs: Optional[Dict[str, Any]] = None,
+             executor: str = "thread", **data) -> Dict[str, Any]:
+        """A node of the /execute-graph payload; thread nodes by default, as they start fastest."""
+        resources = {"executor": executor, **data.pop("resources", {})}
+        return {"id": node_id, "data": {"label": label, "folderPath": self.path, "inputs": inputs or {},
+                                        "resources": resources, **data}}
+
+
+@pytest.fixture
+def blocks(tmp_path) -> BlockFolder:
+    folder = tmp_path / "blocks"
+    folder.mkdir()
+    return BlockFolder(str(folder))
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = GraphScheduler(max_workers=2, thread_workers=4, memory_admission=False)
+    yield scheduler
+    scheduler.shutdown()
@@ -0,0 +1,15 @@
+"""Graph payloads in the /execute-graph format."""
+
+from typing import Any, Dict, List, Optional
+
+from graph_scheduler import ExecutionGraph
+
+
+def edge(source: str, target: str, param: Optional[str] = None) -> Dict[str, Any]:
+    return {"source": source, "target": target, "data": {"param": param} if param else {}}
+
+
+def resolved_graph(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]] = ()) -> ExecutionGraph:
+    graph = ExecutionGraph.from_payload(nodes, list(edges))
+    graph.resolve_functions()
+    return graph
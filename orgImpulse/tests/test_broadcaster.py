@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+from broadcaster import Broadcaster, ClientConnection, coalesce_key
+
+
+class StalledSocket:
+    """A websocket whose sends never complete, like a client that stopped reading."""
+
+    def __init__(self):
+        self.closed = False
+
+    async def send(self, payload):
+        await asyncio.Event().wait()
+
+    async def close(self, code=1000, reason=""):
+        self.closed = True
+
+
+class RecordingSocket(StalledSocket):
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    async def send(self, payload):
+        self.sent.append(json.loads(payload))
+
+
+def node_message(kind, node_id, run_id="run", **fields):
+    return {"type": kind, "run_id": run_id, "node_id": node_id, **fields}
+
+
+def enqueue(connection, message):
+    return connection.enqueue(json.dumps(message), coalesce_key(message),
+                              message["type"] in ("node_started", "node_progress"))
+
+
+def queued(connection):
+    return [json.loads(payload) for _, payload, _ in connection.queue]
+
+
+def test_only_node_messages_coalesce():
+    assert coalesce_key(node_message("node_progress", "a")) == ("run", "a")
+    assert coalesce_key({"type": "run_finished", "run_id": "run"}) is None
+
+
+def test_newer_node_message_replaces_the_queued_one():
+    connection = ClientConnection(None, max_queue=8)
+    enqueue(connection, node_message("node_started", "a"))
+    enqueue(connection, node_message("node_started", "b"))
+    enqueue(connection, node_message("node_progress", "a", done=1, total=4))
+    enqueue(connection, node_message("node_progress", "a", done=2, total=4))
+    enqueue(connection, node_message("node_finished", "a"))
+
+    assert [(m["type"], m["node_id"]) for m in queued(connection)] == [("node_finished", "a"), ("node_started", "b")]
+    assert connection.dropped == 0
+
+
+def test_full_queue_drops_the_oldest_progress_but_never_final_states():
+    connection = ClientConnection(None, max_queue=3)
+    enqueue(connection, node_message("node_started", "a"))
+    enqueue(connection, node_message("node_finished", "b"))
+    enqueue(connection, node_message("node_progress", "c", done=1, total=2))
+    assert enqueue(connection, node_message("node_failed", "d"))
+
+    assert [m["node_id"] for m in queued(connection)] == ["b", "c", "d"]
+    assert connection.dropped == 1
+    assert enqueue(connection, {"type": "run_finished", "run_id": "run"})
+    assert [m.get("node_id") for m in queued(connection)] == ["b", "d", None]
+    assert connection.dropped == 2
+    # Only essential messages left: the client is too far behind
+    assert not enqueue(connection, node_message("node_finished", "e"))
+
+
+def test_slow_client_is_evicted_without_holding_up_others():
+    async def scenario():
+        broadcaster = Broadcaster(max_queue=2, heartbeat_interval=0)
+        stalled, healthy = StalledSocket(), RecordingSocket()
+        broadcaster.register(stalled)
+        broadcaster.register(healthy)
+        for node_id in "abcd":
+            broadcaster.publish(node_message("node_finished", node_id))
+            await asyncio.sleep(0.005)  # Time for a healthy client to send
+        await asyncio.sleep(0.01)
+        return broadcaster, stalled, healthy
+
+    broadcaster, stalled, healthy = asyncio.run(scenario())
+    assert [connection.ws for connection in broadcaster.clients] == [healthy]
+    assert stalled.closed
+    assert [m["node_id"] for m in healthy.sent] == ["a", "b", "c", "d"]
+
+
+def test_run_messages_only_reach_subscribers():
+    async def scenario():
+        broadcaster = Broadcaster(heartbeat_interval=0)
+        everything, subscribed = RecordingSocket(), RecordingSocket()
+        broadcaster.register(everything)
+        broadcaster.subscribe(broadcaster.register(subscribed), ["one"])
+        broadcaster.publish(node_message("node_finished", "a", run_id="one"))
+        broadcaster.publish(node_message("node_finished", "a", run_id="two"))
+        broadcaster.publish({"type": "functions_delta"})
+        await asyncio.sleep(0.01)
+        return everything, subscribed
+
+    everything, subscribed = asyncio.run(scenario())
+    assert [m.get("run_id") for m in everything.sent] == ["one", "two", None]
+    assert [m.get("run_id") for m in subscribed.sent] == ["one", None]
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+
+from analysis_cache import FolderAnalysisCache
+from broadcaster import Broadcaster
+from folder_watcher import FolderWatcher, diff_entries
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, payload):
+        self.sent.append(json.loads(payload))
+
+    async def close(self, code=1000, reason=""):
+        pass
+
+
+def test_diff_entries():
+    old = {"a": {"functionName": "a", "parameters": ["x"]}, "b": {"functionName": "b", "parameters": []}}
+    new = {"a": {"functionName": "a", "parameters": ["x", "y"]}, "c": {"functionName": "c", "parameters": []}}
+    assert diff_entries(old, new) == {"added": [new["c"]], "modified": [new["a"]], "removed": ["b"]}
+    assert diff_entries(old, old) == {"added": [], "modified": [], "removed": []}
+    assert diff_entries({}, old)["added"] == list(old.values())
+
+
+def test_deltas_only_reach_connections_watching_the_folder(blocks):
+    blocks.write("first.py", '''
+        def block_o1_first(project):
+            return project
+    ''')
+
+    async def scenario():
+        cache = FolderAnalysisCache()
+        broadcaster = Broadcaster(heartbeat_interval=0)
+        watcher = FolderWatcher(cache, broadcaster)
+        watching, other = RecordingSocket(), RecordingSocket()
+        client_id = broadcaster.register(watching).client_id
+        broadcaster.register(other)
+        watcher.watch(blocks.path, cache.get_analyzer(blocks.path), client_id=client_id)
+
+        assert await watcher.poll(os.path.abspath(blocks.path)) is None  # Nothing changed yet
+        blocks.write("second.py", '''
+            def block_o2_second(project, threshold=0.5):
+                return project
+        ''')
+        blocks.write("first.py", '''
+            def block_o1_first(project, plate):
+                return project
+        ''')
+        message = await watcher.poll(os.path.abspath(blocks.path))
+        await asyncio.sleep(0.01)
+        return message, watching, other
+
+    message, watching, other = asyncio.run(scenario())
+    assert [entry["functionName"] for entry in message["added"]] == ["block_o2_second"]
+    assert [entry["parameters"] for entry in message["modified"]] == [["project", "plate"]]
+    assert message["removed"] == []
+    assert watching.sent == [message]
+    assert other.sent == []
+
+
+def test_folder_is_dropped_once_its_last_client_leaves(blocks):
+    watcher = FolderWatcher(FolderAnalysisCache(), Broadcaster(heartbeat_interval=0))
+    watcher.watch(blocks.path, client_id="one")
+    watcher.watch(blocks.path, client_id="two")
+    watcher.watch(blocks.path)  # A listing without a client_id does not keep the folder alone
+
+    watcher.unwatch_client("one")
+    assert watcher.folders == [os.path.abspath(blocks.path)]
+    watcher.unwatch(blocks.path, "two")
+    assert watcher.folders == []
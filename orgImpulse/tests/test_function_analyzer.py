@@ -0,0 +1,123 @@
+import ast
+import textwrap
+
+from function_analyzer import FunctionAnalyzer, PathExtractor
+
+
+def extract(source):
+    """{function name: (input folders, output folders)} of a module."""
+    paths = PathExtractor.extract(ast.parse(textwrap.dedent(source)))
+    return {node.name: folders for node, folders in paths.items()}
+
+
+def test_path_expressions_resolve_to_block_folders():
+    paths = extract('''
+        import os
+
+        def block_join(project, plate):
+            loadPath = os.path.join(project, plate, "block_o1_raw")
+            savePath = os.path.join(project, plate, "block_o2_illum")
+
+        def block_fstring(project):
+            loadPath = f"{project}/block_o2_illum/"
+            savePath = f"{project}/block_o3_seg"
+
+        def block_concat(project):
+            loadPath = project + "/" + "block_o3_seg"
+            savePath = project + "\\\\block_o4_features"
+    ''')
+    assert paths["block_join"] == (["block_o1_raw"], ["block_o2_illum"])
+    assert paths["block_fstring"] == (["block_o2_illum"], ["block_o3_seg"])
+    assert paths["block_concat"] == (["block_o3_seg"], ["block_o4_features"])
+
+
+def test_variables_module_constants_and_defaults_are_followed():
+    paths = extract('''
+        import os
+
+        RAW = "block_o1_raw"
+
+        def block_variables(project, saveFolder="block_o5_out"):
+            folder = "block_o4_features"
+            base = os.path.join(project, folder)
+            loadPath = base
+            extra = os.path.join(project, RAW)
+            loadFolder2 = extra
+            savePath = os.path.join(project, saveFolder)
+
+        def block_aug(project):
+            savePath = project
+            savePath += "/block_o6_aug"
+
+        def block_tuple(project):
+            loadPath, savePath = os.path.join(project, "block_a_in"), os.path.join(project, "block_a_out")
+    ''')
+    assert paths["block_variables"] == (["block_o4_features", "block_o1_raw"], ["block_o5_out"])
+    assert paths["block_aug"] == ([], ["block_o6_aug"])
+    assert paths["block_tuple"] == (["block_a_in"], ["block_a_out"])
+
+
+def test_keyword_arguments_and_nested_helpers():
+    paths = extract('''
+        def block_keywords(project):
+            files = loadPathGenerator(project, loadFolder="block_o1_raw", verbose=True)
+            writer(saveFolder="block_o2_masks", name="block_o9_not_a_path")
+
+        def block_outer(project):
+            def helper():
+                loadPath = project + "/block_o3_inner"
+            helper()
+            savePath = project + "/block_o4_outer"
+    ''')
+    assert paths["block_keywords"] == (["block_o1_raw"], ["block_o2_masks"])
+    assert paths["helper"] == (["block_o3_inner"], [])
+    assert paths["block_outer"] == (["block_o3_inner"], ["block_o4_outer"])
+
+
+def test_strings_without_block_folders_are_ignored():
+    paths = extract('''
+        def block_plain(project):
+            loadPath = project + "/raw_images"
+            savePath = "results.csv"
+            message = "block_o1_raw"
+    ''')
+    assert paths["block_plain"] == ([], [])
+
+
+def test_pipeline_graph_links_producers_to_consumers():
+    analyzer = FunctionAnalyzer()
+    analyzer.analyze_source(textwrap.dedent('''
+        def block_o1_load(project):
+            savePath = project + "/block_o1_raw"
+
+        def block_o2_segment(project):
+            loadPath = project + "/block_o1_raw"
+            savePath = project + "/block_o2_masks"
+
+        def block_o3_measure(project):
+            loadPath = project + "/block_o2_masks"
+            savePath = project + "/block_o3_features"
+
+        def block_o4_plot(project):
+            loadPath = project + "/block_o1_raw"
+
+        def block_o5_refine(project):
+            loadPath = project + "/block_o6_refined"
+            savePath = project + "/block_o5_refined"
+
+        def block_o6_iterate(project):
+            loadPath = project + "/block_o5_refined"
+            savePath = project + "/block_o6_refined"
+    '''), "blocks.py")
+    graph = analyzer.get_pipeline_graph()
+
+    assert sorted(graph.edges()) == [
+        ("block_o1_load", "block_o2_segment"), ("block_o1_load", "block_o4_plot"),
+        ("block_o2_segment", "block_o3_measure"), ("block_o5_refine", "block_o6_iterate"),
+        ("block_o6_iterate", "block_o5_refine"),
+    ]
+    assert graph.connectable("block_o2_segment") == {"inputs": ["block_o1_load"], "outputs": ["block_o3_measure"]}
+    assert graph.cycles() == [["block_o5_refine", "block_o6_iterate"]]
+    order = graph.topological_order()
+    assert order.index("block_o1_load") < order.index("block_o2_segment") < order.index("block_o3_measure")
+    assert order.index("block_o1_load") < order.index("block_o4_plot")
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from graph_scheduler import ExecutionGraph, GraphExecutionError, GraphScheduler
+from payloads import edge, resolved_graph
+from run_profile import RunProfile
+
+CHAIN = '''
+def block_source(start):
+    return start
+
+def block_double(value):
+    return value * 2
+
+def block_add(left, right):
+    return left + right
+'''
+
+
+def started_order(events):
+    async def listener(event, task, info):
+        if event == "node_started":
+            events.append(task.node_id)
+    return listener
+
+
+def test_upstream_results_reach_bound_parameters(blocks, scheduler):
+    blocks.write("chain.py", CHAIN)
+    graph = resolved_graph(
+        [blocks.node("src", "block_source", {"start": 3}),
+         blocks.node("double", "block_double"),
+         blocks.node("sum", "block_add")],
+        [edge("src", "double", "value"), edge("src", "sum", "left"), edge("double", "sum", "right")],
+    )
+    events = []
+    report = asyncio.run(scheduler.run(graph, listener=started_order(events)))
+
+    assert report.results == {"src": 3, "double": 6, "sum": 9}
+    assert events == ["src", "double", "sum"]
+
+
+def test_plain_edges_only_order_nodes(blocks, scheduler):
+    blocks.write("files.py", '''
+        import os
+
+        def block_write(path):
+            with open(path, "w") as file:
+                file.write("ready")
+
+        def block_read(path):
+            with open(path) as file:
+                return file.read()
+    ''')
+    path = os.path.join(blocks.path, "marker.txt")
+    graph = resolved_graph(
+        [blocks.node("read", "block_read", {"path": path}), blocks.node("write", "block_write", {"path": path})],
+        [edge("write", "read")],
+    )
+    assert graph.order == ["write", "read"]
+    assert asyncio.run(scheduler.run(graph)).results["read"] == "ready"
+
+
+def test_cycles_and_unresolvable_nodes_are_rejected(blocks):
+    blocks.write("chain.py", CHAIN)
+    with pytest.raises(GraphExecutionError, match="cycle"):
+        ExecutionGraph.from_payload([blocks.node("a", "block_double"), blocks.node("b", "block_double")],
+                                    [edge("a", "b", "value"), edge("b", "a", "value")])
+    with pytest.raises(GraphExecutionError, match="not found") as missing:
+        resolved_graph([blocks.node("a", "block_missing")])
+    assert missing.value.node_id == "a"
+    with pytest.raises(GraphExecutionError, match="Input 'start' not provided"):
+        resolved_graph([blocks.node("a", "block_source")])
+    with pytest.raises(GraphExecutionError, match="unknown parameter"):
+        resolved_graph([blocks.node("a", "block_source", {"start": 1}), blocks.node("b", "block_double")],
+                       [edge("a", "b", "other")])
+
+
+FAILING = '''
+def block_fail(value):
+    raise ValueError(f"bad value {value}")
+
+def block_after(value):
+    return value
+
+def block_other(value):
+    return value + 1
+'''
+
+
+def test_a_failed_node_aborts_the_run(blocks, scheduler):
+    blocks.write("fail.py", FAILING)
+    graph = resolved_graph(
+        [blocks.node("fail", "block_fail", {"value": 1}), blocks.node("after", "block_after")],
+        [edge("fail", "after", "value")],
+    )
+    profile = RunProfile(run_id="abort")
+    with pytest.raises(GraphExecutionError, match="bad value 1") as error:
+        asyncio.run(scheduler.run(graph, profile=profile))
+
+    assert error.value.node_id == "fail"
+    assert error.value.status == 500
+    assert isinstance(error.value.__cause__, ValueError)
+    assert profile.nodes["fail"].status == "failed"
+    assert "after" not in profile.nodes  # Never started
+
+
+def test_keep_going_finishes_independent_branches(blocks, scheduler):
+    blocks.write("fail.py", FAILING)
+    graph = resolved_graph(
+        [blocks.node("fail", "block_fail", {"value": 1}), blocks.node("after", "block_after"),
+         blocks.node("other", "block_other", {"value": 1})],
+        [edge("fail", "after", "value")],
+    )
+    profile = RunProfile(run_id="keep-going")
+    with pytest.raises(GraphExecutionError) as error:
+        asyncio.run(scheduler.run(graph, profile=profile, keep_going=True))
+
+    assert error.value.node_id == "fail"
+    assert profile.nodes["other"].status == "completed"
+    assert "after" not in profile.nodes
+
+
+def test_concurrent_runs_share_cpu_slots(blocks):
+    log = os.path.join(blocks.path, "spans.jsonl")
+    blocks.write("slow.py", '''
+        import json
+        import time
+
+        def block_slow(log, name):
+            started = time.time()
+            time.sleep(0.1)
+            with open(log, "a") as file:
+                file.write(json.dumps([name, started, time.time()]) + "\\n")
+    ''')
+    scheduler = GraphScheduler(max_workers=1, memory_admission=False)
+
+    def graph(prefix):
+        return resolved_graph([blocks.node(name, "block_slow", {"log": log, "name": name}, resources={"cpus": 1})
+                               for name in (prefix + "1", prefix + "2")])
+
+    async def both():
+        await asyncio.gather(scheduler.run(graph("a")), scheduler.run(graph("b")))
+
+    try:
+        asyncio.run(both())
+    finally:
+        scheduler.shutdown()
+    with open(log) as file:
+        spans = sorted(json.loads(line)[1:] for line in file)
+    assert len(spans) == 4
+    assert all(end <= next_start for (_, end), (next_start, _) in zip(spans, spans[1:]))
+
+
+def test_process_node_returns_an_instance_of_a_block_class(blocks, scheduler):
+    blocks.write("points.py", '''
+        class Point:
+            def __init__(self, x, y):
+                self.x, self.y = x, y
+
+        def block_point(x):
+            return Point(x, x + 1)
+
+        def block_norm(point):
+            return point.x ** 2 + point.y ** 2
+    ''')
+    graph = resolved_graph(
+        [blocks.node("point", "block_point", {"x": 1}, executor="process"),
+         blocks.node("norm", "block_norm", executor="process")],
+        [edge("point", "norm", "point")],
+    )
+    report = asyncio.run(scheduler.run(graph))
+
+    assert type(report.results["point"]).__name__ == "Point"
+    assert (report.results["point"].x, report.results["point"].y) == (1, 2)
+    assert report.results["norm"] == 5
+
+
+def test_result_that_cannot_be_unpickled_fails_its_node(blocks, scheduler):
+    blocks.write("broken.py", '''
+        def _refuse():
+            raise ValueError("cannot rebuild")
+
+        class Broken:
+            def __reduce__(self):
+                return (_refuse, ())
+
+        def block_broken():
+            return Broken()
+    ''')
+    graph = resolved_graph([blocks.node("broken", "block_broken", executor="process")])
+    with pytest.raises(GraphExecutionError, match="could not be unpickled.*cannot rebuild") as error:
+        asyncio.run(scheduler.run(graph))
+    assert error.value.node_id == "broken"
+
+
+STREAMS = '''
+def block_numbers(count):
+    for number in range(count):
+        yield number
+
+def block_total(numbers):
+    return sum(numbers)
+'''
+
+
+def test_generator_streams_items_to_its_consumer(blocks, scheduler):
+    blocks.write("streams.py", STREAMS)
+    graph = resolved_graph(
+        [blocks.node("numbers", "block_numbers", {"count": 5}), blocks.node("total", "block_total")],
+        [edge("numbers", "total", "numbers")],
+    )
+    assert graph.tasks["numbers"].streaming and graph.tasks["total"].streaming
+    report = asyncio.run(scheduler.run(graph))
+    assert report.results["total"] == 10
+
+
+def test_generator_without_stream_consumer_returns_its_items(blocks, scheduler):
+    blocks.write("streams.py", STREAMS)
+    graph = resolved_graph([blocks.node("numbers", "block_numbers", {"count": 3})])
+    assert not graph.tasks["numbers"].streaming
+    assert asyncio.run(scheduler.run(graph)).results["numbers"] == [0, 1, 2]
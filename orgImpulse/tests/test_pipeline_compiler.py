@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from graph_scheduler import ExecutionGraph, GraphExecutionError
+from payloads import edge, resolved_graph
+from pipeline_compiler import compile_pipeline
+
+CHAIN = '''
+def block_source(start):
+    return start
+
+def block_double(value):
+    return value * 2
+'''
+
+
+def chain(blocks, start=3):
+    return ([blocks.node("src", "block_source", {"start": start}, executor="process"),
+             blocks.node("double", "block_double", executor="process")],
+            [edge("src", "double", "value")])
+
+
+def test_the_same_graph_compiles_to_the_same_source(blocks):
+    blocks.write("chain.py", CHAIN)
+    first = compile_pipeline(resolved_graph(*chain(blocks)), name="run_chain.py")
+    assert compile_pipeline(resolved_graph(*chain(blocks)), name="run_chain.py") == first
+    assert compile_pipeline(resolved_graph(*chain(blocks, start=4)), name="run_chain.py") != first
+
+
+def test_unresolved_graphs_are_refused(blocks):
+    blocks.write("chain.py", CHAIN)
+    with pytest.raises(GraphExecutionError, match="Resolve"):
+        compile_pipeline(ExecutionGraph.from_payload(*chain(blocks)))
+
+
+def test_compiled_runner_executes_and_caches(blocks, tmp_path):
+    blocks.write("chain.py", CHAIN)
+    script = tmp_path / "run_chain.py"
+    script.write_text(compile_pipeline(resolved_graph(*chain(blocks)), name="run_chain.py"))
+
+    def run():
+        timings = tmp_path / "timings.json"
+        subprocess.run([sys.executable, str(script), "--workers", "2", "--timings", str(timings)],
+                       check=True, capture_output=True, cwd=str(tmp_path), timeout=120)
+        return {node_id: node["status"] for node_id, node in json.loads(timings.read_text())["nodes"].items()}
+
+    assert run() == {"src": "ran", "double": "ran"}
+    assert run() == {"src": "cached", "double": "cached"}
+    assert os.path.isdir(tmp_path / ".ncpipe-cache")
@@ -0,0 +1,167 @@
+import asyncio
+import os
+
+import pytest
+
+from graph_scheduler import GraphScheduler
+from payloads import edge, resolved_graph
+from result_cache import ResultCache, result_cache_key
+
+COUNTED = '''
+def _count(log, name):
+    with open(log, "a") as file:
+        file.write(name + "\\n")
+
+def block_source(log, start):
+    _count(log, "source")
+    return start
+
+def block_double(log, value):
+    _count(log, "double")
+    return value * 2
+
+def block_other(log, value):
+    _count(log, "other")
+    return value + 1
+'''
+
+
+@pytest.fixture
+def cached_scheduler(tmp_path):
+    scheduler = GraphScheduler(max_workers=2, result_cache=ResultCache(str(tmp_path / "cache")),
+                               memory_admission=False)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def executed(log):
+    """Names of the blocks that ran since the last call."""
+    if not os.path.exists(log):
+        return []
+    with open(log) as file:
+        names = file.read().split()
+    os.remove(log)
+    return sorted(names)
+
+
+def test_put_get_and_reload(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    assert cache.get("a" * 64) == (False, None)
+    assert cache.put("a" * 64, {"value": [1, 2]})
+    assert cache.get("a" * 64) == (True, {"value": [1, 2]})
+    assert not cache.put("b" * 64, lambda: None)  # Not picklable
+    assert ResultCache(str(tmp_path)).get("a" * 64) == (True, {"value": [1, 2]})
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=2500)
+    for key in ("a", "b"):
+        cache.put(key * 64, b"x" * 1000)
+    cache.get("a" * 64)
+    cache.put("c" * 64, b"x" * 1000)
+    assert cache.get("a" * 64)[0] and cache.get("c" * 64)[0]
+    assert cache.get("b" * 64) == (False, None)
+    assert not cache.put("d" * 64, b"x" * 5000)  # Larger than the whole cache
+
+
+def test_key_covers_source_function_args_and_upstream():
+    key = result_cache_key("hash", "block_a", [1, "x"], ["up"])
+    assert key == result_cache_key("hash", "block_a", [1, "x"], ["up"])
+    assert len({key,
+                result_cache_key("other", "block_a", [1, "x"], ["up"]),
+                result_cache_key("hash", "block_b", [1, "x"], ["up"]),
+                result_cache_key("hash", "block_a", [2, "x"], ["up"]),
+                result_cache_key("hash", "block_a", [1, "x"], ["changed"])}) == 5
+
+
+def test_changed_input_invalidates_only_its_branch(blocks, cached_scheduler):
+    blocks.write("counted.py", COUNTED)
+    log = os.path.join(blocks.path, "calls.log")
+
+    def run(start):
+        graph = resolved_graph(
+            [blocks.node("src", "block_source", {"log": log, "start": start}),
+             blocks.node("double", "block_double", {"log": log}),
+             blocks.node("other", "block_other", {"log": log, "value": 10})],
+            [edge("src", "double", "value")],
+        )
+        return asyncio.run(cached_scheduler.run(graph))
+
+    first = run(1)
+    assert first.cache_hits == [] and executed(log) == ["double", "other", "source"]
+
+    second = run(1)
+    assert second.results == first.results == {"src": 1, "double": 2, "other": 11}
+    assert sorted(second.cache_hits) == ["double", "other", "src"] and executed(log) == []
+
+    third = run(5)
+    assert third.results["double"] == 10
+    assert third.cache_hits == ["other"] and executed(log) == ["double", "source"]
+
+    assert asyncio.run(cached_scheduler.run(resolved_graph([blocks.node(
+        "other", "block_other", {"log": log, "value": 10})]), use_cache=False)).cache_hits == []
+
+
+def test_editing_the_block_invalidates_its_results(blocks, cached_scheduler):
+    blocks.write("counted.py", COUNTED)
+    log = os.path.join(blocks.path, "calls.log")
+
+    def run():
+        graph = resolved_graph([blocks.node("other", "block_other", {"log": log, "value": 1})])
+        return asyncio.run(cached_scheduler.run(graph))
+
+    assert run().results["other"] == 2
+    assert run().cache_hits == ["other"]
+    blocks.write("counted.py", COUNTED.replace("value + 1", "value + 100"))
+    report = run()
+    assert report.cache_hits == [] and report.results["other"] == 101
+
+
+def test_editing_a_local_helper_invalidates_and_reloads_the_block(blocks, cached_scheduler):
+    blocks.write("scaling_factors.py", "FACTOR = 2\n")
+    blocks.write("scaled.py", '''
+        from scaling_factors import FACTOR
+
+        def block_scaled(value):
+            return value * FACTOR
+    ''')
+
+    def run():
+        graph = resolved_graph([blocks.node("scaled", "block_scaled", {"value": 3})])
+        return asyncio.run(cached_scheduler.run(graph))
+
+    assert run().results["scaled"] == 6
+    assert run().cache_hits == ["scaled"]
+    blocks.write("scaling_factors.py", "FACTOR = 100\n")
+    report = run()
+    assert report.cache_hits == [] and report.results["scaled"] == 300  # Thread nodes reload in this process
+    assert run().cache_hits == ["scaled"]
+
+
+def test_nodes_writing_data_folders_and_opted_out_nodes_are_not_cached(blocks, cached_scheduler):
+    blocks.write("writes.py", '''
+        import os
+
+        def block_save(project):
+            savePath = os.path.join(project, "block_o2_output")
+            os.makedirs(savePath, exist_ok=True)
+            return savePath
+
+        def block_after(path):
+            return os.path.isdir(path)
+    ''')
+    blocks.write("counted.py", COUNTED)
+    log = os.path.join(blocks.path, "calls.log")
+
+    def run():
+        graph = resolved_graph(
+            [blocks.node("save", "block_save", {"project": blocks.path}), blocks.node("after", "block_after"),
+             blocks.node("other", "block_other", {"log": log, "value": 1}, cache=False)],
+            [edge("save", "after", "path")],
+        )
+        assert graph.tasks["save"].writes_data
+        return asyncio.run(cached_scheduler.run(graph))
+
+    assert run().results == {"save": os.path.join(blocks.path, "block_o2_output"), "after": True, "other": 2}
+    assert run().cache_hits == []
+    assert executed(log) == ["other", "other"]
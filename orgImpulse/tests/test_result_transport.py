@@ -0,0 +1,89 @@
+import asyncio
+import os
+
+import pytest
+
+import result_transport
+from payloads import edge, resolved_graph
+from result_transport import SharedBuffer, export_value, import_value, materialize, release
+
+np = pytest.importorskip("numpy")
+
+SIZE = result_transport.SHARE_MIN_BYTES
+
+
+@pytest.fixture(params=["shm", "file"])
+def transport(request, tmp_path, monkeypatch):
+    if request.param == "file":
+        monkeypatch.setattr(result_transport, "_shm_has_room", lambda nbytes: False)
+        monkeypatch.setattr(result_transport, "SPILL_DIR", str(tmp_path / "spill"))
+    return request.param
+
+
+def test_small_values_pass_through():
+    assert export_value(b"abc") == b"abc"
+    assert export_value({"x": 1}) == {"x": 1}
+    assert not isinstance(export_value(np.zeros(4)), SharedBuffer)
+
+
+def test_arrays_travel_as_handles(transport):
+    array = np.arange(SIZE // 8, dtype=np.float64).reshape(-1, 16)
+    handle = export_value(array)
+    try:
+        assert isinstance(handle, SharedBuffer) and handle.kind == transport
+        assert handle.describe()["shape"] == list(array.shape)
+        assert np.array_equal(import_value(handle), array)
+        assert np.array_equal(materialize(handle), array)
+    finally:
+        release([handle])
+    if transport == "file":
+        assert not os.path.exists(handle.location)
+
+
+def test_views_are_copy_on_write(transport):
+    array = np.ones(SIZE, dtype=np.uint8)
+    handle = export_value(array)
+    try:
+        first, second = import_value(handle), import_value(handle)
+        first -= 1  # A block editing its input in place
+        assert first.sum() == 0
+        assert second.sum() == SIZE
+        assert materialize(handle).sum() == SIZE
+    finally:
+        release([handle])
+
+
+def test_raw_bytes_open_as_writable_memoryviews(transport):
+    handle = export_value(b"\x01" * SIZE)
+    try:
+        view = import_value(handle)
+        assert isinstance(view, memoryview) and not view.readonly
+        view[0] = 0
+        assert materialize(handle)[:2] == b"\x01\x01"
+    finally:
+        release([handle])
+
+
+def test_consumers_editing_a_shared_input_do_not_see_each_other(blocks, scheduler):
+    blocks.write("images.py", f'''
+        import numpy as np
+
+        def block_image():
+            return np.ones({SIZE}, dtype=np.uint8)
+
+        def block_darken(image):
+            image -= 1
+            return int(image.sum())
+
+        def block_total(image):
+            return int(image.sum())
+    ''')
+    graph = resolved_graph(
+        [blocks.node("image", "block_image", executor="process"),
+         blocks.node("darken", "block_darken", executor="process"),
+         blocks.node("total", "block_total", executor="process")],
+        [edge("image", "darken", "image"), edge("image", "total", "image"), edge("darken", "total")],
+    )
+    report = asyncio.run(scheduler.run(graph))
+    assert report.results["darken"] == 0
+    assert report.results["total"] == SIZE
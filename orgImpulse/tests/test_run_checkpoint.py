@@ -0,0 +1,144 @@
+import asyncio
+import os
+
+import pytest
+
+from graph_scheduler import ExecutionGraph, GraphExecutionError
+from payloads import edge
+from result_store import ResultStore
+from run_checkpoint import CheckpointStore, RunCheckpoint, args_digest, restorable_nodes
+from run_manager import RunManager
+
+BLOCKS = '''
+import os
+
+def _count(log, name):
+    with open(log, "a") as file:
+        file.write(name + "\\n")
+
+def block_load(log, value):
+    _count(log, "load")
+    return value
+
+def block_flaky(log, flag, value):
+    _count(log, "flaky")
+    if not os.path.exists(flag):
+        raise RuntimeError("flag missing")
+    return value * 10
+
+def block_report(log, value):
+    _count(log, "report")
+    return f"report {value}"
+
+def block_side(log, value):
+    _count(log, "side")
+    return value + 1
+'''
+
+
+@pytest.fixture
+def manager_factory(tmp_path, scheduler):
+    """RunManagers over the same result store and checkpoint directories, as across server restarts."""
+    def create(messages):
+        async def broadcast(message):
+            messages.append(message)
+        return RunManager(scheduler, broadcast, store=ResultStore(str(tmp_path / "runs")),
+                          checkpoints=CheckpointStore(str(tmp_path / "checkpoints")))
+    return create
+
+
+def payload(blocks, log, flag):
+    nodes = [blocks.node("load", "block_load", {"log": log, "value": 2}),
+             blocks.node("flaky", "block_flaky", {"log": log, "flag": flag}),
+             blocks.node("report", "block_report", {"log": log}),
+             blocks.node("side", "block_side", {"log": log, "value": 1})]
+    edges = [edge("load", "flaky", "value"), edge("flaky", "report", "value")]
+    return {"nodes": nodes, "edges": edges}
+
+
+def executed(log):
+    with open(log) as file:
+        names = sorted(file.read().split())
+    os.remove(log)
+    return names
+
+
+def test_resume_restores_completed_nodes_and_reruns_the_rest(blocks, manager_factory):
+    blocks.write("steps.py", BLOCKS)
+    log, flag = os.path.join(blocks.path, "calls.log"), os.path.join(blocks.path, "flag")
+    source = payload(blocks, log, flag)
+    messages = []
+
+    async def scenario():
+        manager = manager_factory(messages)
+        graph = ExecutionGraph.from_payload(source["nodes"], source["edges"])
+        run = manager.submit(graph, use_cache=False, source=source)
+        await asyncio.gather(run.task, return_exceptions=True)
+        assert run.status == "failed" and run.error_node == "flaky"
+        # The independent branch still finished, so resuming does not run it again
+        assert executed(log) == ["flaky", "load", "side"]
+        assert run.to_dict(include_results=False)["resumable"]
+
+        open(flag, "w").close()
+        resumed = await manager.resume(run.run_id)
+        await resumed.task
+        return run, resumed
+
+    run, resumed = asyncio.run(scenario())
+    assert resumed.run_id == run.run_id and resumed.attempt == 2
+    assert resumed.status == "completed"
+    assert sorted(resumed.restored) == ["load", "side"]
+    assert resumed.results == {"load": 2, "flaky": 20, "report": "report 20", "side": 2}
+    assert executed(log) == ["flaky", "report"]
+    restored = [m["node_id"] for m in messages if m["type"] == "node_finished" and m.get("restored")]
+    assert sorted(restored) == ["load", "side"]
+
+
+def test_interrupted_runs_are_resumable_after_a_restart(blocks, manager_factory):
+    blocks.write("steps.py", BLOCKS)
+    log, flag = os.path.join(blocks.path, "calls.log"), os.path.join(blocks.path, "flag")
+    source = payload(blocks, log, flag)
+
+    async def first_server():
+        manager = manager_factory([])
+        run = manager.submit(ExecutionGraph.from_payload(source["nodes"], source["edges"]), source=source)
+        await asyncio.gather(run.task, return_exceptions=True)
+        # Pretend the server died while the run was still going
+        manager.checkpoints.status(run.run_id, "running")
+        return run.run_id
+
+    run_id = asyncio.run(first_server())
+    executed(log)
+    open(flag, "w").close()
+
+    async def second_server():
+        manager = manager_factory([])
+        assert manager.get(run_id).status == "interrupted"
+        resumed = await manager.resume(run_id)
+        await resumed.task
+        with pytest.raises(GraphExecutionError) as error:
+            await manager.resume(run_id)
+        assert error.value.status == 409  # Completed runs drop their checkpoint
+        return resumed
+
+    resumed = asyncio.run(second_server())
+    assert resumed.status == "completed" and sorted(resumed.restored) == ["load", "side"]
+    assert executed(log) == ["flaky", "report"]
+
+
+def test_edited_nodes_and_their_descendants_are_not_restored(blocks):
+    blocks.write("steps.py", BLOCKS)
+    source = payload(blocks, "calls.log", "flag")
+    graph = ExecutionGraph.from_payload(source["nodes"], source["edges"])
+    graph.resolve_functions()
+    checkpoint = RunCheckpoint(run_id="run", nodes=source["nodes"], edges=source["edges"])
+    for node_id in ("load", "flaky", "side"):
+        task = graph.tasks[node_id]
+        checkpoint.node_states[node_id] = {"status": "completed", "source_hash": task.source_hash,
+                                           "args": args_digest(task.args)}
+    everything = set(graph.tasks)
+    assert restorable_nodes(graph, checkpoint, everything) == {"load", "flaky", "side"}
+    assert restorable_nodes(graph, checkpoint, everything - {"load"}) == {"side"}
+
+    checkpoint.node_states["load"]["source_hash"] = "edited"
+    assert restorable_nodes(graph, checkpoint, everything) == {"side"}
@@ -0,0 +1,77 @@
+import importlib
+import os
+
+import pytest
+
+pytest.importorskip("sanic_testing")
+
+from payloads import edge  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    """The server module with every cache and store in a temporary directory."""
+    scratch = tmp_path_factory.mktemp("server")
+    with pytest.MonkeyPatch.context() as patch:
+        for name, path in (("NCPIPE_CACHE_DIR", "cache"), ("NCPIPE_RESULTS_DIR", "runs"),
+                           ("NCPIPE_MANIFEST_DIR", "manifests"), ("NCPIPE_HISTORY_DB", "history.sqlite3"),
+                           ("NCPIPE_CHECKPOINT_DIR", "checkpoints")):
+            patch.setenv(name, str(scratch / path))
+        patch.setenv("NCPIPE_ANALYSIS_DIR", "")
+        patch.setenv("NCPIPE_SYMBOL_DB", "")  # /list-function-variables answers from the function index
+        module = importlib.import_module("server")
+    yield module
+    module.scheduler.shutdown()
+
+
+def post(server, path, body):
+    _, response = server.app.test_client.post(path, json=body)
+    return response
+
+
+CHAIN = '''
+def block_source(start):
+    return start
+
+def block_double(value):
+    return value * 2
+'''
+
+
+def test_graphs_that_do_not_resolve_are_rejected_before_they_run(server, blocks):
+    blocks.write("chain.py", CHAIN)
+    runs = len(server.run_manager.runs)
+    for nodes in ([blocks.node("a", "block_missing")], [blocks.node("a", "block_source")]):
+        for path in ("/runs", "/execute-graph"):
+            response = post(server, path, {"nodes": nodes, "edges": []})
+            assert response.status == 400, response.json
+            assert "not found" in response.json["error"] or "not provided" in response.json["error"]
+    assert len(server.run_manager.runs) == runs
+
+
+def test_execute_graph_returns_results(server, blocks):
+    blocks.write("chain.py", CHAIN)
+    response = post(server, "/execute-graph", {
+        "nodes": [blocks.node("a", "block_source", {"start": 4}), blocks.node("b", "block_double")],
+        "edges": [edge("a", "b", "value")],
+    })
+    assert response.status == 200, response.json
+    assert response.json["results"] == {"a": 4, "b": 8}
+
+
+def test_list_files_reports_the_watched_folder(server, blocks):
+    blocks.write("chain.py", CHAIN)
+    response = post(server, "/list-files", {"folder_path": blocks.path + os.sep})
+    assert response.status == 200
+    assert response.json["folder_path"] == os.path.abspath(blocks.path)
+    assert {entry["functionName"] for entry in response.json["files"]} == {"block_source", "block_double"}
+    assert os.path.abspath(blocks.path) in server.watcher.folders
+
+
+def test_function_variables_without_the_symbol_index(server, blocks):
+    blocks.write("chain.py", CHAIN)
+    response = post(server, "/list-function-variables", {"function_name": "block_double", "folder_path": blocks.path})
+    assert response.status == 200
+    assert response.json["variables"] == ["value"] and response.json["filename"] == "chain.py"
+    response = post(server, "/list-function-variables", {"function_name": "block_nope", "folder_path": blocks.path})
+    assert response.status == 400